@@ -0,0 +1,282 @@
+"""Benchmark NestClient and the subscriber loop against the fake Nest backend.
+
+Usage:
+    python -m benchmarks.bench_client --devices 500 --update-rate 50 --duration 20
+    python -m benchmarks.bench_client --mode subscriber --devices 500
+
+The ``client`` mode drives NestClient directly: one or more subscribe long-poll
+loops plus a concurrent loop of puts. Combine ``--subscriptions`` with a small
+``--shared-limit`` and toggle ``--dedicated-pools`` to see puts queue behind
+long-polls on a shared connector. The ``subscriber`` mode runs the integration's
+subscribe loop with a bare Home Assistant core and measures the time from an
+object's timestamp on the server until its dispatcher signal fires.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import time
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+from aiohttp import ClientSession, TCPConnector
+from aiohttp.test_utils import TestServer
+
+from custom_components.nest_protect.pynest.client import NestClient
+from custom_components.nest_protect.pynest.const import DEFAULT_CONNECTION_POOLS
+from custom_components.nest_protect.pynest.exceptions import EmptyResponseException
+from custom_components.nest_protect.pynest.models import NestEnvironment
+from custom_components.nest_protect.pynest.revisions import BucketRevisionIndex
+
+from .fake_nest import FakeNestBackend, FakeNestConfig, patch_nest_urls
+
+
+@dataclass
+class Samples:
+    """Latency samples in milliseconds for one kind of operation."""
+
+    name: str
+    values: list[float] = field(default_factory=list)
+
+    def add(self, value: float) -> None:
+        """Record a sample."""
+        self.values.append(value)
+
+    def percentile(self, pct: float) -> float:
+        """Return the given percentile (0-100) of the recorded samples."""
+        if not self.values:
+            return float("nan")
+        ordered = sorted(self.values)
+        index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+        return ordered[index]
+
+    def report(self, duration: float) -> str:
+        """Format throughput and p50/p99 latency."""
+        return (
+            f"{self.name:<12} n={len(self.values):<7} "
+            f"throughput={len(self.values) / duration:9.1f}/s "
+            f"p50={self.percentile(50):8.2f}ms p99={self.percentile(99):8.2f}ms"
+        )
+
+
+def _now_ms() -> float:
+    return time.time() * 1000
+
+
+async def _async_login(client: NestClient):
+    """Run the full refresh token -> issue_jwt -> session -> app_launch chain."""
+    auth = await client.get_access_token_from_refresh_token("fake-refresh-token")
+    nest = await client.authenticate(auth.access_token)
+    return await client.get_first_data(nest.access_token, nest.userid)
+
+
+async def _async_put_loop(
+    client: NestClient, backend: FakeNestBackend, samples: Samples, interval: float
+) -> None:
+    keys = backend.device_keys
+    index = 0
+    while True:
+        key = keys[index % len(keys)]
+        index += 1
+        start = time.perf_counter()
+        await client.update_objects(
+            client.nest_session.access_token,
+            client.nest_session.userid,
+            client.transport_url,
+            [{"object_key": key, "op": "MERGE", "value": {"heads_up_enable": True}}],
+        )
+        samples.add((time.perf_counter() - start) * 1000)
+        if interval:
+            await asyncio.sleep(interval)
+
+
+async def _async_subscribe_loop(client: NestClient, data, samples: Samples) -> None:
+    revisions = BucketRevisionIndex(data.updated_buckets)
+    while True:
+        try:
+            result = await client.subscribe_for_data(
+                client.nest_session.access_token,
+                client.nest_session.userid,
+                client.transport_url,
+                revisions,
+            )
+        except EmptyResponseException:
+            continue
+
+        received = _now_ms()
+        for bucket in revisions.update(result.objects):
+            samples.add(received - bucket.object_timestamp)
+
+
+async def run_client_benchmark(args: argparse.Namespace) -> list[Samples]:
+    """Drive NestClient directly against the fake backend."""
+    backend = FakeNestBackend(_config_from_args(args))
+    updates = Samples("subscribe")
+    puts = Samples("put")
+
+    async with (
+        TestServer(backend.app) as server,
+        ClientSession(connector=TCPConnector(limit=args.shared_limit)) as session,
+    ):
+        backend.base_url = str(server.make_url("")).rstrip("/")
+        environment = NestEnvironment(
+            name="Fake", client_id="fake-client-id", host=backend.base_url
+        )
+
+        with patch_nest_urls(backend.base_url):
+            client = NestClient(
+                session=session,
+                environment=environment,
+                connection_pools=(
+                    DEFAULT_CONNECTION_POOLS if args.dedicated_pools else None
+                ),
+            )
+            data = await _async_login(client)
+
+            tasks = [
+                asyncio.create_task(_async_subscribe_loop(client, data, updates))
+                for _ in range(args.subscriptions)
+            ]
+            if args.put_interval >= 0:
+                tasks.append(
+                    asyncio.create_task(
+                        _async_put_loop(client, backend, puts, args.put_interval)
+                    )
+                )
+
+            await asyncio.sleep(args.duration)
+
+            for task in tasks:
+                task.cancel()
+            for task in tasks:
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+
+            await client.async_close()
+
+    return [updates, puts]
+
+
+async def run_subscriber_benchmark(args: argparse.Namespace) -> list[Samples]:
+    """Drive the integration subscribe loop against the fake backend."""
+    from homeassistant.core import HomeAssistant
+    from homeassistant.helpers.dispatcher import async_dispatcher_connect
+
+    from custom_components.nest_protect import HomeAssistantNestProtectData
+    from custom_components.nest_protect.pynest.state import BucketStore
+    from custom_components.nest_protect.pynest.write_queue import NestWriteQueue
+    from custom_components.nest_protect.session import NestSessionManager
+    from custom_components.nest_protect.subscriber import NestSubscriber
+
+    backend = FakeNestBackend(_config_from_args(args))
+    updates = Samples("dispatch")
+
+    async with TestServer(backend.app) as server, ClientSession() as session:
+        backend.base_url = str(server.make_url("")).rstrip("/")
+        environment = NestEnvironment(
+            name="Fake", client_id="fake-client-id", host=backend.base_url
+        )
+
+        with patch_nest_urls(backend.base_url):
+            client = NestClient(session=session, environment=environment)
+            data = await _async_login(client)
+
+            hass = HomeAssistant(args.config_dir)
+            entry = SimpleNamespace(entry_id="benchmark")
+            store = SimpleNamespace(async_load=_async_none, async_save=_async_none)
+            session_manager = NestSessionManager(client=client, store=store)
+            entry_data = HomeAssistantNestProtectData(
+                buckets=BucketStore(data.updated_buckets),
+                areas={},
+                client=client,
+                session_manager=session_manager,
+                write_queue=NestWriteQueue(session_manager.async_update_objects),
+            )
+
+            def on_update(bucket) -> None:
+                updates.add(_now_ms() - bucket.object_timestamp)
+
+            for key in backend.device_keys:
+                async_dispatcher_connect(hass, key, on_update)
+
+            subscriber = NestSubscriber(hass, entry, entry_data, data)
+            subscriber.start()
+
+            await asyncio.sleep(args.duration)
+            await subscriber.async_stop()
+            print(f"subscriber {subscriber.stats}")
+
+    return [updates]
+
+
+async def _async_none(*args, **kwargs) -> None:
+    return None
+
+
+def _config_from_args(args: argparse.Namespace) -> FakeNestConfig:
+    return FakeNestConfig(
+        devices=args.devices,
+        structures=args.structures,
+        latency=args.latency,
+        hold=args.hold,
+        update_rate=args.update_rate,
+        payload_padding=args.payload_padding,
+        seed=args.seed,
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command line parser."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["client", "subscriber"], default="client")
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--structures", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--hold", type=float, default=30.0, help="seconds")
+    parser.add_argument("--update-rate", type=float, default=20.0, help="per second")
+    parser.add_argument("--payload-padding", type=int, default=0, help="bytes")
+    parser.add_argument("--subscriptions", type=int, default=1)
+    parser.add_argument(
+        "--put-interval",
+        type=float,
+        default=0.05,
+        help="seconds between puts, negative disables puts",
+    )
+    parser.add_argument(
+        "--shared-limit",
+        type=int,
+        default=100,
+        help="connector limit of the shared session",
+    )
+    parser.add_argument(
+        "--dedicated-pools",
+        action="store_true",
+        help="give long-poll, write and auth traffic their own pools",
+    )
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--config-dir", default=".")
+    return parser
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    args = build_parser().parse_args()
+    runner = (
+        run_subscriber_benchmark if args.mode == "subscriber" else run_client_benchmark
+    )
+    results = asyncio.run(runner(args))
+
+    print(
+        f"mode={args.mode} devices={args.devices} structures={args.structures} "
+        f"latency={args.latency}s update_rate={args.update_rate}/s "
+        f"duration={args.duration}s"
+    )
+    for samples in results:
+        print(samples.report(args.duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Micro-benchmark the pynest JSON codecs on realistic app_launch payloads.
+
+Also compares the per-value cost of a lazy topaz value with building an
+untyped value dict, for an update that reads a few fields and for one that
+reads them all.
+
+Usage:
+    python -m benchmarks.bench_codec --devices 10 100 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import timeit
+
+from custom_components.nest_protect.pynest.codec import available_codecs
+from custom_components.nest_protect.pynest.models import (
+    TopazBucketValue,
+    intern_keys,
+)
+
+from .fake_nest import FakeNestConfig, make_buckets, make_topaz_value
+
+
+def make_app_launch_payload(devices: int) -> dict:
+    """Build an app_launch response body for a fleet of the given size."""
+    buckets = make_buckets(FakeNestConfig(devices=devices))
+    return {
+        "updated_buckets": list(buckets.values()),
+        "service_urls": {"urls": {"transport_url": "https://transport.example"}},
+        "weather_for_structures": {},
+        "2fa_enabled": False,
+    }
+
+
+def _best_of(func, number: int, repeat: int) -> float:
+    """Return the best time per call in microseconds."""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+
+def bench_fleet(devices: int, repeat: int) -> None:
+    """Compare every installed codec on one fleet size."""
+    payload = make_app_launch_payload(devices)
+    body = json.dumps(payload).encode()
+    number = max(1, 2000 // devices)
+
+    # aiohttp's response.json() decodes to str before calling json.loads
+    baseline = _best_of(lambda: json.loads(body.decode()), number, repeat)
+
+    print(f"devices={devices} body={len(body) / 1024:.1f}KiB")
+    print(f"  {'aiohttp-json':<14} loads={baseline:10.1f}us")
+    for codec in available_codecs():
+        loads = _best_of(lambda c=codec: c.loads(body), number, repeat)
+        dumps = _best_of(lambda c=codec: c.dumps(payload), number, repeat)
+        print(
+            f"  {codec.name:<14} loads={loads:10.1f}us dumps={dumps:10.1f}us "
+            f"speedup={baseline / loads:5.1f}x"
+        )
+
+
+def bench_values(repeat: int, reads: int = 5) -> None:
+    """Compare building one topaz value untyped and reading it lazily."""
+    raw = make_topaz_value(1, "structure-0000", "where-0000")
+    read = list(raw)[:reads]
+    number = 20000
+
+    def read_some() -> None:
+        value = TopazBucketValue(raw)
+        for key in read:
+            value.get(key)
+
+    untyped = _best_of(lambda: intern_keys(raw), number, repeat)
+    some = _best_of(read_some, number, repeat)
+    every = _best_of(lambda: dict(TopazBucketValue(raw).items()), number, repeat)
+
+    print(f"topaz value fields={len(raw)}")
+    print(f"  {'untyped':<14} {untyped:10.2f}us")
+    print(f"  {f'lazy {reads} reads':<14} {some:10.2f}us ratio={some / untyped:5.2f}x")
+    print(f"  {'lazy all':<14} {every:10.2f}us ratio={every / untyped:5.2f}x")
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for devices in args.devices:
+        bench_fleet(devices, args.repeat)
+
+    bench_values(args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Measure the memory the decoded buckets of a fleet keep alive.
+
+The integration keeps the latest bucket of every device, and each of those
+usually comes from a different subscribe response. Every device is therefore
+decoded from its own body here, the way the subscriber receives it, and the
+memory still allocated afterwards is reported per Protect.
+
+Usage:
+    python -m benchmarks.bench_memory --devices 10 100 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import tracemalloc
+from contextlib import nullcontext
+from unittest.mock import patch
+
+from custom_components.nest_protect.pynest import models
+from custom_components.nest_protect.pynest.codec import available_codecs
+from custom_components.nest_protect.pynest.models import SubscribeResponse
+
+from .fake_nest import FakeNestConfig, make_buckets
+
+
+def measure(devices: int, codec, intern_keys: bool = True) -> tuple[int, int]:
+    """Return the bytes retained by the buckets and by the raw decoded bodies."""
+    bodies = [
+        codec.dumps({"objects": [bucket]})
+        for key, bucket in make_buckets(FakeNestConfig(devices=devices)).items()
+        if key.startswith("topaz.")
+    ]
+
+    def decode_raw() -> list:
+        return [codec.loads(body)["objects"][0] for body in bodies]
+
+    def decode_buckets() -> dict:
+        responses = (SubscribeResponse(**codec.loads(body)) for body in bodies)
+        return {
+            bucket.object_key: bucket
+            for response in responses
+            for bucket in response.objects
+        }
+
+    results = []
+    keys = (
+        nullcontext()
+        if intern_keys
+        else patch.object(models, "intern_keys", lambda value: value)
+    )
+
+    with keys:
+        for decode in (decode_buckets, decode_raw):
+            gc.collect()
+            tracemalloc.start()
+            retained = decode()
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results.append(current)
+            del retained
+
+    return results[0], results[1]
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    for codec in available_codecs():
+        # Leave one-off allocations like import-time caches out of the numbers
+        measure(1, codec)
+
+        print(f"codec={codec.name}")
+        for devices in args.devices:
+            buckets, raw = measure(devices, codec)
+            plain, _ = measure(devices, codec, intern_keys=False)
+            print(
+                f"  devices={devices:<5} per Protect: buckets={buckets / devices:8.0f}B "
+                f"without interning={plain / devices:8.0f}B "
+                f"raw dicts={raw / devices:8.0f}B"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Compare the bucket snapshot file with saving the buckets in a JSON Store.
+
+A Home Assistant Store rewrites all of its data as indented JSON on every
+save, so saving one changed bucket costs as much as saving all of them. The
+snapshot file appends the changed bucket to its log instead. Both are
+measured for saving one change, writing every bucket and loading them back,
+for the snapshot both right after compaction and with the longest log
+compaction leaves in place.
+
+Usage:
+    python -m benchmarks.bench_snapshot --devices 10 100 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import timeit
+from pathlib import Path
+
+from homeassistant.helpers.json import save_json
+from homeassistant.util.json import load_json
+
+from custom_components.nest_protect.pynest.snapshot import BucketSnapshotFile
+
+from .fake_nest import FakeNestConfig, make_buckets
+
+
+def _best_of(func, number: int, repeat: int) -> float:
+    """Return the best time per call in microseconds."""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+
+def _store_data(buckets: list[dict]) -> dict:
+    """Return the data a Store would write for the buckets."""
+    return {
+        "version": 1,
+        "minor_version": 1,
+        "key": "nest_protect_benchmark",
+        "data": {"nest_session": None, "transport_url": None, "buckets": buckets},
+    }
+
+
+def bench_fleet(devices: int, repeat: int) -> None:
+    """Compare the JSON Store and the snapshot file for one fleet size."""
+    buckets = list(make_buckets(FakeNestConfig(devices=devices)).values())
+    changed = next(b for b in buckets if b["object_key"].startswith("topaz."))
+    number = max(1, 200 // devices)
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = Path(directory, "nest_protect_benchmark")
+        snapshot = BucketSnapshotFile(Path(directory, "nest_protect_buckets"))
+
+        def save_json_store() -> None:
+            save_json(str(json_path), _store_data(buckets), atomic_writes=True)
+
+        json_save = _best_of(save_json_store, number, repeat)
+        json_load = _best_of(lambda: load_json(json_path), number, repeat)
+
+        snapshot_save = _best_of(lambda: snapshot.compact(buckets), number, repeat)
+        snapshot_size = snapshot.snapshot_size
+        snapshot_append = _best_of(lambda: snapshot.append([changed]), 20, repeat)
+
+        def load_snapshot() -> None:
+            BucketSnapshotFile(snapshot.snapshot_path.with_suffix("")).load()
+
+        snapshot.compact(buckets)
+        snapshot_load = _best_of(load_snapshot, number, repeat)
+
+        # Worst case: the log is just short of being compacted
+        logged = 0
+        while not snapshot.needs_compaction:
+            snapshot.append([changed])
+            logged += 1
+
+        snapshot_load_log = _best_of(load_snapshot, number, repeat)
+
+        print(
+            f"devices={devices} json={json_path.stat().st_size / 1024:.1f}KiB "
+            f"snapshot={snapshot_size / 1024:.1f}KiB"
+        )
+        print(
+            f"  {'json store':<14} change={json_save:10.1f}us "
+            f"all={json_save:10.1f}us load={json_load:10.1f}us"
+        )
+        print(
+            f"  {'snapshot':<14} change={snapshot_append:10.1f}us "
+            f"all={snapshot_save:10.1f}us load={snapshot_load:10.1f}us "
+            f"load+log={snapshot_load_log:10.1f}us ({logged} logged)"
+        )
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for devices in args.devices:
+        bench_fleet(devices, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
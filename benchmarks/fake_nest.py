@@ -0,0 +1,444 @@
+"""Local stand-in for the Google and Nest endpoints used by pynest.
+
+The server implements just enough of the token, issue_jwt, session, app_launch,
+subscribe and put endpoints to drive NestClient end to end without network
+access. Fleet size, response latency, payload size and the rate at which
+devices change are configurable, so the same server can be used for smoke
+tests and for benchmarking large accounts.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import datetime
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any
+from unittest.mock import patch
+
+from aiohttp import web
+
+SESSION_PATH = "/session"
+TOKEN_PATH = "/token"
+ISSUE_TOKEN_PATH = "/issue-token"
+ISSUE_JWT_PATH = "/v1/issue_jwt"
+APP_LAUNCH_PATH = "/api/0.1/user/{user_id}/app_launch"
+SUBSCRIBE_PATH = "/v6/subscribe"
+PUT_PATH = "/v6/put"
+
+USER_ID = "1000001"
+
+
+@dataclass
+class FakeNestConfig:
+    """Tunables for the fake Nest backend."""
+
+    devices: int = 10
+    structures: int = 1
+    # Seconds added before every response is sent
+    latency: float = 0.0
+    # Seconds a subscribe request is held open when nothing changes
+    hold: float = 30.0
+    # Device changes generated per second, 0 disables the generator
+    update_rate: float = 0.0
+    # Extra bytes of filler added to every topaz value
+    payload_padding: int = 0
+    seed: int | None = None
+
+
+@dataclass
+class FakeNestStats:
+    """Counters kept by the fake backend."""
+
+    requests: dict[str, int] = field(default_factory=dict)
+    subscribe_open: int = 0
+    subscribe_open_max: int = 0
+    generated_updates: int = 0
+
+    def count(self, endpoint: str) -> None:
+        """Increment the request counter for an endpoint."""
+        self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def make_topaz_value(
+    index: int, structure_id: str, where_id: str, padding: int = 0
+) -> dict[str, Any]:
+    """Build a realistic topaz (Nest Protect) bucket value."""
+    serial = f"06AA01AC{index:08d}"
+    mac = f"18b430{index:06x}"
+    value: dict[str, Any] = {
+        "spoken_where_id": where_id,
+        "creation_time": 1600000000000 + index,
+        "installed_locale": "en_US",
+        "ntp_green_led_brightness": 1,
+        "component_buzzer_test_passed": True,
+        "wifi_ip_address": f"10.0.{index // 250}.{index % 250 + 2}",
+        "wired_led_enable": True,
+        "wifi_regulatory_domain": "US",
+        "co_blame_duration": 0,
+        "is_rcs_capable": True,
+        "fabric_id": "1234567890ABCDEF",
+        "battery_health_state": 0,
+        "steam_detection_enable": True,
+        "hushed_state": False,
+        "capability_level": 5.5,
+        "home_alarm_link_type": 0,
+        "model": "Topaz-2.7",
+        "component_smoke_test_passed": True,
+        "component_speaker_test_passed": True,
+        "removed_from_base": False,
+        "smoke_sequence_number": 0,
+        "home_away_input": True,
+        "device_locale": "en_US",
+        "co_blame_threshold": 0,
+        "kl_software_version": "1.0.0",
+        "component_us_test_passed": True,
+        "auto_away": False,
+        "night_light_enable": False,
+        "component_als_test_passed": True,
+        "speaker_test_results": 32768,
+        "wired_or_battery": index % 2,
+        "is_rcs_used": False,
+        "replace_by_date_utc_secs": 1900000000,
+        "certification_body": 2,
+        "component_pir_test_passed": True,
+        "structure_id": structure_id,
+        "software_version": "3.4rc4",
+        "component_hum_test_passed": True,
+        "home_alarm_link_capable": True,
+        "night_light_brightness": 2,
+        "device_external_color": "white",
+        "latest_manual_test_end_utc_secs": 1700000000,
+        "smoke_status": 0,
+        "latest_manual_test_start_utc_secs": 1700000000,
+        "component_temp_test_passed": True,
+        "home_alarm_link_connected": False,
+        "co_status": 0,
+        "heat_status": 0,
+        "product_id": 9,
+        "night_light_continuous": False,
+        "co_previous_peak": 0,
+        "auto_away_decision_time_secs": 0,
+        "component_co_test_passed": True,
+        "where_id": where_id,
+        "serial_number": serial,
+        "component_heat_test_passed": True,
+        "latest_manual_test_cancelled": False,
+        "thread_mac_address": f"{mac}0000",
+        "resource_id": "NEST-DETECT-RESOURCE",
+        "buzzer_test_results": 0,
+        "wifi_mac_address": mac,
+        "line_power_present": index % 2 == 0,
+        "gesture_hush_enable": True,
+        "device_born_on_date_utc_secs": 1500000000,
+        "ntp_green_led_enable": True,
+        "component_led_test_passed": True,
+        "co_sequence_number": 0,
+        "thread_ip_address": ["fd00::1"],
+        "component_wifi_test_passed": True,
+        "heads_up_enable": True,
+        "battery_level": 5400,
+        "last_audio_self_test_end_utc_secs": 1700000000,
+        "last_audio_self_test_start_utc_secs": 1700000000,
+        "is_online": True,
+    }
+
+    if padding:
+        value["padding"] = "x" * padding
+
+    return value
+
+
+def make_buckets(config: FakeNestConfig) -> dict[str, dict[str, Any]]:
+    """Build the initial set of buckets for a fake account."""
+    timestamp = _now_ms()
+    buckets: dict[str, dict[str, Any]] = {}
+
+    def add(object_key: str, value: dict[str, Any]) -> None:
+        buckets[object_key] = {
+            "object_key": object_key,
+            "object_revision": 1,
+            "object_timestamp": timestamp,
+            "value": value,
+        }
+
+    structures = [f"structure-{i:04d}" for i in range(max(config.structures, 1))]
+
+    add(f"user.{USER_ID}", {"name": "Benchmark", "structures": structures})
+
+    for structure_id in structures:
+        add(f"structure.{structure_id}", {"name": structure_id, "devices": []})
+        add(
+            f"where.{structure_id}",
+            {
+                "wheres": [
+                    {"where_id": f"{structure_id}-where-{i:04d}", "name": f"Room {i}"}
+                    for i in range(max(config.devices // len(structures), 1))
+                ]
+            },
+        )
+
+    for i in range(config.devices):
+        structure_id = structures[i % len(structures)]
+        where_id = f"{structure_id}-where-{i // len(structures):04d}"
+        add(
+            f"topaz.{i:08X}",
+            make_topaz_value(i, structure_id, where_id, config.payload_padding),
+        )
+
+    return buckets
+
+
+class FakeNestBackend:
+    """In-memory Nest backend served by an aiohttp application."""
+
+    def __init__(self, config: FakeNestConfig | None = None) -> None:
+        """Initialize the backend."""
+        self.config = config or FakeNestConfig()
+        self.stats = FakeNestStats()
+        self.buckets = make_buckets(self.config)
+        self.base_url = ""
+        self._random = random.Random(self.config.seed)
+        self._changed = asyncio.Condition()
+        self._generator: asyncio.Task | None = None
+
+        self.app = web.Application()
+        self.app.router.add_post(TOKEN_PATH, self._handle_token)
+        self.app.router.add_get(ISSUE_TOKEN_PATH, self._handle_issue_token)
+        self.app.router.add_post(ISSUE_JWT_PATH, self._handle_issue_jwt)
+        self.app.router.add_get(SESSION_PATH, self._handle_session)
+        self.app.router.add_post(APP_LAUNCH_PATH, self._handle_app_launch)
+        self.app.router.add_post(SUBSCRIBE_PATH, self._handle_subscribe)
+        self.app.router.add_post(PUT_PATH, self._handle_put)
+        self.app.on_startup.append(self._on_startup)
+        self.app.on_cleanup.append(self._on_cleanup)
+
+    @property
+    def device_keys(self) -> list[str]:
+        """Return the object keys of all fake Nest Protects."""
+        return [key for key in self.buckets if key.startswith("topaz.")]
+
+    async def _on_startup(self, app: web.Application) -> None:
+        if self.config.update_rate > 0:
+            self._generator = asyncio.create_task(self._generate_updates())
+
+    async def _on_cleanup(self, app: web.Application) -> None:
+        if self._generator:
+            self._generator.cancel()
+            self._generator = None
+
+    async def _delay(self) -> None:
+        if self.config.latency:
+            await asyncio.sleep(self.config.latency)
+
+    async def _generate_updates(self) -> None:
+        interval = 1 / self.config.update_rate
+        keys = self.device_keys
+
+        while True:
+            await asyncio.sleep(interval)
+            key = self._random.choice(keys)
+            level = self.buckets[key]["value"]["battery_level"]
+            await self.async_apply(key, {"battery_level": level - 1})
+            self.stats.generated_updates += 1
+
+    async def async_apply(self, object_key: str, value: dict[str, Any]) -> dict:
+        """Merge a value into a bucket, bump its revision and wake subscribers."""
+        bucket = self.buckets[object_key]
+        bucket["value"] = {**bucket["value"], **value}
+        bucket["object_revision"] += 1
+        bucket["object_timestamp"] = _now_ms()
+
+        async with self._changed:
+            self._changed.notify_all()
+
+        return bucket
+
+    def _changed_objects(self, objects: list[dict[str, Any]]) -> list[dict]:
+        changed = []
+        for known in objects:
+            bucket = self.buckets.get(known.get("object_key"))
+            if bucket and bucket["object_revision"] > (
+                known.get("object_revision") or 0
+            ):
+                changed.append(bucket)
+        return changed
+
+    async def _handle_token(self, request: web.Request) -> web.Response:
+        self.stats.count("token")
+        await self._delay()
+        return web.json_response(
+            {
+                "access_token": "fake-google-access-token",
+                "scope": "https://www.googleapis.com/auth/nest-account",
+                "token_type": "Bearer",
+                "expires_in": 3600,
+                "id_token": "fake-id-token",
+            }
+        )
+
+    async def _handle_issue_token(self, request: web.Request) -> web.Response:
+        self.stats.count("issue_token")
+        await self._delay()
+        return web.json_response(
+            {
+                "access_token": "fake-google-access-token",
+                "scope": "https://www.googleapis.com/auth/nest-account",
+                "token_type": "Bearer",
+                "expires_in": 3600,
+                "id_token": "fake-id-token",
+                "login_hint": "fake-login-hint",
+                "session_state": {},
+            }
+        )
+
+    async def _handle_issue_jwt(self, request: web.Request) -> web.Response:
+        self.stats.count("issue_jwt")
+        await self._delay()
+        return web.json_response(
+            {
+                "jwt": "fake-nest-jwt",
+                "claims": {
+                    "subject": {"nestId": {"namespace": "nest-phoenix-prod"}},
+                    "expirationTime": "2100-01-01T00:00:00Z",
+                    "policyId": "authproxy-oauth-policy",
+                    "structureConstraint": "",
+                },
+            }
+        )
+
+    async def _handle_session(self, request: web.Request) -> web.Response:
+        self.stats.count("session")
+        await self._delay()
+        expires = datetime.datetime.now(datetime.UTC) + datetime.timedelta(hours=1)
+        return web.json_response(
+            {
+                "access_token": "fake-nest-access-token",
+                "email": "benchmark@example.com",
+                "expires_in": expires.strftime("%a, %d-%b-%Y %H:%M:%S") + " GMT",
+                "userid": USER_ID,
+                "is_superuser": False,
+                "language": "en_US",
+                "weave": {
+                    "service_config": "fake",
+                    "pairing_token": "fake",
+                    "access_token": "fake",
+                },
+                "user": f"user.{USER_ID}",
+                "is_staff": False,
+            }
+        )
+
+    async def _handle_app_launch(self, request: web.Request) -> web.Response:
+        self.stats.count("app_launch")
+        body = await request.json()
+        await self._delay()
+        known_types = set(body.get("known_bucket_types") or [])
+        return web.json_response(
+            {
+                "updated_buckets": [
+                    bucket
+                    for key, bucket in self.buckets.items()
+                    if key.split(".")[0] in known_types
+                ],
+                "service_urls": {
+                    "urls": {
+                        "rubyapi_url": self.base_url,
+                        "czfe_url": self.base_url,
+                        "log_upload_url": self.base_url,
+                        "transport_url": self.base_url,
+                        "weather_url": self.base_url,
+                        "support_url": self.base_url,
+                        "direct_transport_url": self.base_url,
+                    },
+                    "limits": {
+                        "thermostats_per_structure": 20,
+                        "structures": 5,
+                        "smoke_detectors_per_structure": 18,
+                        "smoke_detectors": 54,
+                        "thermostats": 60,
+                    },
+                    "weave": {
+                        "service_config": "fake",
+                        "pairing_token": "fake",
+                        "access_token": "fake",
+                    },
+                },
+                "weather_for_structures": {},
+                "2fa_enabled": False,
+            }
+        )
+
+    async def _handle_subscribe(self, request: web.Request) -> web.Response:
+        self.stats.count("subscribe")
+        body = await request.json()
+        objects = body.get("objects") or []
+
+        self.stats.subscribe_open += 1
+        self.stats.subscribe_open_max = max(
+            self.stats.subscribe_open_max, self.stats.subscribe_open
+        )
+        try:
+            changed = self._changed_objects(objects)
+            if not changed:
+                async with self._changed:
+                    with contextlib.suppress(TimeoutError):
+                        await asyncio.wait_for(
+                            self._changed.wait_for(
+                                lambda: bool(self._changed_objects(objects))
+                            ),
+                            self.config.hold,
+                        )
+                changed = self._changed_objects(objects)
+        finally:
+            self.stats.subscribe_open -= 1
+
+        await self._delay()
+
+        if not changed:
+            # The Nest service closes an idle long-poll with an empty body
+            return web.Response(text="", content_type="text/plain")
+
+        return web.json_response({"objects": changed})
+
+    async def _handle_put(self, request: web.Request) -> web.Response:
+        self.stats.count("put")
+        body = await request.json()
+        await self._delay()
+
+        result = []
+        for obj in body.get("objects") or []:
+            if obj.get("object_key") not in self.buckets:
+                continue
+            bucket = await self.async_apply(obj["object_key"], obj.get("value") or {})
+            result.append(
+                {
+                    "object_key": bucket["object_key"],
+                    "object_revision": bucket["object_revision"],
+                    "object_timestamp": bucket["object_timestamp"],
+                }
+            )
+
+        return web.json_response({"objects": result})
+
+
+@contextlib.contextmanager
+def patch_nest_urls(base_url: str):
+    """Point the pynest module constants at a fake backend."""
+    with (
+        patch(
+            "custom_components.nest_protect.pynest.client.TOKEN_URL",
+            base_url + TOKEN_PATH,
+        ),
+        patch(
+            "custom_components.nest_protect.pynest.client.NEST_AUTH_URL_JWT",
+            base_url + ISSUE_JWT_PATH,
+        ),
+    ):
+        yield
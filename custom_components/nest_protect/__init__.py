@@ -3,62 +3,62 @@
 from __future__ import annotations
 
 import asyncio
-import contextlib
 from dataclasses import dataclass
+from functools import partial
 
-from aiohttp import (
-    ClientConnectorError,
-    ClientError,
-    ClientOSError,
-    ServerDisconnectedError,
-)
+from aiohttp import ClientError
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EVENT_HOMEASSISTANT_FINAL_WRITE
+from homeassistant.core import Event, HomeAssistant
 from homeassistant.exceptions import ConfigEntryAuthFailed, ConfigEntryNotReady
 from homeassistant.helpers.aiohttp_client import async_create_clientsession
 from homeassistant.helpers.device_registry import DeviceEntry
-from homeassistant.helpers.dispatcher import async_dispatcher_send
 from homeassistant.helpers.storage import Store
 
+from .buckets import DEVICE_BUCKET_TYPES, apply_bucket
 from .const import (
+    BACKOFF_INTERVALS,
     CONF_ACCOUNT_TYPE,
     CONF_COOKIES,
     CONF_ISSUE_TOKEN,
     CONF_REFRESH_TOKEN,
+    DATA_ENGINE,
     DOMAIN,
     LOGGER,
     PLATFORMS,
+    RECONCILE_MAX_ATTEMPTS,
     STORAGE_KEY_FORMAT,
     STORAGE_VERSION,
 )
+from .engine import NestSubscriptionEngine, async_get_engine
 from .pynest.client import NestClient
 from .pynest.const import NEST_ENVIRONMENTS
-from .pynest.enums import BucketType, Environment
-from .pynest.exceptions import (
-    BadCredentialsException,
-    EmptyResponseException,
-    NestServiceException,
-    NotAuthenticatedException,
-    PynestException,
-)
-from .pynest.models import (
-    Bucket,
-    FirstDataAPIResponse,
-    TopazBucket,
-    WhereBucketValue,
-)
+from .pynest.enums import Environment
+from .pynest.exceptions import BadCredentialsException, NotAuthenticatedException
+from .pynest.models import Bucket
+from .pynest.retry import jitter
+from .pynest.state import BucketStore
+from .pynest.write_queue import NestWriteQueue
 from .session import NestSessionManager
+from .snapshot import NestBucketSnapshot
+from .subscriber import NestSubscriber
 
 
 @dataclass
 class HomeAssistantNestProtectData:
     """Nest Protect data stored in the Home Assistant data object."""
 
-    devices: dict[str, Bucket]
+    buckets: BucketStore
     areas: dict[str, str]
     client: NestClient
     session_manager: NestSessionManager
-    subscription_task: asyncio.Task | None = None
+    write_queue: NestWriteQueue
+    subscriber: NestSubscriber | None = None
+
+    @property
+    def devices(self) -> dict[str, Bucket]:
+        """Return the current bucket of every device, keyed by object_key."""
+        return self.buckets.snapshot().of_type(*DEVICE_BUCKET_TYPES)
 
 
 async def async_migrate_entry(hass: HomeAssistant, config_entry: ConfigEntry):
@@ -85,63 +85,92 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
 
     session = async_create_clientsession(hass)
     account_type = entry.data.get(CONF_ACCOUNT_TYPE, Environment.PRODUCTION)
-    client = NestClient(session=session, environment=NEST_ENVIRONMENTS[account_type])
+    engine = async_get_engine(hass)
+    client = NestClient(
+        session=session,
+        environment=NEST_ENVIRONMENTS[account_type],
+        connection_pools=engine.pools,
+    )
+    # Also runs when setup fails, so an unused engine doesn't keep its pools open
+    entry.async_on_unload(partial(_async_release_engine, hass))
 
     client.issue_token = issue_token
     client.cookies = cookies
     client.refresh_token = refresh_token
 
-    store = Store(
-        hass, STORAGE_VERSION, STORAGE_KEY_FORMAT.format(entry_id=entry.entry_id)
-    )
+    storage_key = STORAGE_KEY_FORMAT.format(entry_id=entry.entry_id)
+    store = Store(hass, STORAGE_VERSION, storage_key)
+    snapshot = NestBucketSnapshot(hass, storage_key)
 
-    session_manager = NestSessionManager(client=client, store=store)
+    session_manager = NestSessionManager(client=client, store=store, snapshot=snapshot)
 
-    try:
-        data = await session_manager.async_setup()
-    except (TimeoutError, ClientError) as exception:
-        raise ConfigEntryNotReady from exception
-    except BadCredentialsException as exception:
-        raise ConfigEntryAuthFailed from exception
-    except Exception as exception:  # pylint: disable=broad-except
-        LOGGER.exception("Unknown exception.")
-        raise ConfigEntryNotReady from exception
+    # Start from the buckets of the last run and catch up with Nest afterwards
+    warm_start = (data := await session_manager.async_restore()) is not None
 
     if data is None:
-        raise ConfigEntryAuthFailed("No credentials available")
-
-    # Update cookies in config entry if Google returned refreshed ones
-    _persist_refreshed_cookies(hass, entry, client, session_manager)
-
-    device_buckets: list[Bucket] = []
-    areas: dict[str, str] = {}
-
-    for bucket in data.updated_buckets:
-        if bucket.type in {BucketType.TOPAZ, BucketType.KRYPTONITE}:
-            device_buckets.append(bucket)
-
-        if bucket.type == BucketType.WHERE and isinstance(
-            bucket.value, WhereBucketValue
-        ):
-            bucket_value = bucket.value
-            for area in bucket_value.wheres:
-                areas[area.where_id] = area.name
-
-    devices: dict[str, Bucket] = {b.object_key: b for b in device_buckets}
+        try:
+            data = await session_manager.async_setup()
+        except (TimeoutError, ClientError) as exception:
+            raise ConfigEntryNotReady from exception
+        except BadCredentialsException as exception:
+            raise ConfigEntryAuthFailed from exception
+        except Exception as exception:  # pylint: disable=broad-except
+            LOGGER.exception("Unknown exception.")
+            raise ConfigEntryNotReady from exception
+
+        if data is None:
+            raise ConfigEntryAuthFailed("No credentials available")
+
+        # Update cookies in config entry if Google returned refreshed ones
+        _persist_refreshed_cookies(hass, entry, client, session_manager)
 
     entry_data = HomeAssistantNestProtectData(
-        devices=devices,
-        areas=areas,
+        buckets=BucketStore(data.updated_buckets, restored=warm_start),
+        areas={},
         client=client,
         session_manager=session_manager,
+        write_queue=NestWriteQueue(session_manager.async_update_objects),
     )
+
+    for bucket in data.updated_buckets:
+        apply_bucket(entry_data, bucket)
+
     hass.data.setdefault(DOMAIN, {})[entry.entry_id] = entry_data
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
-    entry_data.subscription_task = asyncio.create_task(
-        _async_subscribe_for_data(hass, entry, data)
+    def persist_refreshed_cookies() -> None:
+        _persist_refreshed_cookies(hass, entry, client, session_manager)
+
+    entry_data.subscriber = NestSubscriber(
+        hass,
+        entry,
+        entry_data,
+        data,
+        on_session_refreshed=persist_refreshed_cookies,
+        wait_turn=engine.async_wait_turn,
+    )
+    engine.add_account(
+        entry.entry_id,
+        session_manager,
+        entry_data.subscriber,
+        on_renewed=persist_refreshed_cookies,
     )
+    session_manager.schedule_snapshot_save(entry_data.buckets)
+
+    async def async_save_snapshot(_: Event) -> None:
+        await session_manager.async_save_snapshot()
+
+    entry.async_on_unload(
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_FINAL_WRITE, async_save_snapshot)
+    )
+
+    if warm_start:
+        entry.async_create_background_task(
+            hass,
+            _async_reconcile(hass, entry, entry_data),
+            f"nest_protect reconcile {entry.entry_id}",
+        )
 
     return True
 
@@ -149,24 +178,94 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        # Cancel subscription task only after successful platform unload
+        # Stop the subscriber only after successful platform unload
         if entry.entry_id in hass.data.get(DOMAIN, {}):
             entry_data: HomeAssistantNestProtectData = hass.data[DOMAIN][entry.entry_id]
-            if entry_data.subscription_task:
-                entry_data.subscription_task.cancel()
-                with contextlib.suppress(asyncio.CancelledError):
-                    await entry_data.subscription_task
+            await async_get_engine(hass).async_remove_account(entry.entry_id)
+            await entry_data.write_queue.async_flush()
+            await entry_data.session_manager.async_save_snapshot()
             hass.data[DOMAIN].pop(entry.entry_id)
 
     return unload_ok
 
 
+async def _async_release_engine(hass: HomeAssistant) -> None:
+    """Close the shared engine once no config entry uses it anymore."""
+    engine: NestSubscriptionEngine | None = hass.data.get(DATA_ENGINE)
+
+    if engine is not None and not engine:
+        hass.data.pop(DATA_ENGINE)
+        await engine.async_close()
+
+
 async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Clean up persisted session data when the config entry is removed."""
-    store = Store(
-        hass, STORAGE_VERSION, STORAGE_KEY_FORMAT.format(entry_id=entry.entry_id)
-    )
-    await store.async_remove()
+    storage_key = STORAGE_KEY_FORMAT.format(entry_id=entry.entry_id)
+    await Store(hass, STORAGE_VERSION, storage_key).async_remove()
+    await NestBucketSnapshot(hass, storage_key).async_remove()
+
+
+async def _async_reconcile(
+    hass: HomeAssistant, entry: ConfigEntry, entry_data: HomeAssistantNestProtectData
+) -> None:
+    """Catch up a warm start with the live app launch data.
+
+    The subscription already resumes from the persisted revisions, so this
+    only adds what changed while Home Assistant was down. Devices that were
+    added or removed in the meantime need their entities set up again, so
+    the entry is reloaded then. Until this succeeds, the smoke, CO and heat
+    sensors of restored devices are unavailable, as their saved state could
+    be stale.
+    """
+    client = entry_data.client
+    session_manager = entry_data.session_manager
+    refresh = False
+
+    for attempt in range(RECONCILE_MAX_ATTEMPTS):
+        try:
+            if refresh:
+                await session_manager.async_refresh_session()
+                refresh = False
+            else:
+                await session_manager.ensure_session()
+
+            data = await client.get_first_data(
+                client.nest_session.access_token, client.nest_session.userid
+            )
+            break
+        except BadCredentialsException:
+            # The subscriber asks the user to re-authenticate
+            return
+        except NotAuthenticatedException:
+            # Nest rejected the restored session, the next attempt renews it
+            LOGGER.debug("Nest rejected the restored session, renewing it")
+            refresh = True
+        except Exception:  # pylint: disable=broad-except
+            if attempt == RECONCILE_MAX_ATTEMPTS - 1:
+                LOGGER.debug("Could not catch up with Nest", exc_info=True)
+                continue
+
+            delay = jitter(BACKOFF_INTERVALS[min(attempt, len(BACKOFF_INTERVALS) - 1)])
+            LOGGER.debug(
+                "Could not catch up with Nest, retrying in %ds", delay, exc_info=True
+            )
+            await asyncio.sleep(delay)
+    else:
+        LOGGER.warning(
+            "Could not fetch the current state from Nest after %d attempts, "
+            "restored smoke, CO and heat sensors stay unavailable until Nest "
+            "sends an update for them",
+            RECONCILE_MAX_ATTEMPTS,
+        )
+        return
+
+    _persist_refreshed_cookies(hass, entry, client, session_manager)
+
+    if not entry_data.subscriber.async_reconcile(data):
+        LOGGER.debug("Nest devices changed since the last run, reloading")
+        # Removed devices must not be restored again by the reload
+        await session_manager.async_save_snapshot(data.updated_buckets)
+        hass.config_entries.async_schedule_reload(entry.entry_id)
 
 
 def _persist_refreshed_cookies(
@@ -194,173 +293,6 @@ def _persist_refreshed_cookies(
     client.cookies = new_cookies
 
 
-def _register_subscribe_task(
-    hass: HomeAssistant, entry: ConfigEntry, data: FirstDataAPIResponse
-) -> asyncio.Task | None:
-    """Create a new subscription task and update the reference."""
-    # Check if entry is still loaded before creating new task
-    if entry.entry_id not in hass.data.get(DOMAIN, {}):
-        return None
-
-    entry_data: HomeAssistantNestProtectData = hass.data[DOMAIN][entry.entry_id]
-    task = asyncio.create_task(_async_subscribe_for_data(hass, entry, data))
-    entry_data.subscription_task = task
-    return task
-
-
-async def _async_subscribe_for_data(
-    hass: HomeAssistant, entry: ConfigEntry, data: FirstDataAPIResponse
-):
-    """Subscribe for new data."""
-    if entry.entry_id not in hass.data.get(DOMAIN, {}):
-        return
-
-    entry_data: HomeAssistantNestProtectData = hass.data[DOMAIN][entry.entry_id]
-    sm = entry_data.session_manager
-
-    try:
-        await asyncio.sleep(0)
-
-        await sm.ensure_session()
-
-        result = await entry_data.client.subscribe_for_data(
-            entry_data.client.nest_session.access_token,
-            entry_data.client.nest_session.userid,
-            data.service_urls["urls"]["transport_url"],
-            data.updated_buckets,
-        )
-
-        sm.record_success()
-
-        # TODO write this data away in a better way, best would be to directly model API responses in client
-        for bucket in result["objects"]:
-            key = bucket["object_key"]
-
-            # Nest Protect
-            if key.startswith("topaz."):
-                topaz = TopazBucket(**bucket)
-                entry_data.devices[key] = topaz
-
-                # TODO investigate if we want to use dispatcher, or get data from entry data in sensors
-                async_dispatcher_send(hass, key, topaz)
-
-            # Areas
-            if key.startswith("where."):
-                bucket_value = Bucket(**bucket).value
-                for area in bucket_value.wheres:
-                    entry_data.areas[area.where_id] = area.name
-
-            # Temperature Sensors
-            if key.startswith("kryptonite."):
-                kryptonite = Bucket(**bucket)
-                entry_data.devices[key] = kryptonite
-
-                async_dispatcher_send(hass, key, kryptonite)
-
-        # Update buckets with new data, to only receive new updates
-        buckets = {d["object_key"]: d for d in result["objects"]}
-
-        LOGGER.debug(buckets)
-
-        objects = [
-            dict(vars(b), **buckets.get(b.object_key, {})) for b in data.updated_buckets
-        ]
-
-        data.updated_buckets = [
-            Bucket(
-                object_key=bucket["object_key"],
-                object_revision=bucket["object_revision"],
-                object_timestamp=bucket["object_timestamp"],
-                value=bucket["value"],
-                type=bucket["type"],
-            )
-            for bucket in objects
-        ]
-
-        _register_subscribe_task(hass, entry, data)
-    except ServerDisconnectedError:
-        LOGGER.debug("Subscriber: server disconnected.")
-        _register_subscribe_task(hass, entry, data)
-
-    except asyncio.exceptions.TimeoutError:
-        LOGGER.debug("Subscriber: session timed out.")
-        sm.record_success()
-        _register_subscribe_task(hass, entry, data)
-
-    except ClientConnectorError:
-        LOGGER.debug("Subscriber: cannot connect to host.")
-        _register_subscribe_task(hass, entry, data)
-
-    except ClientOSError:
-        LOGGER.debug("Subscriber: connection reset.")
-        _register_subscribe_task(hass, entry, data)
-
-    except EmptyResponseException:
-        LOGGER.debug("Subscriber: Nest Service sent empty response.")
-        _register_subscribe_task(hass, entry, data)
-
-    except NotAuthenticatedException:
-        LOGGER.debug("Subscriber: 401 exception.")
-        sm.record_failure()
-
-        if sm.should_trigger_reauth:
-            LOGGER.warning(
-                "Subscriber: %d consecutive auth failures, triggering re-authentication",
-                sm.consecutive_failures,
-            )
-            entry.async_start_reauth(hass)
-            return
-
-        LOGGER.debug(
-            "Subscriber: retrying in %ds (attempt %d)",
-            sm.backoff_interval,
-            sm.consecutive_failures,
-        )
-        await asyncio.sleep(sm.backoff_interval)
-
-        await sm.async_refresh_session()
-
-        # Entry may have been unloaded during the backoff sleep
-        if entry.entry_id not in hass.data.get(DOMAIN, {}):
-            return
-
-        _persist_refreshed_cookies(hass, entry, entry_data.client, sm)
-
-        _register_subscribe_task(hass, entry, data)
-
-    except BadCredentialsException:
-        LOGGER.warning(
-            "Bad credentials detected. Please re-authenticate the Nest Protect integration."
-        )
-        entry.async_start_reauth(hass)
-        return
-
-    except NestServiceException:
-        LOGGER.debug("Subscriber: Nest Service error. Updates paused for 2 minutes.")
-        await asyncio.sleep(60 * 2)
-        _register_subscribe_task(hass, entry, data)
-
-    except PynestException:
-        LOGGER.exception(
-            "Unknown pynest exception. Please create an issue on GitHub with your logfile. Updates paused for 1 minute."
-        )
-        await asyncio.sleep(60)
-        _register_subscribe_task(hass, entry, data)
-
-    except asyncio.CancelledError:
-        LOGGER.debug("Subscriber: task cancelled, stopping subscription.")
-        raise
-
-    except Exception:  # pylint: disable=broad-except
-        sm.record_failure()
-        LOGGER.exception(
-            "Unknown exception. Please create an issue on GitHub with your logfile. Updates paused for %ds.",
-            sm.backoff_interval,
-        )
-        await asyncio.sleep(sm.backoff_interval)
-        _register_subscribe_task(hass, entry, data)
-
-
 async def async_remove_config_entry_device(
     hass: HomeAssistant, config_entry: ConfigEntry, device_entry: DeviceEntry
 ) -> bool:
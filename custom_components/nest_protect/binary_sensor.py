@@ -14,7 +14,7 @@ from homeassistant.components.binary_sensor import (
 from homeassistant.helpers.entity import EntityCategory
 
 from . import HomeAssistantNestProtectData
-from .const import DOMAIN
+from .const import ALARM_FIELDS, DOMAIN
 from .entity import NestDescriptiveEntity
 
 
@@ -185,7 +185,11 @@ async def async_setup_entry(hass, entry, async_add_devices):
 
                 entities.append(
                     NestProtectBinarySensor(
-                        device, description, data.areas, data.client
+                        device,
+                        description,
+                        data.areas,
+                        data.client,
+                        buckets=data.buckets,
                     )
                 )
 
@@ -197,6 +201,17 @@ class NestProtectBinarySensor(NestDescriptiveEntity, BinarySensorEntity):
 
     entity_description: NestProtectBinarySensorDescription
 
+    @property
+    def available(self) -> bool:
+        """Return False for an alarm restored from disk until Nest confirms it."""
+        if (
+            self.entity_description.key in ALARM_FIELDS
+            and self._object_key in self.buckets.restored
+        ):
+            return False
+
+        return super().available
+
     @property
     def is_on(self) -> bool:
         """Return the state of the sensor."""
@@ -0,0 +1,49 @@
+"""Apply Nest buckets to the data of a config entry."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+from .pynest.enums import BucketType
+from .pynest.models import Bucket
+
+if TYPE_CHECKING:
+    from . import HomeAssistantNestProtectData
+
+# A handler applies a bucket and returns True if its entities need an update
+type BucketHandler = Callable[[HomeAssistantNestProtectData, Bucket], bool]
+
+# Nest Protect and Temperature Sensors
+DEVICE_BUCKET_TYPES = (BucketType.TOPAZ, BucketType.KRYPTONITE)
+
+
+def _apply_device(entry_data: HomeAssistantNestProtectData, bucket: Bucket) -> bool:
+    """Have the entities of a device read its new bucket."""
+    return True
+
+
+def _apply_areas(entry_data: HomeAssistantNestProtectData, bucket: Bucket) -> bool:
+    """Store the area names of a structure."""
+    for area in bucket.value.wheres or []:
+        entry_data.areas[area.where_id] = area.name
+    return False
+
+
+# Handler per bucket type, other types are ignored
+BUCKET_HANDLERS: dict[BucketType, BucketHandler] = {
+    BucketType.TOPAZ: _apply_device,
+    BucketType.KRYPTONITE: _apply_device,
+    BucketType.WHERE: _apply_areas,
+}
+
+
+def apply_bucket(entry_data: HomeAssistantNestProtectData, bucket: Bucket) -> bool:
+    """Apply a bucket and return True if it is a device update to dispatch.
+
+    The bucket must already be in entry_data.buckets.
+    """
+    if (handler := BUCKET_HANDLERS.get(bucket.type)) is None:
+        return False
+
+    return handler(entry_data, bucket)
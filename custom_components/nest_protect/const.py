@@ -25,8 +25,30 @@ PLATFORMS: list[Platform] = [
     Platform.SWITCH,
 ]
 
+# Dispatched with the bucket when one of its value fields changed
+SIGNAL_BUCKET_FIELD: Final = "{object_key}:{field}"
+
+# Fired when a Nest Protect enters or leaves a smoke, CO or heat alarm
+EVENT_ALARM: Final = f"{DOMAIN}_alarm"
+ALARM_FIELDS: Final = ("smoke_status", "co_status", "heat_status")
+
+# hass.data key of the subscription engine shared by all config entries
+DATA_ENGINE: Final = f"{DOMAIN}_engine"
+ENGINE_STAGGER_INTERVAL: Final = 2  # seconds between reconnects of different accounts
+
+# Split the subscription into one long-poll per structure, and per N objects
+SUBSCRIPTION_SHARD_BY_STRUCTURE: Final = True
+SUBSCRIPTION_SHARD_SIZE: Final = 0  # objects per shard, 0 for no limit
+# Open the next long-poll before dispatching the updates of the previous one
+SUBSCRIPTION_OVERLAP: Final = True
+
 STORAGE_VERSION: Final = 1
 STORAGE_KEY_FORMAT: Final = "nest_protect_{entry_id}"
+SNAPSHOT_SAVE_DELAY: Final = 30  # seconds to batch bucket updates into one save
+RECONCILE_MAX_ATTEMPTS: Final = 5  # live app launch attempts after a warm start
 SESSION_EXPIRY_BUFFER_SECONDS: Final = 300  # 5 minutes
 MAX_AUTH_FAILURES: Final = 3
 BACKOFF_INTERVALS: Final = (30, 60, 120, 300, 600)  # seconds, capped at 10 min
+SESSION_RENEWAL_LEAD_SECONDS: Final = 120  # renew before the expiry buffer kicks in
+SESSION_RENEWAL_MIN_INTERVAL: Final = 60  # seconds between successful renewals
+SESSION_RENEWAL_RETRY_INTERVALS: Final = (10, 30, 60, 120, 300)  # seconds, jittered
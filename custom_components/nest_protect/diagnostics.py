@@ -12,7 +12,9 @@ from homeassistant.helpers.device_registry import DeviceEntry
 
 from . import HomeAssistantNestProtectData
 from .const import CONF_COOKIES, CONF_ISSUE_TOKEN, CONF_REFRESH_TOKEN, DOMAIN
+from .engine import async_get_engine
 from .pynest.const import FULL_NEST_REQUEST
+from .pynest.decoder import LazyBucketValue
 
 TO_REDACT = [
     "access_token",
@@ -48,6 +50,17 @@ TO_REDACT = [
 ]
 
 
+def _asdict(obj: Any) -> dict[str, Any]:
+    """Return a dataclass as a dict, with lazy bucket values as their payload."""
+    return dataclasses.asdict(
+        obj,
+        dict_factory=lambda items: {
+            key: value.raw if isinstance(value, LazyBucketValue) else value
+            for key, value in items
+        },
+    )
+
+
 async def async_get_config_entry_diagnostics(
     hass: HomeAssistant, entry: ConfigEntry
 ) -> dict[str, Any]:
@@ -73,13 +86,24 @@ async def async_get_config_entry_diagnostics(
     nest = await client.authenticate(auth.access_token)
 
     data = {
-        "app_launch": dataclasses.asdict(
+        "app_launch": _asdict(
             await client.get_first_data(
                 nest.access_token, nest.userid, request=FULL_NEST_REQUEST
             )
         )
     }
 
+    snapshot = entry_data.buckets.snapshot()
+    data["state"] = {
+        "version": snapshot.version,
+        "revisions": {
+            key: bucket.object_revision for key, bucket in snapshot.buckets.items()
+        },
+    }
+
+    if health := async_get_engine(hass).health().get(entry.entry_id):
+        data["subscription"] = dataclasses.asdict(health)
+
     return async_redact_data(data, TO_REDACT)
 
 
@@ -113,7 +137,7 @@ async def async_get_device_diagnostics(
             "firmware": device.sw_version,
             "model": device.model,
         },
-        "app_launch": dataclasses.asdict(
+        "app_launch": _asdict(
             await client.get_first_data(nest.access_token, nest.userid)
         ),
     }
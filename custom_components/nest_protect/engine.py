@@ -0,0 +1,185 @@
+"""Subscription engine shared by all Nest Protect config entries."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import math
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from homeassistant.core import HomeAssistant
+
+from .const import DATA_ENGINE, ENGINE_STAGGER_INTERVAL, LOGGER
+from .pynest.const import SHARED_CONNECTION_POOLS
+from .pynest.enums import CircuitState
+from .pynest.pools import NestConnectionPools
+from .session import NestSessionManager
+from .subscriber import NestSubscriber, SubscriberState, SubscriberStats
+
+
+@dataclass
+class AccountHealth:
+    """Health of one Nest account in the engine."""
+
+    subscriber_state: SubscriberState
+    stats: SubscriberStats
+    auth_failures: int
+    renewal_failures: int
+    next_renewal: float | None  # seconds from now, None once renewal stopped
+    circuit_state: CircuitState
+    read_timeout: float  # seconds of silence before a long-poll counts as stalled
+    stalls: list[float]  # durations of the most recent stalls, in seconds
+
+
+@dataclass
+class _Account:
+    """A config entry registered with the engine."""
+
+    session_manager: NestSessionManager
+    subscriber: NestSubscriber
+    on_renewed: Callable[[], None] | None = None
+    renew_at: float = 0.0
+
+
+class NestSubscriptionEngine:
+    """Run the subscriptions and session renewals of every Nest account.
+
+    All accounts share one set of connection pools, so their puts and auth
+    calls reuse the same sockets. Credentials of all accounts are renewed by a
+    single scheduler task, and reconnects, session refreshes and renewals take
+    turns on a stagger gate so accounts never hit Nest at the same moment.
+    Every account still keeps its own long-poll requests open.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        pools: NestConnectionPools | None = None,
+        stagger: float = ENGINE_STAGGER_INTERVAL,
+    ) -> None:
+        """Initialize the engine."""
+        self.hass = hass
+        self.pools = pools or NestConnectionPools(SHARED_CONNECTION_POOLS)
+        self._stagger = stagger
+        self._next_turn = 0.0
+        self._accounts: dict[str, _Account] = {}
+        self._renewal_task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        """Return the number of registered accounts."""
+        return len(self._accounts)
+
+    def add_account(
+        self,
+        entry_id: str,
+        session_manager: NestSessionManager,
+        subscriber: NestSubscriber,
+        on_renewed: Callable[[], None] | None = None,
+    ) -> None:
+        """Start the subscription and session renewal of an account."""
+        account = _Account(session_manager, subscriber, on_renewed)
+        account.renew_at = self._loop_time() + session_manager.next_renewal_delay()
+        self._accounts[entry_id] = account
+
+        subscriber.start()
+
+        if self._renewal_task is None or self._renewal_task.done():
+            self._renewal_task = self.hass.async_create_background_task(
+                self._async_renewal_loop(), "nest_protect session renewal"
+            )
+        self._wakeup.set()
+
+    async def async_remove_account(self, entry_id: str) -> None:
+        """Stop the subscription and session renewal of an account."""
+        if (account := self._accounts.pop(entry_id, None)) is None:
+            return
+
+        await account.subscriber.async_stop()
+        self._wakeup.set()
+
+    async def async_close(self) -> None:
+        """Stop all accounts and close the shared connection pools."""
+        for entry_id in list(self._accounts):
+            await self.async_remove_account(entry_id)
+
+        if task := self._renewal_task:
+            self._renewal_task = None
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+        await self.pools.async_close()
+
+    async def async_wait_turn(self) -> None:
+        """Wait for the next free slot, spacing calls by the stagger interval."""
+        now = self._loop_time()
+        turn = max(now, self._next_turn)
+        self._next_turn = turn + self._stagger
+
+        # Always yield, so callers can't starve the event loop
+        await asyncio.sleep(turn - now)
+
+    def health(self) -> dict[str, AccountHealth]:
+        """Return the health of every account, keyed by config entry id."""
+        now = self._loop_time()
+
+        return {
+            entry_id: AccountHealth(
+                subscriber_state=account.subscriber.state,
+                stats=account.subscriber.stats,
+                auth_failures=account.session_manager.consecutive_failures,
+                renewal_failures=account.session_manager.renewal_failures,
+                next_renewal=(
+                    None
+                    if math.isinf(account.renew_at)
+                    else max(account.renew_at - now, 0)
+                ),
+                circuit_state=account.subscriber.entry_data.client.breaker.state,
+                read_timeout=account.subscriber.watchdog.read_timeout,
+                stalls=list(account.subscriber.watchdog.stalls),
+            )
+            for entry_id, account in self._accounts.items()
+        }
+
+    async def _async_renewal_loop(self) -> None:
+        """Renew the account that is due first, one account at a time."""
+        while self._accounts:
+            self._wakeup.clear()
+            entry_id, account = min(
+                self._accounts.items(), key=lambda item: item[1].renew_at
+            )
+            delay = account.renew_at - self._loop_time()
+
+            if delay > 0:
+                # Wake up early when accounts are added or removed
+                with contextlib.suppress(TimeoutError):
+                    async with asyncio.timeout(None if math.isinf(delay) else delay):
+                        await self._wakeup.wait()
+                continue
+
+            await self.async_wait_turn()
+
+            if self._accounts.get(entry_id) is not account:
+                continue
+
+            LOGGER.debug("Engine: renewing Nest session of %s", entry_id)
+
+            if await account.session_manager.async_renew(account.on_renewed):
+                account.renew_at = (
+                    self._loop_time() + account.session_manager.next_renewal_delay()
+                )
+            else:
+                account.renew_at = math.inf
+
+    def _loop_time(self) -> float:
+        return asyncio.get_running_loop().time()
+
+
+def async_get_engine(hass: HomeAssistant) -> NestSubscriptionEngine:
+    """Return the engine shared by all config entries, creating it if needed."""
+    if (engine := hass.data.get(DATA_ENGINE)) is None:
+        engine = hass.data[DATA_ENGINE] = NestSubscriptionEngine(hass)
+
+    return engine
@@ -2,19 +2,19 @@
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import dataclasses
+from typing import Any
 
 from homeassistant.core import callback
 from homeassistant.helpers import device_registry as dr
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import DeviceInfo, Entity, EntityDescription
 
-from .const import ATTRIBUTION, DOMAIN
+from .const import ATTRIBUTION, DOMAIN, SIGNAL_BUCKET_FIELD
 from .pynest.client import NestClient
 from .pynest.models import Bucket
-
-if TYPE_CHECKING:
-    from .session import NestSessionManager
+from .pynest.state import BucketStore
+from .pynest.write_queue import NestWriteQueue
 
 
 class NestEntity(Entity):
@@ -29,17 +29,25 @@ class NestEntity(Entity):
         description: EntityDescription,
         areas: dict[str, str],
         client: NestClient,
+        *,
+        buckets: BucketStore,
     ):
         """Initialize."""
         self.entity_description = description
-        self.bucket = bucket
+        self.buckets = buckets
         self.client = client
-        self.area = areas.get(self.bucket.value["where_id"])
+        self.area = areas.get(bucket.value["where_id"])
+        self._object_key = bucket.object_key
 
         self._attr_unique_id = bucket.object_key
         self._attr_attribution = ATTRIBUTION
         self._attr_device_info = self.generate_device_info()
 
+    @property
+    def bucket(self) -> Bucket:
+        """Return the current bucket of the device from the state store."""
+        return self.buckets.get(self._object_key)
+
     def _device_label(self) -> str:
         """Generate device label from description or area."""
         if label := self.bucket.value.get("description"):
@@ -97,9 +105,7 @@ class NestEntity(Entity):
 
     @callback
     def update_callback(self, bucket: Bucket):
-        """Update the entities state."""
-
-        self.bucket = bucket
+        """Update the entities state, the bucket is already in the state store."""
         self.async_write_ha_state()
 
 
@@ -112,14 +118,36 @@ class NestDescriptiveEntity(NestEntity):
         description: EntityDescription,
         areas: dict[str, str],
         client: NestClient,
+        *,
+        buckets: BucketStore,
     ) -> None:
         """Initialize the device."""
-        super().__init__(bucket, description, areas, client)
+        super().__init__(bucket, description, areas, client, buckets=buckets)
         self._attr_unique_id = f"{super().unique_id}-{self.entity_description.key}"
 
+    async def async_added_to_hass(self) -> None:
+        """Register for changes of the value field this entity shows."""
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                SIGNAL_BUCKET_FIELD.format(
+                    object_key=self.bucket.object_key,
+                    field=self.entity_description.key,
+                ),
+                self.update_callback,
+            )
+        )
+
 
 class NestUpdatableEntity(NestDescriptiveEntity):
-    """Entity that can push state updates to Nest with session management."""
+    """Entity that can push state updates to Nest through the write queue.
+
+    Writes are applied optimistically on top of the stored bucket and kept
+    on top of incoming updates until Nest reports the revision returned by
+    /v6/put. A failed write rolls the entity back to the confirmed state.
+    """
+
+    _optimistic_bucket: Bucket | None = None
 
     def __init__(
         self,
@@ -127,18 +155,132 @@ class NestUpdatableEntity(NestDescriptiveEntity):
         description: EntityDescription,
         areas: dict[str, str],
         client: NestClient,
-        session_manager: NestSessionManager,
+        write_queue: NestWriteQueue,
+        *,
+        buckets: BucketStore,
     ) -> None:
         """Initialize the updatable entity."""
-        super().__init__(bucket, description, areas, client)
-        self.session_manager = session_manager
+        super().__init__(bucket, description, areas, client, buckets=buckets)
+        self.write_queue = write_queue
+        self._optimistic_value: dict[str, Any] = {}
+        self._optimistic_revision: int | None = None
+        self._pending_writes = 0
 
     async def _async_update_objects(self, objects: list[dict]) -> dict:
-        """Update objects with automatic session refresh."""
-        await self.session_manager.ensure_session()
-        return await self.client.update_objects(
-            self.client.nest_session.access_token,
-            self.client.nest_session.userid,
-            self.client.transport_url,
-            objects,
+        """Queue object updates, coalesced with other writes into one put."""
+        object_key = self._object_key
+        written: dict[str, Any] = {}
+
+        for obj in objects:
+            if obj["object_key"] == object_key and obj.get("op") == "MERGE":
+                written.update(obj["value"])
+
+        if not written:
+            return await self.write_queue.async_put(objects)
+
+        self._optimistic_value.update(written)
+        self._pending_writes += 1
+        self._async_apply_bucket()
+
+        try:
+            result = await self.write_queue.async_put(objects)
+        except Exception:
+            self._pending_writes -= 1
+            self._async_rollback(written)
+            raise
+
+        self._pending_writes -= 1
+        self._async_acknowledge(_acknowledged_revision(result, object_key))
+
+        return result
+
+    @property
+    def bucket(self) -> Bucket:
+        """Return the stored bucket with pending optimistic values applied."""
+        return self._optimistic_bucket or super().bucket
+
+    async def async_added_to_hass(self) -> None:
+        """Also register for every update of the device."""
+        await super().async_added_to_hass()
+        # The acknowledged revision may not change this entity's field
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass, self._object_key, self._async_device_updated
+            )
         )
+
+    @callback
+    def update_callback(self, bucket: Bucket):
+        """Update the entities state, keeping unacknowledged writes on top."""
+        self._async_reconcile()
+        self._async_apply_bucket()
+
+    @callback
+    def _async_device_updated(self, bucket: Bucket) -> None:
+        """Drop optimistic values once any update confirmed the write."""
+        if self._optimistic_revision is not None and self._async_reconcile():
+            self._async_apply_bucket()
+
+    @callback
+    def _async_apply_bucket(self) -> None:
+        """Show the confirmed bucket with pending optimistic values applied."""
+        self._optimistic_bucket = None
+
+        if self._optimistic_value:
+            bucket = self.bucket
+            self._optimistic_bucket = dataclasses.replace(
+                bucket, value={**bucket.value, **self._optimistic_value}
+            )
+
+        self.async_write_ha_state()
+
+    @callback
+    def _async_reconcile(self) -> bool:
+        """Drop optimistic values once Nest confirmed every acknowledged write."""
+        if (
+            self._pending_writes
+            or self._optimistic_revision is None
+            or self.buckets.get(self._object_key).object_revision
+            < self._optimistic_revision
+        ):
+            return False
+
+        self._optimistic_value = {}
+        self._optimistic_revision = None
+        return True
+
+    @callback
+    def _async_acknowledge(self, revision: int | None) -> None:
+        """Keep optimistic values until the acknowledged revision arrives."""
+        if revision is None:
+            # Without a revision in the put response, wait for any newer update
+            revision = self.buckets.get(self._object_key).object_revision + 1
+
+        self._optimistic_revision = max(self._optimistic_revision or 0, revision)
+
+        if self._async_reconcile():
+            self._async_apply_bucket()
+
+    @callback
+    def _async_rollback(self, written: dict[str, Any]) -> None:
+        """Drop the values of a failed write and show the confirmed state."""
+        for key, value in written.items():
+            if self._optimistic_value.get(key) == value:
+                self._optimistic_value.pop(key)
+
+        if not self._optimistic_value:
+            self._optimistic_revision = None
+
+        self._async_apply_bucket()
+
+
+def _acknowledged_revision(result: Any, object_key: str) -> int | None:
+    """Return the revision /v6/put reported for an object, if any."""
+    if not isinstance(result, dict):
+        return None
+
+    for obj in result.get("objects") or []:
+        if obj.get("object_key") == object_key:
+            return obj.get("object_revision")
+
+    return None
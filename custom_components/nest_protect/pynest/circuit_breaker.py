@@ -0,0 +1,132 @@
+"""Circuit breaker for Nest service errors."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import time
+
+from .const import (
+    CIRCUIT_BASE_WINDOW,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_MAX_WINDOW,
+    CIRCUIT_PROBE_TIMEOUT,
+)
+from .enums import CircuitState
+from .retry import jitter
+
+_LOGGER = logging.getLogger(__package__)
+
+
+class CircuitBreaker:
+    """Stop calling Nest while it keeps failing, and probe for its recovery.
+
+    The circuit opens after failure_threshold consecutive service errors and
+    stays open for a jittered window that doubles every time it reopens. Once
+    the window has passed, a single request is let through as a half-open
+    probe. Its success closes the circuit, its failure opens the next window.
+    A long-poll only answers once an object changes, so a probe that hasn't
+    failed within probe_timeout counts as a success.
+
+    One breaker is shared by the subscribe and put paths of a NestClient.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        base_window: float = CIRCUIT_BASE_WINDOW,
+        max_window: float = CIRCUIT_MAX_WINDOW,
+        probe_timeout: float = CIRCUIT_PROBE_TIMEOUT,
+    ) -> None:
+        """Initialize the breaker."""
+        self.failure_threshold = failure_threshold
+        self.base_window = base_window
+        self.max_window = max_window
+        self.probe_timeout = probe_timeout
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.opens = 0
+        self._open_until = 0.0
+        self._probe_until = 0.0
+        self._changed = asyncio.Event()
+
+    def retry_after(self) -> float:
+        """Return the seconds until a request may be sent, 0 if it may go now."""
+        now = time.monotonic()
+
+        if self.state == CircuitState.OPEN:
+            return max(self._open_until - now, 0)
+
+        if self.state == CircuitState.HALF_OPEN:
+            return max(self._probe_until - now, 0)
+
+        return 0
+
+    def admit(self) -> float:
+        """Admit a request and return 0, or return the seconds to wait."""
+        now = time.monotonic()
+
+        if self.state == CircuitState.OPEN:
+            if now < self._open_until:
+                return self._open_until - now
+
+            # This request is the probe
+            self.state = CircuitState.HALF_OPEN
+            self._probe_until = now + self.probe_timeout
+            _LOGGER.debug("Circuit half-open, probing Nest")
+            return 0
+
+        if self.state == CircuitState.HALF_OPEN:
+            if now < self._probe_until:
+                return self._probe_until - now
+
+            self.record_success()
+
+        return 0
+
+    async def async_wait(self) -> None:
+        """Wait until a request is admitted."""
+        while (delay := self.admit()) > 0:
+            changed = self._changed
+
+            # Wake up early when the probe settles
+            with contextlib.suppress(TimeoutError):
+                async with asyncio.timeout(delay):
+                    await changed.wait()
+
+    def record_success(self) -> None:
+        """Close the circuit after a request that reached a healthy service."""
+        self.failures = 0
+
+        if self.state == CircuitState.CLOSED:
+            return
+
+        _LOGGER.debug("Circuit closed, Nest recovered")
+        self.opens = 0
+        self._set_state(CircuitState.CLOSED)
+
+    def record_failure(self) -> None:
+        """Count a service error and open the circuit when it trips."""
+        self.failures += 1
+
+        if (
+            self.state != CircuitState.HALF_OPEN
+            and self.failures < self.failure_threshold
+        ):
+            return
+
+        window = jitter(min(self.max_window, self.base_window * 2**self.opens))
+        self.opens += 1
+        self._open_until = time.monotonic() + window
+        self._set_state(CircuitState.OPEN)
+
+        _LOGGER.debug(
+            "Circuit open for %.1fs after %d service errors", window, self.failures
+        )
+
+    def _set_state(self, state: CircuitState) -> None:
+        """Change the state and wake up the waiters."""
+        self.state = state
+        self._changed.set()
+        self._changed = asyncio.Event()
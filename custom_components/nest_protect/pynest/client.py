@@ -2,25 +2,38 @@
 
 from __future__ import annotations
 
+import errno
 import logging
+import re
 import time
 from random import randint
 from types import TracebackType
-from typing import Any, cast
-
-from aiohttp import ClientSession, ClientTimeout, ContentTypeError, FormData
+from typing import Any
+
+from aiohttp import (
+    ClientOSError,
+    ClientResponse,
+    ClientSession,
+    ContentTypeError,
+    FormData,
+)
 
+from .circuit_breaker import CircuitBreaker
+from .codec import json_dumps, json_loads
 from .const import (
     APP_LAUNCH_URL_FORMAT,
     DEFAULT_NEST_ENVIRONMENT,
+    DEFAULT_RETRY_POLICIES,
     NEST_AUTH_URL_JWT,
     NEST_REQUEST,
     TOKEN_URL,
     USER_AGENT,
 )
+from .enums import TrafficClass
 from .exceptions import (
     BadCredentialsException,
     BadGatewayException,
+    CircuitOpenException,
     EmptyResponseException,
     GatewayTimeoutException,
     NestServiceException,
@@ -29,16 +42,49 @@ from .exceptions import (
 )
 from .models import (
     Bucket,
+    ConnectionPoolSettings,
     FirstDataAPIResponse,
     GoogleAuthResponse,
     GoogleAuthResponseForCookies,
     NestAuthResponse,
     NestEnvironment,
     NestResponse,
+    RetryPolicy,
+    SubscribeResponse,
 )
+from .pools import NestConnectionPools
+from .retry import retryable
+from .revisions import BucketRevisionIndex
+from .watchdog import LongPollWatchdog
 
 _LOGGER = logging.getLogger(__package__)
 
+JSON_CONTENT_TYPE = "application/json"
+_JSON_CONTENT_TYPE_RE = re.compile(r"^application/(?:[\w.+-]+?\+)?json")
+
+
+async def _read_json(response: ClientResponse) -> Any:
+    """Decode a JSON response body from raw bytes with the fastest codec.
+
+    Mirrors ClientResponse.json(): raises ContentTypeError for non-JSON content
+    types and returns None for an empty body.
+    """
+    body = await response.read()
+
+    if not _JSON_CONTENT_TYPE_RE.match(response.content_type):
+        raise ContentTypeError(
+            response.request_info,
+            response.history,
+            status=response.status,
+            message=f"Attempt to decode JSON with unexpected mimetype: {response.content_type}",
+            headers=response.headers,
+        )
+
+    if not body.strip():
+        return None
+
+    return json_loads(body)
+
 
 def merge_cookies(original: str, new_cookies: dict[str, str]) -> str:
     """Merge new cookie values into an existing cookie header string.
@@ -88,14 +134,37 @@ class NestClient:
         # issue_token: str | None = None,
         # cookies: str | None = None,
         environment: NestEnvironment = DEFAULT_NEST_ENVIRONMENT,
+        connection_pools: (
+            dict[TrafficClass, ConnectionPoolSettings] | NestConnectionPools | None
+        ) = None,
+        retry_policies: dict[str, RetryPolicy] | None = None,
     ) -> None:
-        """Initialize NestClient."""
+        """Initialize NestClient.
+
+        Traffic classes listed in connection_pools get a dedicated session with
+        its own connector, all other requests go through the shared session.
+        Pass a NestConnectionPools instance to share the pools between clients.
+        retry_policies maps method names to their retry budget.
+        """
 
         self.session = session or ClientSession()
         # self.refresh_token = refresh_token
         # self.issue_token = issue_token
         # self.cookies = cookies
         self.environment = environment
+        self.retry_policies = (
+            DEFAULT_RETRY_POLICIES if retry_policies is None else retry_policies
+        )
+
+        if isinstance(connection_pools, NestConnectionPools):
+            self.pools = connection_pools
+            self._owns_pools = False
+        else:
+            self.pools = NestConnectionPools(connection_pools)
+            self._owns_pools = True
+
+        self.watchdog = LongPollWatchdog()
+        self.breaker = CircuitBreaker()
 
     async def __aenter__(self) -> NestClient:
         """__aenter__."""
@@ -108,8 +177,41 @@ class NestClient:
         traceback: TracebackType | None,
     ) -> None:
         """__aexit__."""
+        await self.async_close()
         await self.session.close()
 
+    async def async_close(self) -> None:
+        """Close the dedicated connection pools, leaving the shared session open.
+
+        Pools shared with other clients are left open for their owner to close.
+        """
+        if self._owns_pools:
+            await self.pools.async_close()
+
+    def _session_for(self, traffic_class: TrafficClass) -> ClientSession:
+        """Return the session to use for a traffic class."""
+        return self.pools.session_for(traffic_class) or self.session
+
+    async def _raise_for_status(self, response: ClientResponse, action: str) -> None:
+        """Raise for a 401 or a server error, recording the latter on the breaker."""
+        if response.status == 401:
+            raise NotAuthenticatedException(await response.text())
+
+        if response.status < 500:
+            return
+
+        self.breaker.record_failure()
+
+        if response.status == 504:
+            raise GatewayTimeoutException(await response.text())
+
+        if response.status == 502:
+            raise BadGatewayException(await response.text())
+
+        raise NestServiceException(
+            f"{response.status} error while {action} - {await response.text()}"
+        )
+
     async def get_access_token(self) -> GoogleAuthResponse:
         """Get a Nest access token."""
 
@@ -120,6 +222,7 @@ class NestClient:
 
         return self.auth
 
+    @retryable("get_access_token_from_refresh_token")
     async def get_access_token_from_refresh_token(
         self, refresh_token: str | None = None
     ) -> GoogleAuthResponse:
@@ -131,7 +234,7 @@ class NestClient:
         if not self.refresh_token:
             raise Exception("No refresh token")
 
-        async with self.session.post(
+        async with self._session_for(TrafficClass.AUTH).post(
             TOKEN_URL,
             data=FormData(
                 {
@@ -145,7 +248,7 @@ class NestClient:
                 "Content-Type": "application/x-www-form-urlencoded",
             },
         ) as response:
-            result = await response.json()
+            result = await _read_json(response)
 
             if "error" in result:
                 if result["error"] == "invalid_grant":
@@ -157,6 +260,7 @@ class NestClient:
 
             return self.auth
 
+    @retryable("get_access_token_from_cookies")
     async def get_access_token_from_cookies(
         self, issue_token: str, cookies: str
     ) -> GoogleAuthResponse:
@@ -170,7 +274,7 @@ class NestClient:
 
         self.refreshed_cookies = None
 
-        async with self.session.get(
+        async with self._session_for(TrafficClass.AUTH).get(
             issue_token,
             headers={
                 "Sec-Fetch-Mode": "cors",
@@ -188,7 +292,7 @@ class NestClient:
             if new_cookies:
                 self.refreshed_cookies = merge_cookies(cookies, new_cookies)
 
-            result = await response.json()
+            result = await _read_json(response)
 
             if "error" in result:
                 # Cookie method
@@ -203,10 +307,11 @@ class NestClient:
 
             return self.auth
 
+    @retryable("authenticate")
     async def authenticate(self, access_token: str) -> NestResponse:
         """Start a new Nest session with an access token."""
 
-        async with self.session.post(
+        async with self._session_for(TrafficClass.AUTH).post(
             NEST_AUTH_URL_JWT,
             data=FormData(
                 {
@@ -222,10 +327,10 @@ class NestClient:
                 "Referer": self.environment.host,
             },
         ) as response:
-            result = await response.json()
+            result = await _read_json(response)
             nest_auth = NestAuthResponse(**result)
 
-        async with self.session.get(
+        async with self._session_for(TrafficClass.AUTH).get(
             self.environment.host + "/session",
             headers={
                 "Authorization": f"Basic {nest_auth.jwt}",
@@ -234,7 +339,7 @@ class NestClient:
             },
         ) as response:
             try:
-                nest_response = await response.json()
+                nest_response = await _read_json(response)
             except ContentTypeError as exception:
                 nest_response = await response.text()
 
@@ -273,20 +378,22 @@ class NestClient:
 
             return self.nest_session
 
+    @retryable("get_first_data")
     async def get_first_data(
         self, nest_access_token: str, user_id: str, request: dict = NEST_REQUEST
     ) -> FirstDataAPIResponse:
         """Get first data."""
-        async with self.session.post(
+        async with self._session_for(TrafficClass.AUTH).post(
             APP_LAUNCH_URL_FORMAT.format(host=self.environment.host, user_id=user_id),
-            json=request,
+            data=json_dumps(request),
             headers={
                 "Authorization": f"Basic {nest_access_token}",
+                "Content-Type": JSON_CONTENT_TYPE,
                 "X-nl-user-id": user_id,
                 "X-nl-protocol-version": str(1),
             },
         ) as response:
-            result = await response.json()
+            result = await _read_json(response)
 
             if "2fa_enabled" in result:
                 result["_2fa_enabled"] = result.pop("2fa_enabled")
@@ -311,63 +418,90 @@ class NestClient:
         nest_access_token: str,
         user_id: str,
         transport_url: str,
-        updated_buckets: dict,
-    ) -> Any:
-        """Subscribe for data."""
-        timeout = 600
-
-        objects = []
-        for bucket in updated_buckets:
-            bucket = cast(Bucket, bucket)
-            objects.append(
+        updated_buckets: list[Bucket] | BucketRevisionIndex,
+    ) -> SubscribeResponse:
+        """Subscribe for data.
+
+        The watchdog cuts the long-poll off with a socket read timeout once it
+        stays silent past the observed server hold time, and records the stall.
+        Callers wait on breaker.async_wait() first, the result is recorded on
+        the breaker.
+        """
+        watchdog = self.watchdog
+
+        if isinstance(updated_buckets, BucketRevisionIndex):
+            objects = updated_buckets.objects
+        else:
+            objects = [
                 {
                     "object_key": bucket.object_key,
                     "object_revision": bucket.object_revision,
                     "object_timestamp": bucket.object_timestamp,
                 }
-            )
-
-        # TODO throw better exceptions
-        async with self.session.post(
-            f"{transport_url}/v6/subscribe",
-            timeout=ClientTimeout(total=timeout),
-            json={
-                "objects": objects,
-                # "timeout": timeout,
-                # "sessionID": f"ios-${user_id}.{random}.{epoch}",
-            },
-            headers={
-                "Authorization": f"Basic {nest_access_token}",
-                "X-nl-user-id": user_id,
-                "X-nl-protocol-version": str(1),
-            },
-        ) as response:
-            _LOGGER.debug("Data received via subscriber (status: %s)", response.status)
+                for bucket in updated_buckets
+            ]
+
+        started = time.monotonic()
+
+        try:
+            # TODO throw better exceptions
+            async with self._session_for(TrafficClass.LONG_POLL).post(
+                f"{transport_url}/v6/subscribe",
+                timeout=watchdog.timeout(),
+                data=json_dumps(
+                    {
+                        "objects": objects,
+                        # "timeout": timeout,
+                        # "sessionID": f"ios-${user_id}.{random}.{epoch}",
+                    }
+                ),
+                headers={
+                    "Authorization": f"Basic {nest_access_token}",
+                    "Content-Type": JSON_CONTENT_TYPE,
+                    "X-nl-user-id": user_id,
+                    "X-nl-protocol-version": str(1),
+                },
+            ) as response:
+                _LOGGER.debug(
+                    "Data received via subscriber (status: %s)", response.status
+                )
 
-            if response.status == 401:
-                raise NotAuthenticatedException(await response.text())
+                await self._raise_for_status(response, "subscribing")
 
-            if response.status == 504:
-                raise GatewayTimeoutException(await response.text())
+                if response.status == 200 and response.content_type == "text/plain":
+                    # The hold ran out without changes, the service is up
+                    watchdog.record_hold(time.monotonic() - started)
+                    self.breaker.record_success()
+                    raise EmptyResponseException(await response.text())
 
-            if response.status == 502:
-                raise BadGatewayException(await response.text())
+                try:
+                    result = await _read_json(response)
+                except ContentTypeError as error:
+                    result = await response.text()
 
-            if response.status == 200 and response.content_type == "text/plain":
-                raise EmptyResponseException(await response.text())
+                    raise NestServiceException(
+                        f"{response.status} error while subscribing - {result}"
+                    ) from error
 
-            try:
-                result = await response.json()
-            except ContentTypeError as error:
-                result = await response.text()
+                if not isinstance(result, dict):
+                    raise NestServiceException(
+                        f"{response.status} error while subscribing - {result!r}"
+                    )
 
-                raise NestServiceException(
-                    f"{response.status} error while subscribing - {result}"
-                ) from error
+                if 200 <= response.status < 300:
+                    self.breaker.record_success()
 
-            # TODO type object
-            return result
+                return SubscribeResponse(objects=result.get("objects"))
+        except TimeoutError:
+            watchdog.record_stall(time.monotonic() - started)
+            raise
+        except ClientOSError as err:
+            # TCP keepalive found the peer gone
+            if err.errno == errno.ETIMEDOUT:
+                watchdog.record_stall(time.monotonic() - started)
+            raise
 
+    @retryable("update_objects")
     async def update_objects(
         self,
         nest_access_token: str,
@@ -375,29 +509,37 @@ class NestClient:
         transport_url: str,
         objects_to_update: dict,
     ) -> Any:
-        """Subscribe for data."""
+        """Subscribe for data.
+
+        Raises CircuitOpenException without sending while the breaker is open.
+        """
+
+        if (retry_after := self.breaker.admit()) > 0:
+            raise CircuitOpenException(retry_after)
 
         epoch = int(time.time())
         random = str(randint(100, 999))
 
         # TODO throw better exceptions
-        async with self.session.post(
+        async with self._session_for(TrafficClass.WRITE).post(
             f"{transport_url}/v6/put",
-            json={
-                "session": f"ios-${user_id}.{random}.{epoch}",
-                "objects": objects_to_update,
-            },
+            data=json_dumps(
+                {
+                    "session": f"ios-${user_id}.{random}.{epoch}",
+                    "objects": objects_to_update,
+                }
+            ),
             headers={
                 "Authorization": f"Basic {nest_access_token}",
+                "Content-Type": JSON_CONTENT_TYPE,
                 "X-nl-user-id": user_id,
                 "X-nl-protocol-version": str(1),
             },
         ) as response:
-            if response.status == 401:
-                raise NotAuthenticatedException(await response.text())
+            await self._raise_for_status(response, "updating")
 
             try:
-                result = await response.json()
+                result = await _read_json(response)
             except ContentTypeError as err:
                 result = await response.text()
 
@@ -405,6 +547,8 @@ class NestClient:
                     f"{response.status} error while subscribing - {result}"
                 ) from err
 
+            self.breaker.record_success()
+
             # TODO type object
 
             return result
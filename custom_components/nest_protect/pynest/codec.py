@@ -0,0 +1,66 @@
+"""JSON codec for Nest request and response bodies.
+
+App launch and subscribe payloads grow with every device on the account, so
+bodies are decoded straight from bytes with orjson or msgspec when one of them
+is installed. The standard library is used as a fallback.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(frozen=True)
+class JsonCodec:
+    """A JSON backend that decodes from and encodes to bytes."""
+
+    name: str
+    loads: Callable[[bytes | str], Any]
+    dumps: Callable[[Any], bytes]
+
+
+def _orjson_codec() -> JsonCodec:
+    import orjson
+
+    return JsonCodec("orjson", orjson.loads, orjson.dumps)
+
+
+def _msgspec_codec() -> JsonCodec:
+    import msgspec
+
+    decoder = msgspec.json.Decoder()
+    encoder = msgspec.json.Encoder()
+
+    return JsonCodec("msgspec", decoder.decode, encoder.encode)
+
+
+def _stdlib_codec() -> JsonCodec:
+    encoder = json.JSONEncoder(separators=(",", ":"))
+
+    return JsonCodec(
+        "json", json.loads, lambda obj: encoder.encode(obj).encode("utf-8")
+    )
+
+
+def available_codecs() -> list[JsonCodec]:
+    """Return the installed JSON backends, fastest first."""
+    codecs: list[JsonCodec] = []
+
+    for factory in (_orjson_codec, _msgspec_codec):
+        try:
+            codecs.append(factory())
+        except ImportError:
+            continue
+
+    codecs.append(_stdlib_codec())
+
+    return codecs
+
+
+CODEC = available_codecs()[0]
+
+json_loads = CODEC.loads
+json_dumps = CODEC.dumps
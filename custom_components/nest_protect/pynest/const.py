@@ -1,7 +1,7 @@
 """Constants used by PyNest."""
 
-from .enums import BucketType, Environment
-from .models import NestEnvironment
+from .enums import BucketType, Environment, TrafficClass
+from .models import ConnectionPoolSettings, NestEnvironment, RetryPolicy
 
 USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_0) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/77.0.3865.120 Safari/537.36"
 
@@ -66,3 +66,60 @@ FULL_NEST_REQUEST = {
     ],
     "known_bucket_versions": [],
 }
+
+# Writes arriving within this window are merged into a single /v6/put
+WRITE_COALESCE_WINDOW = 0.05  # seconds
+WRITE_COALESCE_MAX_OBJECTS = 100
+
+# A long-poll is silent until the server responds, so probe its socket to find
+# peers that vanished without closing the connection (~60s to detect)
+LONG_POLL_TCP_KEEPALIVE = {
+    "tcp_keepalive_idle": 30,
+    "tcp_keepalive_interval": 10,
+    "tcp_keepalive_count": 3,
+}
+
+# Dedicated pools keep interactive puts from queueing behind long-polls. The
+# write pool keeps its sockets to transport_url alive between user actions.
+DEFAULT_CONNECTION_POOLS: dict[TrafficClass, ConnectionPoolSettings] = {
+    TrafficClass.AUTH: ConnectionPoolSettings(limit=4, keepalive_timeout=15),
+    TrafficClass.LONG_POLL: ConnectionPoolSettings(
+        limit=4, keepalive_timeout=30, **LONG_POLL_TCP_KEEPALIVE
+    ),
+    TrafficClass.WRITE: ConnectionPoolSettings(
+        limit=8, limit_per_host=8, keepalive_timeout=120
+    ),
+}
+
+# Retry budgets per NestClient method. Puts back a user action and get a short
+# budget, auth and app launch can afford to wait a little longer.
+DEFAULT_RETRY_POLICIES: dict[str, RetryPolicy] = {
+    "get_access_token_from_refresh_token": RetryPolicy(attempts=3, base_delay=1),
+    "get_access_token_from_cookies": RetryPolicy(attempts=3, base_delay=1),
+    "authenticate": RetryPolicy(attempts=3, base_delay=1),
+    "get_first_data": RetryPolicy(attempts=3, base_delay=1),
+    "update_objects": RetryPolicy(attempts=3, base_delay=0.25, max_delay=2),
+}
+
+# Pools shared by several accounts. Every account keeps its own long-poll open,
+# so the long-poll pool is not capped.
+SHARED_CONNECTION_POOLS: dict[TrafficClass, ConnectionPoolSettings] = {
+    **DEFAULT_CONNECTION_POOLS,
+    TrafficClass.LONG_POLL: ConnectionPoolSettings(
+        limit=0, keepalive_timeout=30, **LONG_POLL_TCP_KEEPALIVE
+    ),
+}
+
+# Circuit breaker shared by subscribe and put. It opens after consecutive
+# service errors for a jittered window that doubles up to the maximum.
+CIRCUIT_FAILURE_THRESHOLD = 2
+CIRCUIT_BASE_WINDOW = 5  # seconds
+CIRCUIT_MAX_WINDOW = 120  # seconds
+CIRCUIT_PROBE_TIMEOUT = 10  # seconds a long-poll probe must survive
+
+# Long-poll watchdog. The read timeout follows the longest recent server hold
+# plus a grace period, within the minimum and the total subscribe timeout.
+SUBSCRIBE_TIMEOUT = 600  # seconds
+SUBSCRIBE_MIN_READ_TIMEOUT = 120  # seconds
+SUBSCRIBE_HOLD_GRACE = 30  # seconds
+SUBSCRIBE_HOLD_HISTORY = 20  # long-polls
@@ -0,0 +1,212 @@
+"""Bucket value decoders compiled from model annotations."""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable, ItemsView, Iterator, KeysView, Mapping, ValuesView
+from dataclasses import is_dataclass
+from sys import intern
+from typing import Any, ClassVar, Self, get_args, get_origin, get_type_hints
+
+_LOGGER = logging.getLogger(__package__)
+
+type Converter = Callable[[Any], Any]
+
+# Runtime types Nest sends as JSON, and how to coerce other JSON types to them
+_CONVERTERS: dict[type, Converter] = {
+    bool: bool,
+    int: int,
+    float: float,
+    str: str,
+    list: list,
+    dict: dict,
+}
+
+_MISSING = object()
+
+
+def _compile_field(hint: Any) -> tuple[type | None, Converter] | None:
+    """Return the expected runtime type and converter of an annotation.
+
+    Lists of dataclasses have no expected type, so they are always converted.
+    """
+    origin = get_origin(hint) or hint
+
+    if origin is list and (args := get_args(hint)) and is_dataclass(args[0]):
+        item_type = args[0]
+
+        def convert_items(items: list[Any]) -> list[Any]:
+            return [
+                item if isinstance(item, item_type) else item_type(**item)
+                for item in items
+            ]
+
+        return None, convert_items
+
+    if (converter := _CONVERTERS.get(origin)) is not None:
+        return origin, converter
+
+    return None
+
+
+class CompiledDecoder:
+    """Convert the fields of a raw bucket value to the types of a model.
+
+    The model's annotations are compiled once into a table of field name to
+    expected runtime type and converter. Converting a field then costs one
+    dict lookup, plus a conversion only for values that don't already have
+    the annotated type. Unknown fields and values that fail to convert are
+    returned as they are.
+    """
+
+    def __init__(self, model: type) -> None:
+        """Compile the decoder for a model."""
+        self.model = model
+        self.fields: dict[str, tuple[type | None, Converter]] = {}
+
+        for name, hint in get_type_hints(model).items():
+            if (spec := _compile_field(hint)) is not None:
+                self.fields[intern(name)] = spec
+
+    def convert(self, key: str, item: Any) -> Any:
+        """Return a raw field value converted to its annotated type."""
+        spec = self.fields.get(key)
+
+        if spec is None or item is None or type(item) is spec[0]:
+            return item
+
+        try:
+            return spec[1](item)
+        except TypeError, ValueError:
+            _LOGGER.debug("Keeping %s=%r, it doesn't match %s", key, item, self.model)
+            return item
+
+    def decode(
+        self, raw: dict[str, Any], converted: dict[str, Any] | None = None
+    ) -> dict[str, Any]:
+        """Convert every field of a raw value in one pass.
+
+        Fields in converted were converted before and are reused.
+        """
+        fields = self.fields
+        value: dict[str, Any] = {}
+
+        for key, item in raw.items():
+            if converted and key in converted:
+                value[key] = converted[key]
+                continue
+
+            spec = fields.get(key)
+
+            if spec is None or item is None or type(item) is spec[0]:
+                value[key] = item
+                continue
+
+            value[key] = self.convert(key, item)
+
+        return value
+
+
+class LazyBucketValue(Mapping[str, Any]):
+    """A bucket value that converts its fields when they are read.
+
+    The value keeps the payload dict as decoded from JSON. A field is
+    converted to its annotated type on first access and cached, so an update
+    only costs work for the fields entities actually read. Iterating and
+    membership tests use the payload directly, and the known fields are also
+    available as typed attributes, reading None when they weren't sent.
+    Subclasses declare their fields as annotations.
+    """
+
+    __slots__ = ("_raw", "_typed")
+
+    decoder: ClassVar[CompiledDecoder]
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        """Compile the decoder of a value model."""
+        super().__init_subclass__(**kwargs)
+        cls.decoder = CompiledDecoder(cls)
+
+    def __init__(self, raw: dict[str, Any] | None = None, /, **fields: Any) -> None:
+        """Wrap a decoded payload without copying it."""
+        if fields:
+            raw = {**raw, **fields} if raw else fields
+
+        self._raw = raw if raw is not None else {}
+        self._typed: dict[str, Any] = {}
+
+    @classmethod
+    def decode(cls, value: Any) -> Self:
+        """Return a value of this type, wrapping a decoded payload."""
+        return value if isinstance(value, cls) else cls(value)
+
+    @property
+    def raw(self) -> dict[str, Any]:
+        """Return the payload as decoded from JSON."""
+        return self._raw
+
+    def __getitem__(self, key: str) -> Any:
+        """Return a field converted to its annotated type."""
+        if (value := self._typed.get(key, _MISSING)) is not _MISSING:
+            return value
+
+        value = self._typed[key] = self.decoder.convert(key, self._raw[key])
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return a field converted to its annotated type, or default."""
+        if (value := self._typed.get(key, _MISSING)) is not _MISSING:
+            return value
+
+        if key not in self._raw:
+            return default
+
+        return self[key]
+
+    def __getattr__(self, name: str) -> Any:
+        """Return a known field, or None if it wasn't sent."""
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        if name in self._raw:
+            return self[name]
+
+        if name in self.decoder.fields:
+            return None
+
+        raise AttributeError(name)
+
+    def __contains__(self, key: object) -> bool:
+        """Return True if the payload has the field."""
+        return key in self._raw
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the fields of the payload."""
+        return iter(self._raw)
+
+    def __len__(self) -> int:
+        """Return the number of fields in the payload."""
+        return len(self._raw)
+
+    def keys(self) -> KeysView[str]:
+        """Return the fields of the payload."""
+        return self._raw.keys()
+
+    def items(self) -> ItemsView[str, Any]:
+        """Return the fields with their converted values."""
+        return self._convert_all().items()
+
+    def values(self) -> ValuesView[Any]:
+        """Return the converted values."""
+        return self._convert_all().values()
+
+    def _convert_all(self) -> dict[str, Any]:
+        """Convert every field not read yet in one pass, in payload order."""
+        if len(self._typed) != len(self._raw):
+            self._typed = self.decoder.decode(self._raw, self._typed)
+
+        return self._typed
+
+    def __repr__(self) -> str:
+        """Return the representation of the payload."""
+        return f"{type(self).__name__}({self._raw!r})"
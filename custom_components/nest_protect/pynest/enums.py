@@ -1,10 +1,15 @@
 """Enums for Nest Protect."""
 
 import logging
+import time
 from enum import StrEnum, unique
 
 _LOGGER = logging.getLogger(__name__)
 
+# Unsupported bucket types are warned about at most once per hour each
+_UNSUPPORTED_WARNING_INTERVAL = 3600
+_unsupported_warned: dict[str, float] = {}
+
 
 @unique
 class BucketType(StrEnum):
@@ -46,11 +51,36 @@ class BucketType(StrEnum):
 
     @classmethod
     def _missing_(cls, value):  # type: ignore[override]
-        _LOGGER.warning("Unsupported value %s has been returned for %s", value, cls)
+        now = time.monotonic()
+        warned = _unsupported_warned.get(value)
+
+        if warned is None or now - warned >= _UNSUPPORTED_WARNING_INTERVAL:
+            _unsupported_warned[value] = now
+            _LOGGER.warning("Unsupported value %s has been returned for %s", value, cls)
+        else:
+            _LOGGER.debug("Unsupported value %s has been returned for %s", value, cls)
 
         return cls.UNKNOWN
 
 
+@unique
+class TrafficClass(StrEnum):
+    """Kinds of traffic that get their own connection pool."""
+
+    AUTH = "auth"  # Google token, issue_jwt, /session and app_launch
+    LONG_POLL = "long_poll"  # /v6/subscribe
+    WRITE = "write"  # /v6/put
+
+
+@unique
+class CircuitState(StrEnum):
+    """States of the circuit breaker."""
+
+    CLOSED = "closed"  # requests flow
+    OPEN = "open"  # requests are held back
+    HALF_OPEN = "half_open"  # a single probe is in flight
+
+
 @unique
 class Environment(StrEnum):
     """Bucket types."""
@@ -27,3 +27,16 @@ class BadGatewayException(NestServiceException):
 
 class EmptyResponseException(NestServiceException):
     """Raised when server returns Status 200 (OK), but empty response."""
+
+
+class CircuitOpenException(NestServiceException):
+    """Raised when requests are held back while the service is failing."""
+
+    def __init__(self, retry_after: float) -> None:
+        """Initialize the exception with the seconds until the next attempt."""
+        super().__init__(f"Nest service unavailable, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class SnapshotFormatException(PynestException):
+    """Raised when a bucket snapshot file can't be read by this version."""
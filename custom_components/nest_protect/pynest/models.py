@@ -3,9 +3,13 @@
 from __future__ import annotations
 
 import datetime
+import random
+from collections.abc import Callable
 from dataclasses import dataclass, field
+from sys import intern
 from typing import Any
 
+from .decoder import LazyBucketValue
 from .enums import BucketType
 
 
@@ -54,14 +58,22 @@ class NestResponse:
     _2fa_enabled: bool = None
     _2fa_state_changed: str = None
 
-    def is_expired(self, buffer_seconds: int = 0):
-        """Check if session is expired, with optional early-expiry buffer."""
-        expiry_date = datetime.datetime.strptime(
+    @property
+    def expiry_date(self) -> datetime.datetime:
+        """Return the session expiry date in UTC."""
+        return datetime.datetime.strptime(
             self.expires_in, "%a, %d-%b-%Y %H:%M:%S %Z"
         ).replace(tzinfo=datetime.UTC)
-        return expiry_date <= datetime.datetime.now(datetime.UTC) + datetime.timedelta(
-            seconds=buffer_seconds
-        )
+
+    def is_expired(self, buffer_seconds: int = 0):
+        """Check if session is expired, with optional early-expiry buffer."""
+        return self.expiry_date <= datetime.datetime.now(
+            datetime.UTC
+        ) + datetime.timedelta(seconds=buffer_seconds)
+
+    def seconds_until_expiry(self) -> float:
+        """Return the number of seconds until the session expires."""
+        return (self.expiry_date - datetime.datetime.now(datetime.UTC)).total_seconds()
 
     def to_dict(self) -> dict:
         """Serialize session fields needed for persistence."""
@@ -108,33 +120,48 @@ class NestResponse:
         )
 
 
-@dataclass
+def intern_keys(value: dict[str, Any]) -> dict[str, Any]:
+    """Return the dict with its keys interned."""
+    return {intern(key): item for key, item in value.items()}
+
+
+@dataclass(slots=True)
 class Bucket:
-    """Class that reflects a Nest API response."""
+    """Class that reflects a Nest API response.
+
+    Buckets are kept for every device as long as the integration runs, so
+    they use slots and share their object_key through sys.intern() instead
+    of holding a copy per decoded response. Values are decoded by the decoder
+    BUCKET_DECODERS registers for their type, topaz and where values become
+    LazyBucketValues that keep the payload dict as sent. Values of other
+    types stay dicts with interned keys.
+    """
 
     object_key: str
     object_revision: int
     object_timestamp: int
-    # value: dict[str, Any]
     value: dict[str, Any] | TopazBucketValue | WhereBucketValue
     type: str = ""
 
     def __post_init__(self):
         """Set the bucket type during post init."""
-        self.type = BucketType(self.object_key.split(".")[0])
+        self.object_key = intern(self.object_key)
+        self.type = bucket_type(self.object_key)
+        self.value = BUCKET_DECODERS.get(self.type, _decode_value)(self.value)
 
-        # if self.type == BucketType.TOPAZ:
-        #     self.value = TopazBucketValue(**self.value)
-        if self.type == BucketType.WHERE:
-            if isinstance(self.value, WhereBucketValue):
-                # It's already the correct type, no need to reinitialize
-                pass
-            else:
-                # Convert dictionary to WhereBucketValue instance
-                self.value = WhereBucketValue(**self.value)
+    def to_dict(self) -> dict[str, Any]:
+        """Serialize the bucket as Nest sent it, for persistence."""
+        value = self.value
 
+        return {
+            "object_key": self.object_key,
+            "object_revision": self.object_revision,
+            "object_timestamp": self.object_timestamp,
+            "value": value.raw if isinstance(value, LazyBucketValue) else value,
+        }
 
-@dataclass
+
+@dataclass(slots=True)
 class Where:
     """TODO."""
 
@@ -142,7 +169,7 @@ class Where:
     where_id: str
 
 
-@dataclass
+@dataclass(slots=True)
 class BucketValue:
     """Nest Protect values."""
 
@@ -150,18 +177,18 @@ class BucketValue:
     #     return (getattr(self, field.name) for field in fields(self))
 
 
-@dataclass
-class WhereBucketValue(BucketValue):
-    """Nest Protect values."""
+class WhereBucketValue(LazyBucketValue):
+    """Nest Protect values.
 
-    wheres: list[Where] = field(default_factory=Where)
+    The Where objects are only built when wheres is read.
+    """
 
-    def __post_init__(self):
-        """TODO."""
-        self.wheres = [Where(**w) for w in self.wheres] if self.wheres else []
+    __slots__ = ()
 
+    wheres: list[Where]
 
-@dataclass
+
+@dataclass(slots=True)
 class WhereBucket(Bucket):
     """Class that reflects a Nest API response."""
 
@@ -171,10 +198,11 @@ class WhereBucket(Bucket):
     value: WhereBucketValue = field(default_factory=WhereBucketValue)
 
 
-@dataclass
-class TopazBucketValue(BucketValue):
+class TopazBucketValue(LazyBucketValue):
     """Nest Protect values."""
 
+    __slots__ = ()
+
     spoken_where_id: str
     creation_time: int
     installed_locale: str
@@ -204,11 +232,11 @@ class TopazBucketValue(BucketValue):
     auto_away: bool
     night_light_enable: bool
     component_als_test_passed: bool
-    speaker_test_results: 32768
+    speaker_test_results: int
     wired_or_battery: int
     is_rcs_used: bool
     replace_by_date_utc_secs: int
-    certification_body: 2
+    certification_body: int
     component_pir_test_passed: bool
     structure_id: str
     software_version: str
@@ -250,7 +278,35 @@ class TopazBucketValue(BucketValue):
     last_audio_self_test_start_utc_secs: int
 
 
-@dataclass
+def _decode_value(value: Any) -> Any:
+    """Return a plain value with its keys shared."""
+    return intern_keys(value) if isinstance(value, dict) else value
+
+
+# Value decoder per bucket type, other types keep a plain value
+BUCKET_DECODERS: dict[BucketType, Callable[[Any], Any]] = {
+    BucketType.TOPAZ: TopazBucketValue.decode,
+    BucketType.WHERE: WhereBucketValue.decode,
+}
+
+_BUCKET_TYPES: dict[str, BucketType] = {str(member): member for member in BucketType}
+
+
+def bucket_type(object_key: str) -> BucketType:
+    """Return the type of an object from the prefix of its key.
+
+    Every prefix is resolved once, so an unsupported type is only reported
+    the first time it shows up.
+    """
+    prefix = object_key.partition(".")[0]
+
+    if (found := _BUCKET_TYPES.get(prefix)) is None:
+        found = _BUCKET_TYPES[prefix] = BucketType(prefix)
+
+    return found
+
+
+@dataclass(slots=True)
 class TopazBucket(Bucket):
     """Class that reflects a Nest API response."""
 
@@ -278,6 +334,10 @@ class GoogleAuthResponse:
         """Check if access token is expired."""
         return self.expiry_date <= datetime.datetime.now()
 
+    def seconds_until_expiry(self) -> float:
+        """Return the number of seconds until the access token expires."""
+        return (self.expiry_date - datetime.datetime.now()).total_seconds()
+
 
 @dataclass
 class GoogleAuthResponseForCookies(GoogleAuthResponse):
@@ -316,6 +376,34 @@ class NestEnvironment:
     host: str
 
 
+@dataclass
+class ConnectionPoolSettings:
+    """Class to describe a dedicated connection pool."""
+
+    limit: int = 10
+    limit_per_host: int = 0
+    keepalive_timeout: float = 15.0
+    # TCP keepalive probes, disabled when tcp_keepalive_idle is None
+    tcp_keepalive_idle: int | None = None
+    tcp_keepalive_interval: int | None = None
+    tcp_keepalive_count: int | None = None
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Class to describe the retry budget of an operation."""
+
+    attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 10.0
+
+    def backoff(self, attempt: int) -> float:
+        """Return a full-jitter delay before retrying after the given attempt."""
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        )
+
+
 @dataclass
 class Weather:
     """TODO."""
@@ -391,3 +479,18 @@ class FirstDataAPIResponse:
         self.updated_buckets = (
             [Bucket(**b) for b in self.updated_buckets] if self.updated_buckets else []
         )
+
+
+@dataclass
+class SubscribeResponse:
+    """Class that reflects a Nest subscribe response."""
+
+    objects: list[Bucket] = field(default_factory=list)
+
+    def __post_init__(self):
+        """Decode every updated object exactly once."""
+        self.objects = (
+            [b if isinstance(b, Bucket) else Bucket(**b) for b in self.objects]
+            if self.objects
+            else []
+        )
@@ -0,0 +1,61 @@
+"""Dedicated connection pools per traffic class."""
+
+from __future__ import annotations
+
+from aiohttp import ClientSession, DummyCookieJar, TCPConnector
+
+from .enums import TrafficClass
+from .models import ConnectionPoolSettings
+from .watchdog import keepalive_socket_factory
+
+
+class NestConnectionPools:
+    """Lazily created sessions, one connector per configured traffic class.
+
+    An instance can be shared by several NestClients, so the Nest accounts of
+    one process reuse the same sockets. The sessions don't keep cookies, as
+    aiohttp would send the cookies one account received with the requests of
+    every other account; each client sends its own cookie header instead.
+    """
+
+    def __init__(
+        self, settings: dict[TrafficClass, ConnectionPoolSettings] | None = None
+    ) -> None:
+        """Initialize the pools."""
+        self.settings = settings or {}
+        self.sessions: dict[TrafficClass, ClientSession] = {}
+
+    def session_for(self, traffic_class: TrafficClass) -> ClientSession | None:
+        """Return the dedicated session for a traffic class, if it has one."""
+        settings = self.settings.get(traffic_class)
+
+        if settings is None:
+            return None
+
+        session = self.sessions.get(traffic_class)
+
+        if session is None or session.closed:
+            session = ClientSession(
+                cookie_jar=DummyCookieJar(),
+                connector=TCPConnector(
+                    limit=settings.limit,
+                    limit_per_host=settings.limit_per_host,
+                    keepalive_timeout=settings.keepalive_timeout,
+                    socket_factory=(
+                        keepalive_socket_factory(settings)
+                        if settings.tcp_keepalive_idle
+                        else None
+                    ),
+                ),
+            )
+            self.sessions[traffic_class] = session
+
+        return session
+
+    async def async_close(self) -> None:
+        """Close every dedicated session."""
+        sessions = list(self.sessions.values())
+        self.sessions.clear()
+
+        for session in sessions:
+            await session.close()
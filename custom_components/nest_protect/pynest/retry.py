@@ -0,0 +1,95 @@
+"""Retry policies for pynest operations."""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import random
+from collections.abc import Awaitable, Callable
+from http import HTTPStatus
+from typing import Any
+
+from aiohttp import ClientConnectionError, ClientResponseError
+
+from .exceptions import (
+    BadCredentialsException,
+    CircuitOpenException,
+    NestServiceException,
+    NotAuthenticatedException,
+)
+from .models import RetryPolicy
+
+_LOGGER = logging.getLogger(__package__)
+
+
+def jitter(interval: float) -> float:
+    """Spread a fixed interval over its upper half to avoid lockstep retries."""
+    return random.uniform(interval / 2, interval)
+
+
+def is_retryable(exception: BaseException) -> bool:
+    """Return True if an operation that raised this exception may be retried."""
+    if isinstance(
+        exception,
+        (BadCredentialsException, NotAuthenticatedException, CircuitOpenException),
+    ):
+        return False
+
+    # 502, 504, empty responses and other service hiccups
+    if isinstance(exception, NestServiceException):
+        return True
+
+    if isinstance(exception, ClientResponseError):
+        return (
+            exception.status == HTTPStatus.TOO_MANY_REQUESTS
+            or exception.status >= HTTPStatus.INTERNAL_SERVER_ERROR
+        )
+
+    return isinstance(exception, (TimeoutError, ClientConnectionError))
+
+
+async def async_retry[T](
+    operation: str, func: Callable[[], Awaitable[T]], policy: RetryPolicy
+) -> T:
+    """Run func, retrying retryable failures within the policy's budget."""
+    attempt = 1
+
+    while True:
+        try:
+            return await func()
+        except Exception as exception:
+            if attempt >= policy.attempts or not is_retryable(exception):
+                raise
+
+            delay = policy.backoff(attempt)
+            _LOGGER.debug(
+                "%s failed with %r, retrying in %.2fs (attempt %d of %d)",
+                operation,
+                exception,
+                delay,
+                attempt,
+                policy.attempts,
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+def retryable(operation: str) -> Callable:
+    """Retry a NestClient method according to its retry_policies entry."""
+
+    def decorator[T](func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(func)
+        async def wrapper(self: Any, *args: Any, **kwargs: Any) -> T:
+            policy = self.retry_policies.get(operation)
+
+            if policy is None:
+                return await func(self, *args, **kwargs)
+
+            return await async_retry(
+                operation, lambda: func(self, *args, **kwargs), policy
+            )
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,163 @@
+"""Revision index of the objects a subscription follows."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from typing import Any
+
+from .decoder import LazyBucketValue
+from .enums import BucketType
+from .models import Bucket
+
+
+class BucketRevisionIndex:
+    """Latest revision and timestamp per object_key.
+
+    The subscribe request lists every object with the revision we last saw.
+    Those entries are kept as ready-to-send dicts and updated in place, so a
+    subscribe response only costs work for the buckets it contains.
+    """
+
+    def __init__(self, buckets: Iterable[Bucket] = ()) -> None:
+        """Initialize the index with the buckets from app launch."""
+        self._entries: dict[str, dict[str, Any]] = {}
+        self.update(buckets)
+
+    def __len__(self) -> int:
+        """Return the number of indexed objects."""
+        return len(self._entries)
+
+    def __contains__(self, object_key: object) -> bool:
+        """Return True if the object is indexed."""
+        return object_key in self._entries
+
+    def revision(self, object_key: str) -> int | None:
+        """Return the latest known revision for an object_key."""
+        if entry := self._entries.get(object_key):
+            return entry["object_revision"]
+        return None
+
+    def is_newer(self, bucket: Bucket) -> bool:
+        """Return True if a bucket is newer than the indexed revision."""
+        entry = self._entries.get(bucket.object_key)
+
+        return (
+            entry is None
+            or bucket.object_revision > entry["object_revision"]
+            or bucket.object_timestamp > entry["object_timestamp"]
+        )
+
+    @property
+    def objects(self) -> list[dict[str, Any]]:
+        """Return the objects for a /v6/subscribe request body."""
+        return list(self._entries.values())
+
+    def update(self, buckets: Iterable[Bucket]) -> list[Bucket]:
+        """Record newer buckets and return the ones that changed.
+
+        Buckets that are not newer than the indexed revision and timestamp are
+        ignored.
+        """
+        changed: list[Bucket] = []
+
+        for bucket in buckets:
+            key = bucket.object_key
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self._entries[key] = {
+                    "object_key": key,
+                    "object_revision": bucket.object_revision,
+                    "object_timestamp": bucket.object_timestamp,
+                }
+            elif (
+                bucket.object_revision <= entry["object_revision"]
+                and bucket.object_timestamp <= entry["object_timestamp"]
+            ):
+                continue
+            else:
+                entry["object_revision"] = bucket.object_revision
+                entry["object_timestamp"] = bucket.object_timestamp
+
+            changed.append(bucket)
+
+        return changed
+
+
+def bucket_structure_id(bucket: Bucket) -> str | None:
+    """Return the structure an object belongs to, None for account-level objects."""
+    if bucket.type in {BucketType.STRUCTURE, BucketType.WHERE}:
+        return bucket.object_key.partition(".")[2]
+
+    if isinstance(bucket.value, Mapping):
+        return bucket.value.get("structure_id")
+
+    return None
+
+
+def partition_buckets(
+    buckets: Iterable[Bucket], *, by_structure: bool = True, max_size: int = 0
+) -> list[list[Bucket]]:
+    """Split the subscribed objects into shards that can be long-polled apart.
+
+    With by_structure every structure gets its own shard, and account-level
+    objects join the first one. A max_size above 0 splits shards further into
+    chunks of at most that many objects.
+    """
+    groups: dict[str | None, list[Bucket]] = {}
+
+    for bucket in buckets:
+        key = bucket_structure_id(bucket) if by_structure else None
+        groups.setdefault(key, []).append(bucket)
+
+    account = groups.pop(None, [])
+    shards = list(groups.values())
+
+    if shards:
+        shards[0][:0] = account
+    elif account:
+        shards = [account]
+
+    if max_size > 0:
+        shards = [
+            shard[start : start + max_size]
+            for shard in shards
+            for start in range(0, len(shard), max_size)
+        ]
+
+    return shards
+
+
+def _payload(value: Any) -> dict[str, Any] | None:
+    """Return the field values to compare, without converting lazy values."""
+    if isinstance(value, LazyBucketValue):
+        return value.raw
+
+    if isinstance(value, dict):
+        return value
+
+    return None
+
+
+def diff_bucket_values(old: Bucket | None, new: Bucket) -> set[str] | None:
+    """Return the value fields that differ between two revisions of a bucket.
+
+    Returns None when the values can't be compared field by field, for a new
+    object or a value that isn't a dict. Lazy values are compared on their
+    payload, so diffing converts no fields.
+    """
+    if (
+        old is None
+        or (old_value := _payload(old.value)) is None
+        or (new_value := _payload(new.value)) is None
+    ):
+        return None
+
+    changed = {
+        key
+        for key, value in new_value.items()
+        if key not in old_value or old_value[key] != value
+    }
+    changed.update(key for key in old_value if key not in new_value)
+
+    return changed
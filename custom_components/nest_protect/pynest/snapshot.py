@@ -0,0 +1,221 @@
+"""Compact on-disk snapshot of buckets with an append-only change log.
+
+The snapshot file holds every bucket, the log file the buckets that changed
+since the snapshot was written. Both files start with a header and continue
+with records of compact JSON, each prefixed by its length and CRC32. The
+snapshot is one record with the list of all buckets, so it loads with a
+single JSON decode, and every log record is one bucket. Saving changes
+appends them to the log, so a write only costs work for the buckets that
+changed. Once the log grows past a quarter of the snapshot, the current
+buckets are written to a new snapshot and the log starts over, which keeps
+loading close to the cost of the snapshot alone.
+
+Every snapshot has a generation, which its log repeats in its header. A log
+of another generation, left behind by a crash between writing a snapshot
+and resetting its log, is ignored since its changes are in the snapshot.
+A record cut short by a crash ends the log.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import struct
+import zlib
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+from .codec import json_dumps, json_loads
+from .exceptions import SnapshotFormatException
+
+_LOGGER = logging.getLogger(__package__)
+
+MAGIC = b"NPBS"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct(">4sHQ")  # magic, format version, generation
+_RECORD = struct.Struct(">II")  # payload length, CRC32 of the payload
+
+# Compact once the log is this share of the snapshot, but keep small logs
+# instead of rewriting a small snapshot on every save
+_COMPACT_RATIO = 0.25
+_MIN_COMPACT_SIZE = 16 * 1024
+
+type BucketDict = dict[str, Any]
+
+
+def _encode(items: Iterable[Any]) -> bytes:
+    """Return a record for every item."""
+    parts: list[bytes] = []
+
+    for item in items:
+        payload = json_dumps(item)
+        parts += (_RECORD.pack(len(payload), zlib.crc32(payload)), payload)
+
+    return b"".join(parts)
+
+
+def _decode(data: bytes, offset: int) -> tuple[list[Any], int]:
+    """Return the records from offset on and where the last intact one ends."""
+    items: list[Any] = []
+    end = len(data)
+
+    while offset + _RECORD.size <= end:
+        length, crc = _RECORD.unpack_from(data, offset)
+        start = offset + _RECORD.size
+        payload = data[start : start + length]
+
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+
+        items.append(json_loads(payload))
+        offset = start + length
+
+    return items, offset
+
+
+def _read_header(data: bytes) -> int:
+    """Return the generation of a snapshot or log file."""
+    if len(data) < _HEADER.size:
+        raise SnapshotFormatException("Bucket snapshot is truncated")
+
+    magic, version, generation = _HEADER.unpack_from(data)
+
+    if magic != MAGIC:
+        raise SnapshotFormatException("Not a bucket snapshot")
+
+    if version > FORMAT_VERSION:
+        raise SnapshotFormatException(f"Unsupported bucket snapshot version {version}")
+
+    return generation
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Replace a file, so readers see either the old or the new content."""
+    temp_path = path.with_name(f"{path.name}.tmp")
+
+    with temp_path.open("wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+
+    temp_path.replace(path)
+
+
+class BucketSnapshotFile:
+    """Bucket snapshot and change log stored next to each other.
+
+    Buckets are passed as the dicts of Bucket.to_dict(). The methods do
+    blocking file I/O and are not safe to call concurrently.
+    """
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        """Initialize the files, stored as path.snapshot and path.log."""
+        self.snapshot_path = Path(f"{os.fspath(path)}.snapshot")
+        self.log_path = Path(f"{os.fspath(path)}.log")
+        self.generation = 0  # 0 until a snapshot was loaded or written
+        self.snapshot_size = 0
+        self.log_size = 0
+
+    @property
+    def needs_compaction(self) -> bool:
+        """Return True once the log is due to be merged into a new snapshot."""
+        return self._log_too_long(self.log_size)
+
+    def _log_too_long(self, log_size: int) -> bool:
+        """Return True if a log of this size is due to be compacted."""
+        return log_size > max(self.snapshot_size * _COMPACT_RATIO, _MIN_COMPACT_SIZE)
+
+    def load(self) -> list[BucketDict]:
+        """Return the last saved bucket of every object.
+
+        Raises SnapshotFormatException if the snapshot can't be read.
+        """
+        try:
+            data = self.snapshot_path.read_bytes()
+        except FileNotFoundError:
+            return []
+
+        generation = _read_header(data)
+        records, end = _decode(data, _HEADER.size)
+
+        if len(records) != 1 or end != len(data):
+            raise SnapshotFormatException("Bucket snapshot is corrupt")
+
+        self.generation = generation
+        self.snapshot_size = len(data)
+        self.log_size = 0
+        latest = {bucket["object_key"]: bucket for bucket in records[0]}
+
+        try:
+            data = self.log_path.read_bytes()
+            log_generation = _read_header(data)
+        except FileNotFoundError, SnapshotFormatException:
+            log_generation = None
+
+        if log_generation != generation:
+            # Appends go to a fresh log of this generation
+            self.log_path.write_bytes(_HEADER.pack(MAGIC, FORMAT_VERSION, generation))
+            self.log_size = _HEADER.size
+            return list(latest.values())
+
+        changes, end = _decode(data, _HEADER.size)
+
+        if end != len(data):
+            _LOGGER.debug("Dropping %d bytes cut off the bucket log", len(data) - end)
+            os.truncate(self.log_path, end)
+
+        self.log_size = end
+        latest.update((bucket["object_key"], bucket) for bucket in changes)
+
+        return list(latest.values())
+
+    def save(
+        self, changed: Iterable[BucketDict], current: Iterable[BucketDict]
+    ) -> None:
+        """Append the changed buckets, or write current as a new snapshot.
+
+        current is only iterated when a new snapshot is due. The changes are
+        not appended then, as the new snapshot already holds them.
+        """
+        data = _encode(changed) if self.generation else b""
+
+        if not self.generation or self._log_too_long(self.log_size + len(data)):
+            self.compact(current)
+        else:
+            self._append(data)
+
+    def append(self, buckets: Iterable[BucketDict]) -> None:
+        """Append changed buckets to the log."""
+        self._append(_encode(buckets))
+
+    def _append(self, data: bytes) -> None:
+        """Append encoded records to the log."""
+        if not data:
+            return
+
+        with self.log_path.open("ab") as file:
+            file.write(data)
+
+        self.log_size += len(data)
+
+    def compact(self, buckets: Iterable[BucketDict]) -> None:
+        """Write the buckets as a new snapshot and start an empty log."""
+        generation = self.generation + 1
+        header = _HEADER.pack(MAGIC, FORMAT_VERSION, generation)
+        data = header + _encode([list(buckets)])
+
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        _write_atomic(self.snapshot_path, data)
+        self.log_path.write_bytes(header)
+
+        self.generation = generation
+        self.snapshot_size = len(data)
+        self.log_size = len(header)
+
+    def remove(self) -> None:
+        """Delete the snapshot and log."""
+        self.snapshot_path.unlink(missing_ok=True)
+        self.log_path.unlink(missing_ok=True)
+        self.generation = self.snapshot_size = self.log_size = 0
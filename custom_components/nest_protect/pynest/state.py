@@ -0,0 +1,95 @@
+"""Versioned store of the current bucket of every object."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from .enums import BucketType
+from .models import Bucket
+
+
+@dataclass(frozen=True, slots=True)
+class StateSnapshot:
+    """Read-only view of the buckets at one version of a BucketStore."""
+
+    version: int
+    buckets: Mapping[str, Bucket]
+
+    def get(self, object_key: str) -> Bucket | None:
+        """Return the bucket of an object at this version."""
+        return self.buckets.get(object_key)
+
+    def of_type(self, *bucket_types: BucketType) -> dict[str, Bucket]:
+        """Return the buckets of the given types, keyed by object_key."""
+        return {
+            key: bucket
+            for key, bucket in self.buckets.items()
+            if bucket.type in bucket_types
+        }
+
+
+class BucketStore:
+    """Current bucket per object_key, shared by everything that reads state.
+
+    Every update bumps the version. Snapshots share the store's dict instead
+    of copying it, and the dict is only copied by the first update after a
+    snapshot was taken, so taking a snapshot is cheap and a snapshot never
+    changes once taken.
+
+    A store created from saved buckets marks them as restored, until an
+    update from Nest replaces them.
+    """
+
+    def __init__(
+        self, buckets: Iterable[Bucket] = (), *, restored: bool = False
+    ) -> None:
+        """Initialize the store with the buckets from app launch."""
+        self._buckets: dict[str, Bucket] = {
+            bucket.object_key: bucket for bucket in buckets
+        }
+        self._snapshot: StateSnapshot | None = None
+        self.version = 0
+        # object_keys whose bucket Nest hasn't confirmed since the restore
+        self.restored: set[str] = set(self._buckets) if restored else set()
+
+    def __len__(self) -> int:
+        """Return the number of stored objects."""
+        return len(self._buckets)
+
+    def __contains__(self, object_key: object) -> bool:
+        """Return True if the object is stored."""
+        return object_key in self._buckets
+
+    def __iter__(self) -> Iterator[Bucket]:
+        """Iterate over the current bucket of every object."""
+        return iter(self._buckets.values())
+
+    def get(self, object_key: str) -> Bucket | None:
+        """Return the current bucket of an object."""
+        return self._buckets.get(object_key)
+
+    def snapshot(self) -> StateSnapshot:
+        """Return a read-only view of the current version."""
+        if self._snapshot is None:
+            self._snapshot = StateSnapshot(
+                self.version, MappingProxyType(self._buckets)
+            )
+
+        return self._snapshot
+
+    def update(self, buckets: Iterable[Bucket]) -> int:
+        """Make the buckets the current ones and return the new version."""
+        if self._snapshot is not None:
+            # The dict is shared with a snapshot, write to a copy
+            self._buckets = dict(self._buckets)
+            self._snapshot = None
+
+        for bucket in buckets:
+            self._buckets[bucket.object_key] = bucket
+            self.restored.discard(bucket.object_key)
+
+        self.version += 1
+
+        return self.version
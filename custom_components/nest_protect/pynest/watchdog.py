@@ -0,0 +1,115 @@
+"""Dead connection detection for /v6/subscribe long-polls."""
+
+from __future__ import annotations
+
+import logging
+import socket
+from collections import deque
+from collections.abc import Callable
+
+from aiohttp import ClientTimeout
+
+from .const import (
+    SUBSCRIBE_HOLD_GRACE,
+    SUBSCRIBE_HOLD_HISTORY,
+    SUBSCRIBE_MIN_READ_TIMEOUT,
+    SUBSCRIBE_TIMEOUT,
+)
+from .models import ConnectionPoolSettings
+
+_LOGGER = logging.getLogger(__package__)
+
+type AddrInfo = tuple[int, int, int, str, tuple]
+
+
+def keepalive_socket_factory(
+    settings: ConnectionPoolSettings,
+) -> Callable[[AddrInfo], socket.socket]:
+    """Return a socket factory that enables TCP keepalive on new connections.
+
+    The kernel then probes idle sockets, so a peer that vanished without a FIN
+    surfaces as a connection error instead of a read that never returns.
+    """
+
+    def factory(addr_info: AddrInfo) -> socket.socket:
+        family, type_, proto, _, _ = addr_info
+        sock = socket.socket(family=family, type=type_, proto=proto)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+
+        # Linux names the idle option TCP_KEEPIDLE, macOS TCP_KEEPALIVE
+        for name, value in (
+            ("TCP_KEEPIDLE", settings.tcp_keepalive_idle),
+            ("TCP_KEEPALIVE", settings.tcp_keepalive_idle),
+            ("TCP_KEEPINTVL", settings.tcp_keepalive_interval),
+            ("TCP_KEEPCNT", settings.tcp_keepalive_count),
+        ):
+            if value and (option := getattr(socket, name, None)) is not None:
+                sock.setsockopt(socket.IPPROTO_TCP, option, value)
+
+        return sock
+
+    return factory
+
+
+class LongPollWatchdog:
+    """Derive the long-poll read timeout from the observed server hold time.
+
+    Nest holds a subscribe request open until an object changes or its hold
+    time runs out. Only the requests whose hold ran out tell how long Nest
+    holds, a response to a change can come at any time. A read that stays
+    silent well past the longest hold seen recently is a stalled connection,
+    so it is cut off with a socket read timeout instead of waiting for the
+    total timeout. A stall may also be a hold longer than any seen so far, so
+    it counts as an observed hold too and repeated stalls back the timeout off
+    towards the total timeout.
+    """
+
+    def __init__(
+        self,
+        min_read_timeout: float = SUBSCRIBE_MIN_READ_TIMEOUT,
+        max_read_timeout: float = SUBSCRIBE_TIMEOUT,
+        grace: float = SUBSCRIBE_HOLD_GRACE,
+        history: int = SUBSCRIBE_HOLD_HISTORY,
+    ) -> None:
+        """Initialize the watchdog."""
+        self.min_read_timeout = min_read_timeout
+        self.max_read_timeout = max_read_timeout
+        self.grace = grace
+        self.holds: deque[float] = deque(maxlen=history)
+        self.stalls: deque[float] = deque(maxlen=history)
+        self.stall_count = 0
+
+    @property
+    def hold_time(self) -> float | None:
+        """Return the longest recent hold, None before the first response."""
+        return max(self.holds, default=None)
+
+    @property
+    def read_timeout(self) -> float:
+        """Return the socket read timeout for the next long-poll."""
+        if (hold_time := self.hold_time) is None:
+            return self.max_read_timeout
+
+        return min(
+            max(hold_time + self.grace, self.min_read_timeout), self.max_read_timeout
+        )
+
+    def timeout(self) -> ClientTimeout:
+        """Return the timeout for the next long-poll."""
+        return ClientTimeout(total=self.max_read_timeout, sock_read=self.read_timeout)
+
+    def record_hold(self, duration: float) -> None:
+        """Record a request the server held for duration seconds without changes."""
+        self.holds.append(duration)
+
+    def record_stall(self, duration: float) -> None:
+        """Record a long-poll that was cut off after duration seconds of silence."""
+        self.stall_count += 1
+        self.stalls.append(duration)
+        self.holds.append(duration)
+
+        _LOGGER.debug(
+            "Long-poll stalled for %.1fs, next read timeout %.1fs",
+            duration,
+            self.read_timeout,
+        )
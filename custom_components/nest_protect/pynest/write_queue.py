@@ -0,0 +1,125 @@
+"""Write queue that coalesces object updates into shared /v6/put requests."""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from .const import WRITE_COALESCE_MAX_OBJECTS, WRITE_COALESCE_WINDOW
+
+_LOGGER = logging.getLogger(__package__)
+
+MERGE = "MERGE"
+
+
+class NestWriteQueue:
+    """Collect writes over a short window and send them as one multi-object put.
+
+    MERGE values for the same object_key are merged, so a scene that toggles
+    several settings on many devices results in a single request. Every caller
+    receives the result (or exception) of the put that carried its write.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[list[dict[str, Any]]], Awaitable[Any]],
+        window: float = WRITE_COALESCE_WINDOW,
+        max_objects: int = WRITE_COALESCE_MAX_OBJECTS,
+    ) -> None:
+        """Initialize the write queue."""
+        self._send = send
+        self._window = window
+        self._max_objects = max_objects
+        self._pending: dict[tuple, dict[str, Any]] = {}
+        self._waiters: list[asyncio.Future] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._in_flight: set[asyncio.Task] = set()
+        self._sequence = itertools.count()
+
+    @property
+    def pending(self) -> int:
+        """Return the number of objects waiting to be sent."""
+        return len(self._pending)
+
+    async def async_put(self, objects: list[dict[str, Any]]) -> Any:
+        """Queue objects for the next put and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+
+        for obj in objects:
+            self._add(obj)
+
+        self._waiters.append(future)
+
+        if len(self._pending) >= self._max_objects:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._window, self._flush)
+
+        return await future
+
+    async def async_flush(self) -> None:
+        """Send pending writes now and wait for all in-flight puts."""
+        self._flush()
+
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    def _add(self, obj: dict[str, Any]) -> None:
+        """Merge an object into the pending batch."""
+        if obj.get("op") != MERGE:
+            # Other operations are sent as-is and in order
+            self._pending[(obj["object_key"], next(self._sequence))] = obj
+            return
+
+        key = (obj["object_key"], MERGE)
+
+        if pending := self._pending.get(key):
+            pending["value"] = {**pending["value"], **obj["value"]}
+        else:
+            self._pending[key] = {**obj, "value": dict(obj["value"])}
+
+    def _flush(self) -> None:
+        """Hand the pending batch to a background put."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if not self._pending:
+            return
+
+        objects = list(self._pending.values())
+        waiters = self._waiters
+        self._pending = {}
+        self._waiters = []
+
+        task = asyncio.create_task(self._async_send(objects, waiters))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _async_send(
+        self, objects: list[dict[str, Any]], waiters: list[asyncio.Future]
+    ) -> None:
+        """Send one batch and resolve the futures of every caller in it."""
+        _LOGGER.debug(
+            "Sending %d coalesced object(s) for %d write(s)", len(objects), len(waiters)
+        )
+
+        try:
+            result = await self._send(objects)
+        except asyncio.CancelledError:
+            for waiter in waiters:
+                waiter.cancel()
+            raise
+        except Exception as exception:  # pylint: disable=broad-except
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(exception)
+            return
+
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(result)
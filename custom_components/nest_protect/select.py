@@ -52,7 +52,8 @@ async def async_setup_entry(hass, entry, async_add_devices):
                         description,
                         data.areas,
                         data.client,
-                        data.session_manager,
+                        data.write_queue,
+                        buckets=data.buckets,
                     )
                 )
 
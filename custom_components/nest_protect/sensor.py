@@ -142,7 +142,13 @@ async def async_setup_entry(hass, entry, async_add_devices):
         for key in device.value:
             if description := supported_keys.get(key):
                 entities.append(
-                    NestProtectSensor(device, description, data.areas, data.client)
+                    NestProtectSensor(
+                        device,
+                        description,
+                        data.areas,
+                        data.client,
+                        buckets=data.buckets,
+                    )
                 )
 
     async_add_devices(entities)
@@ -2,6 +2,10 @@
 
 from __future__ import annotations
 
+import asyncio
+from collections.abc import Callable, Iterable
+from typing import TYPE_CHECKING
+
 from homeassistant.helpers.storage import Store
 
 from .const import (
@@ -9,10 +13,22 @@ from .const import (
     LOGGER,
     MAX_AUTH_FAILURES,
     SESSION_EXPIRY_BUFFER_SECONDS,
+    SESSION_RENEWAL_LEAD_SECONDS,
+    SESSION_RENEWAL_MIN_INTERVAL,
+    SESSION_RENEWAL_RETRY_INTERVALS,
 )
 from .pynest.client import NestClient
-from .pynest.exceptions import NotAuthenticatedException, PynestException
-from .pynest.models import FirstDataAPIResponse, NestResponse
+from .pynest.exceptions import (
+    BadCredentialsException,
+    NotAuthenticatedException,
+    PynestException,
+)
+from .pynest.models import Bucket, FirstDataAPIResponse, NestResponse
+from .pynest.retry import jitter
+
+if TYPE_CHECKING:
+    from .pynest.state import BucketStore
+    from .snapshot import NestBucketSnapshot
 
 
 class NestSessionManager:
@@ -22,17 +38,29 @@ class NestSessionManager:
     1. Reuse persisted Nest session if still valid (skip Google entirely)
     2. Re-authenticate with Google using stored cookies/refresh_token
     3. Return None (caller should raise ConfigEntryAuthFailed)
+
+    Once set up, the subscription engine calls async_renew() ahead of expiry
+    to keep the Google token and Nest session fresh, so the subscribe and put
+    paths never wait on auth.
+
+    With a snapshot, the last known buckets are saved as well, so the next
+    start can restore them with async_restore() before Nest answers.
     """
 
     def __init__(
         self,
         client: NestClient,
         store: Store,
+        snapshot: NestBucketSnapshot | None = None,
     ) -> None:
         """Initialize the session manager."""
         self._client = client
         self._store = store
         self._consecutive_failures: int = 0
+        self._refresh_task: asyncio.Task[None] | None = None
+        self._renewal_failures: int = 0
+        self._renewal_min_delay: float = 0.0
+        self._snapshot = snapshot
 
     @property
     def refreshed_cookies(self) -> str | None:
@@ -44,6 +72,11 @@ class NestSessionManager:
         """Return the number of consecutive failures."""
         return self._consecutive_failures
 
+    @property
+    def renewal_failures(self) -> int:
+        """Return the number of consecutive failed background renewals."""
+        return self._renewal_failures
+
     @property
     def should_trigger_reauth(self) -> bool:
         """Return True if failures exceed the threshold."""
@@ -77,6 +110,66 @@ class NestSessionManager:
 
         return await self._async_authenticate_and_fetch()
 
+    async def async_restore(self) -> FirstDataAPIResponse | None:
+        """Restore the session and buckets of the last run without calling Nest.
+
+        Returns the saved buckets as app launch data, or None when nothing
+        was saved and async_setup has to fetch it. An expired session is not
+        restored, the first request to Nest then renews it.
+        """
+        if self._snapshot is None:
+            return None
+
+        persisted = await self._store.async_load() or {}
+
+        if not (transport_url := persisted.get("transport_url")):
+            return None
+
+        if not (buckets := await self._snapshot.async_load()):
+            return None
+
+        try:
+            data = FirstDataAPIResponse(
+                weather_for_structures={},
+                service_urls={"urls": {"transport_url": transport_url}},
+                _2fa_enabled=False,
+                updated_buckets=buckets,
+            )
+        except (TypeError, ValueError):  # fmt: skip
+            LOGGER.debug("Ignoring invalid saved buckets", exc_info=True)
+            return None
+
+        restored_session = NestResponse.from_dict(persisted.get("nest_session"))
+
+        if restored_session is not None and not restored_session.is_expired(
+            buffer_seconds=SESSION_EXPIRY_BUFFER_SECONDS
+        ):
+            self._client.nest_session = restored_session
+
+        self._client.transport_url = transport_url
+        LOGGER.debug("Restored %d saved buckets", len(data.updated_buckets))
+
+        return data
+
+    def schedule_snapshot_save(
+        self, buckets: BucketStore, changed: Iterable[Bucket] = ()
+    ) -> None:
+        """Save the changed buckets soon, batching frequent updates."""
+        if self._snapshot is not None:
+            self._snapshot.async_schedule_save(buckets, changed)
+
+    async def async_save_snapshot(
+        self, buckets: Iterable[Bucket] | None = None
+    ) -> None:
+        """Save the pending bucket changes now, or replace all saved buckets."""
+        if self._snapshot is None:
+            return
+
+        if buckets is None:
+            await self._snapshot.async_save()
+        else:
+            await self._snapshot.async_replace(buckets)
+
     async def _async_try_persisted_session(self) -> FirstDataAPIResponse | None:
         """Attempt to restore and validate a persisted session.
 
@@ -105,7 +198,7 @@ class NestSessionManager:
 
         # Validate the session is actually accepted by Nest
         try:
-            return await self._client.get_first_data(
+            data = await self._client.get_first_data(
                 restored_session.access_token, restored_session.userid
             )
         except (NotAuthenticatedException, PynestException):  # fmt: skip
@@ -115,6 +208,12 @@ class NestSessionManager:
             self._client.nest_session = None
             return None
 
+        # Stores of older versions lack the transport URL a warm start needs
+        if self._client.transport_url != persisted.get("transport_url"):
+            await self._async_persist(restored_session)
+
+        return data
+
     async def _async_authenticate_and_fetch(self) -> FirstDataAPIResponse | None:
         """Authenticate with credentials and fetch first data.
 
@@ -126,11 +225,13 @@ class NestSessionManager:
             return None
 
         self._client.nest_session = nest_response
-        await self._async_persist(nest_response)
-
-        return await self._client.get_first_data(
+        data = await self._client.get_first_data(
             nest_response.access_token, nest_response.userid
         )
+        # Saved once app launch set the transport URL, a warm start needs it
+        await self._async_persist(nest_response)
+
+        return data
 
     async def _async_authenticate_with_credentials(self) -> NestResponse | None:
         """Authenticate using cookies or refresh_token.
@@ -160,9 +261,111 @@ class NestSessionManager:
 
         await self.async_refresh_session()
 
-    async def async_refresh_session(self) -> None:
-        """Force-refresh the Nest session via Google credentials."""
-        if not self._client.auth or self._client.auth.is_expired():
+    async def async_update_objects(self, objects: list[dict]) -> dict:
+        """Update objects with automatic session refresh."""
+        await self.ensure_session()
+        return await self._client.update_objects(
+            self._client.nest_session.access_token,
+            self._client.nest_session.userid,
+            self._client.transport_url,
+            objects,
+        )
+
+    def renewal_delay(self) -> float:
+        """Return the seconds until the next proactive renewal is due.
+
+        Renewal happens SESSION_RENEWAL_LEAD_SECONDS before ensure_session()
+        would consider the Nest session expired, or before the Google token
+        expires, whichever comes first.
+        """
+        if not self._client.nest_session:
+            return 0
+
+        delay = (
+            self._client.nest_session.seconds_until_expiry()
+            - SESSION_EXPIRY_BUFFER_SECONDS
+            - SESSION_RENEWAL_LEAD_SECONDS
+        )
+
+        if self._client.auth:
+            delay = min(
+                delay,
+                self._client.auth.seconds_until_expiry() - SESSION_RENEWAL_LEAD_SECONDS,
+            )
+
+        return max(delay, 0)
+
+    def next_renewal_delay(self) -> float:
+        """Return the seconds to wait before the next renewal attempt."""
+        if self._renewal_failures:
+            return jitter(
+                SESSION_RENEWAL_RETRY_INTERVALS[
+                    min(self._renewal_failures, len(SESSION_RENEWAL_RETRY_INTERVALS))
+                    - 1
+                ]
+            )
+
+        return max(self.renewal_delay(), self._renewal_min_delay)
+
+    async def async_renew(self, on_renewed: Callable[[], None] | None = None) -> bool:
+        """Renew credentials once and return False if renewal should stop."""
+        try:
+            await self.async_refresh_session(renew_auth=self._auth_expiring())
+        except BadCredentialsException:
+            LOGGER.warning(
+                "Background session renewal stopped: credentials were rejected"
+            )
+            return False
+        except Exception:  # pylint: disable=broad-except
+            self._renewal_failures += 1
+            LOGGER.debug(
+                "Background session renewal failed (attempt %d)",
+                self._renewal_failures,
+                exc_info=True,
+            )
+            return True
+
+        self._renewal_failures = 0
+        self._renewal_min_delay = SESSION_RENEWAL_MIN_INTERVAL
+        LOGGER.debug("Background session renewal succeeded")
+        if on_renewed:
+            on_renewed()
+
+        return True
+
+    def _auth_expiring(self) -> bool:
+        """Return True if the Google token won't outlive the renewal window."""
+        return (
+            not self._client.auth
+            or self._client.auth.seconds_until_expiry()
+            <= SESSION_EXPIRY_BUFFER_SECONDS + SESSION_RENEWAL_LEAD_SECONDS
+        )
+
+    async def async_refresh_session(self, *, renew_auth: bool = False) -> None:
+        """Force-refresh the Nest session via Google credentials.
+
+        Concurrent callers are coalesced onto a single in-flight refresh, so the
+        Google token -> issue_jwt -> /session chain runs at most once at a time.
+        Pass renew_auth to also fetch a new Google token while the current one
+        is still valid.
+        """
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(
+                self._async_refresh_session(renew_auth)
+            )
+            self._refresh_task.add_done_callback(self._async_refresh_done)
+
+        # Shield so a cancelled caller doesn't abort the refresh for the others
+        await asyncio.shield(self._refresh_task)
+
+    def _async_refresh_done(self, task: asyncio.Task[None]) -> None:
+        """Clear the in-flight refresh once it has finished."""
+        if self._refresh_task is task:
+            self._refresh_task = None
+
+    async def _async_refresh_session(self, renew_auth: bool) -> None:
+        """Refresh the Google access token if needed and start a new Nest session."""
+        if renew_auth or not self._client.auth or self._client.auth.is_expired():
             LOGGER.debug("Retrieving new Google access token")
             await self._client.get_access_token()
 
@@ -0,0 +1,111 @@
+"""Persist the buckets of a config entry between restarts."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterable
+from datetime import datetime
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import STORAGE_DIR
+
+from .const import LOGGER, SNAPSHOT_SAVE_DELAY
+from .pynest.exceptions import SnapshotFormatException
+from .pynest.models import Bucket
+from .pynest.snapshot import BucketSnapshotFile
+from .pynest.state import BucketStore
+
+
+class NestBucketSnapshot:
+    """Save the buckets of a config entry to a BucketSnapshotFile.
+
+    Changed buckets are collected for SNAPSHOT_SAVE_DELAY seconds and then
+    appended to the log in the executor, so a busy account writes a few
+    small batches instead of all of its buckets on every update.
+    """
+
+    def __init__(self, hass: HomeAssistant, key: str) -> None:
+        """Initialize the snapshot of a storage key."""
+        self.hass = hass
+        self._file = BucketSnapshotFile(hass.config.path(STORAGE_DIR, key))
+        self._buckets: BucketStore | None = None
+        self._pending: dict[str, Bucket] = {}
+        self._lock = asyncio.Lock()
+        self._unsub_save: CALLBACK_TYPE | None = None
+
+    async def async_load(self) -> list[dict[str, Any]]:
+        """Return the saved buckets, or an empty list if there are none."""
+        async with self._lock:
+            try:
+                return await self.hass.async_add_executor_job(self._file.load)
+            except OSError, SnapshotFormatException:
+                LOGGER.warning(
+                    "Ignoring unreadable Nest bucket snapshot", exc_info=True
+                )
+                return []
+
+    @callback
+    def async_schedule_save(
+        self, buckets: BucketStore, changed: Iterable[Bucket] = ()
+    ) -> None:
+        """Save the changed buckets soon, batching frequent updates."""
+        self._buckets = buckets
+
+        for bucket in changed:
+            self._pending[bucket.object_key] = bucket
+
+        if self._unsub_save is None:
+            self._unsub_save = async_call_later(
+                self.hass, SNAPSHOT_SAVE_DELAY, self._async_scheduled_save
+            )
+
+    async def async_save(self) -> None:
+        """Save the pending changes now."""
+        if self._unsub_save is not None:
+            self._unsub_save()
+            self._unsub_save = None
+
+        if self._buckets is None or (not self._pending and self._file.generation):
+            return
+
+        pending, self._pending = self._pending, {}
+        changed = [bucket.to_dict() for bucket in pending.values()]
+        # A snapshot doesn't change, so the executor can read it while updates go on
+        current = (
+            bucket.to_dict() for bucket in self._buckets.snapshot().buckets.values()
+        )
+
+        async with self._lock:
+            try:
+                await self.hass.async_add_executor_job(
+                    self._file.save, changed, current
+                )
+            except OSError:
+                LOGGER.warning("Could not save the Nest buckets", exc_info=True)
+                self._pending = {**pending, **self._pending}
+
+    async def async_replace(self, buckets: Iterable[Bucket]) -> None:
+        """Save the buckets as the only ones, dropping pending changes."""
+        if self._unsub_save is not None:
+            self._unsub_save()
+            self._unsub_save = None
+
+        self._pending.clear()
+        current = [bucket.to_dict() for bucket in buckets]
+
+        async with self._lock:
+            try:
+                await self.hass.async_add_executor_job(self._file.compact, current)
+            except OSError:
+                LOGGER.warning("Could not save the Nest buckets", exc_info=True)
+
+    async def async_remove(self) -> None:
+        """Delete the saved buckets."""
+        async with self._lock:
+            await self.hass.async_add_executor_job(self._file.remove)
+
+    async def _async_scheduled_save(self, _now: datetime) -> None:
+        self._unsub_save = None
+        await self.async_save()
@@ -0,0 +1,626 @@
+"""Long-lived subscription worker for Nest Protect."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import TYPE_CHECKING
+
+from aiohttp import ClientConnectorError, ClientOSError, ServerDisconnectedError
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+
+from .buckets import DEVICE_BUCKET_TYPES, apply_bucket
+from .const import (
+    ALARM_FIELDS,
+    DOMAIN,
+    EVENT_ALARM,
+    LOGGER,
+    SIGNAL_BUCKET_FIELD,
+    SUBSCRIPTION_OVERLAP,
+    SUBSCRIPTION_SHARD_BY_STRUCTURE,
+    SUBSCRIPTION_SHARD_SIZE,
+)
+from .pynest.enums import BucketType
+from .pynest.exceptions import (
+    BadCredentialsException,
+    EmptyResponseException,
+    NestServiceException,
+    NotAuthenticatedException,
+    PynestException,
+)
+from .pynest.models import Bucket, FirstDataAPIResponse, SubscribeResponse
+from .pynest.retry import jitter
+from .pynest.revisions import (
+    BucketRevisionIndex,
+    diff_bucket_values,
+    partition_buckets,
+)
+from .pynest.watchdog import LongPollWatchdog
+
+if TYPE_CHECKING:
+    from . import HomeAssistantNestProtectData
+
+
+class SubscriberState(StrEnum):
+    """States of the subscription worker."""
+
+    CONNECTING = "connecting"
+    STREAMING = "streaming"
+    BACKING_OFF = "backing_off"
+    REAUTH = "reauth"
+    STOPPED = "stopped"
+
+
+@dataclass
+class SubscriberStats:
+    """Counters of the subscription worker."""
+
+    requests: int = 0
+    updates: int = 0
+    empty_responses: int = 0
+    reconnects: int = 0
+    errors: int = 0
+    backoffs: int = 0
+    session_refreshes: int = 0
+    # Seconds without an open long-poll, between one closing and the next one
+    coverage_gap_last: float = 0.0
+    coverage_gap_max: float = 0.0
+    coverage_gap_total: float = 0.0
+    # Alarm transitions and seconds from object_timestamp to their state write
+    alarms: int = 0
+    alarm_latency_last: float = 0.0
+    alarm_latency_max: float = 0.0
+
+
+def _retrieve_result(task: asyncio.Task) -> None:
+    """Retrieve the error of a finished task nobody awaits."""
+    if not task.cancelled():
+        task.exception()
+
+
+class SubscriptionShard:
+    """A subset of the subscribed objects with its own long-poll."""
+
+    def __init__(self, name: str, buckets: list[Bucket]) -> None:
+        """Initialize the shard."""
+        self.name = name
+        self.revisions = BucketRevisionIndex(buckets)
+        self.state = SubscriberState.STOPPED
+        self.task: asyncio.Task | None = None
+        # The next long-poll, opened before the previous response is dispatched
+        self.pending: asyncio.Task[SubscribeResponse] | None = None
+        self.generation: int | None = None
+        self.closed_at: float | None = None
+
+    @property
+    def running(self) -> bool:
+        """Return True while the worker task of the shard is alive."""
+        return self.task is not None and not self.task.done()
+
+    def cancel(self, *, worker: bool = True) -> list[asyncio.Task]:
+        """Cancel the pending long-poll, and the worker unless told not to.
+
+        Returns the cancelled tasks. A long-poll that already failed has its
+        error retrieved, so it isn't logged as never retrieved.
+        """
+        tasks: list[asyncio.Task] = []
+
+        if pending := self.pending:
+            self.pending = None
+            tasks.append(pending)
+
+        if worker and (task := self.task):
+            self.task = None
+            tasks.append(task)
+
+        for task in tasks:
+            task.cancel()
+            task.add_done_callback(_retrieve_result)
+
+        return tasks
+
+
+class NestSubscriber:
+    """Keep /v6/subscribe long-polls open for a config entry.
+
+    The subscribed objects are split into shards, per structure and
+    optionally in chunks of shard_size objects. Every shard has one worker
+    task that loops over subscribe cycles until it is stopped or the
+    credentials need user attention, so a burst of changes in one structure
+    doesn't delay or bloat the responses of another.
+
+    With overlap, the next long-poll of a shard is opened as soon as a
+    response is recorded and before its updates are dispatched, so the time
+    without an open subscription is kept to the bookkeeping in between.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        entry_data: HomeAssistantNestProtectData,
+        data: FirstDataAPIResponse,
+        on_session_refreshed: Callable[[], None] | None = None,
+        wait_turn: Callable[[], Awaitable[None]] | None = None,
+        shard_by_structure: bool = SUBSCRIPTION_SHARD_BY_STRUCTURE,
+        shard_size: int = SUBSCRIPTION_SHARD_SIZE,
+        overlap: bool = SUBSCRIPTION_OVERLAP,
+    ) -> None:
+        """Initialize the subscription worker.
+
+        wait_turn is awaited before connecting, so a shared engine can stagger
+        the reconnects of several accounts.
+        """
+        self.hass = hass
+        self.entry = entry
+        self.entry_data = entry_data
+        self.transport_url: str = data.service_urls["urls"]["transport_url"]
+        self.shards = [
+            SubscriptionShard(f"shard {index}", buckets)
+            for index, buckets in enumerate(
+                partition_buckets(
+                    data.updated_buckets,
+                    by_structure=shard_by_structure,
+                    max_size=shard_size,
+                )
+                or [[]]
+            )
+        ]
+        self.stats = SubscriberStats()
+        self._overlap = overlap
+        self._on_session_refreshed = on_session_refreshed
+        self._wait_turn = wait_turn
+        self._refresh_session = False
+        self._refresh_lock = asyncio.Lock()
+        self._session_generation = 0
+        self._rejected_generation: int | None = None
+
+    @property
+    def watchdog(self) -> LongPollWatchdog:
+        """Return the watchdog of the long-polls."""
+        return self.entry_data.client.watchdog
+
+    @property
+    def state(self) -> SubscriberState:
+        """Return the state of the least healthy shard."""
+        states = {shard.state for shard in self.shards}
+
+        for state in (
+            SubscriberState.REAUTH,
+            SubscriberState.BACKING_OFF,
+            SubscriberState.CONNECTING,
+            SubscriberState.STREAMING,
+        ):
+            if state in states:
+                return state
+
+        return SubscriberState.STOPPED
+
+    @property
+    def running(self) -> bool:
+        """Return True while any shard worker is alive."""
+        return any(shard.running for shard in self.shards)
+
+    def start(self) -> None:
+        """Start the shard workers that aren't running yet."""
+        for shard in self.shards:
+            if shard.running:
+                continue
+
+            shard.state = SubscriberState.CONNECTING
+            shard.task = self.hass.async_create_background_task(
+                self._async_run(shard),
+                f"nest_protect subscriber {self.entry.entry_id} {shard.name}",
+            )
+
+    async def async_stop(self) -> None:
+        """Cancel the shard workers and wait for them to finish."""
+        for shard in self.shards:
+            await asyncio.gather(*shard.cancel(), return_exceptions=True)
+            shard.state = SubscriberState.STOPPED
+
+    async def _async_run(self, shard: SubscriptionShard) -> None:
+        """Run subscribe cycles of a shard until told to stop."""
+        try:
+            while await self.async_run_once(shard):
+                pass
+        finally:
+            if shard.state != SubscriberState.REAUTH:
+                shard.state = SubscriberState.STOPPED
+            LOGGER.debug("Subscriber: %s stopped (%s)", shard.name, self.stats)
+
+    async def async_run_once(self, shard: SubscriptionShard) -> bool:
+        """Run one subscribe cycle and return False when the worker should stop."""
+        sm = self.entry_data.session_manager
+
+        try:
+            if self._wait_turn and shard.state != SubscriberState.STREAMING:
+                await self._wait_turn()
+
+            # Shards share the session, only the first one in refreshes it
+            async with self._refresh_lock:
+                if self._refresh_session:
+                    await sm.async_refresh_session()
+                    self._refresh_session = False
+                    self._session_generation += 1
+                    self.stats.session_refreshes += 1
+
+                    if self._on_session_refreshed:
+                        self._on_session_refreshed()
+
+            if pending := shard.pending:
+                shard.pending = None
+                result = await pending
+            else:
+                result = await self._async_poll(shard)
+
+            buckets = self.entry_data.buckets
+            previous = {b.object_key: buckets.get(b.object_key) for b in result.objects}
+            restored = buckets.restored.intersection(previous)
+
+            # Smoke, CO and heat go out before any other processing
+            alarms = self._async_dispatch_alarms(shard, result, previous)
+
+            sm.record_success()
+            shard.state = SubscriberState.STREAMING
+            updates = self._async_apply(shard, result, previous)
+
+            if self._overlap:
+                shard.pending = self._open_poll(shard)
+
+            for bucket, previous_bucket in updates:
+                # Send every field of a restored bucket, its alarm sensors wait for it
+                self._async_dispatch(
+                    bucket,
+                    None if bucket.object_key in restored else previous_bucket,
+                    alarms.get(bucket.object_key),
+                )
+
+        except (ServerDisconnectedError, ClientConnectorError, ClientOSError) as err:
+            LOGGER.debug(
+                "Subscriber: %s lost its connection (%s).",
+                shard.name,
+                type(err).__name__,
+            )
+            self._reconnect(shard)
+
+        except TimeoutError:
+            LOGGER.debug("Subscriber: %s long-poll stalled, reconnecting.", shard.name)
+            sm.record_success()
+            self._reconnect(shard)
+
+        except EmptyResponseException:
+            LOGGER.debug("Subscriber: Nest Service sent empty response.")
+            self.stats.empty_responses += 1
+
+        except NotAuthenticatedException:
+            LOGGER.debug("Subscriber: %s 401 exception.", shard.name)
+            self.stats.errors += 1
+
+            # Every shard sees the 401 of a rejected session, count it once
+            generation = shard.generation
+
+            if generation is None or generation != self._rejected_generation:
+                self._rejected_generation = generation
+                sm.record_failure()
+
+            if sm.should_trigger_reauth:
+                LOGGER.warning(
+                    "Subscriber: %d consecutive auth failures, triggering re-authentication",
+                    sm.consecutive_failures,
+                )
+                return self._reauth(shard)
+
+            delay = jitter(sm.backoff_interval)
+            LOGGER.debug(
+                "Subscriber: retrying in %ds (attempt %d)",
+                delay,
+                sm.consecutive_failures,
+            )
+            await self._async_backoff(shard, delay)
+            self._refresh_session = True
+
+        except BadCredentialsException:
+            LOGGER.warning(
+                "Bad credentials detected. Please re-authenticate the Nest Protect integration."
+            )
+            return self._reauth(shard)
+
+        except NestServiceException:
+            self.stats.errors += 1
+            delay = self._service_error_delay()
+            LOGGER.debug(
+                "Subscriber: Nest Service error. Updates paused for %.0fs.", delay
+            )
+            await self._async_backoff(shard, delay)
+
+        except PynestException:
+            self.stats.errors += 1
+            self.entry_data.client.breaker.record_failure()
+            delay = self._service_error_delay()
+            LOGGER.exception(
+                "Unknown pynest exception. Please create an issue on GitHub with your logfile. Updates paused for %.0fs.",
+                delay,
+            )
+            await self._async_backoff(shard, delay)
+
+        except asyncio.CancelledError:
+            LOGGER.debug("Subscriber: task cancelled, stopping subscription.")
+            raise
+
+        except Exception:  # pylint: disable=broad-except
+            self.stats.errors += 1
+            sm.record_failure()
+            delay = jitter(sm.backoff_interval)
+            LOGGER.exception(
+                "Unknown exception. Please create an issue on GitHub with your logfile. Updates paused for %ds.",
+                delay,
+            )
+            await self._async_backoff(shard, delay)
+
+        return True
+
+    def _open_poll(self, shard: SubscriptionShard) -> asyncio.Task[SubscribeResponse]:
+        """Start the next long-poll of a shard."""
+        return self.hass.async_create_background_task(
+            self._async_poll(shard),
+            f"nest_protect long-poll {self.entry.entry_id} {shard.name}",
+        )
+
+    async def _async_poll(self, shard: SubscriptionShard) -> SubscribeResponse:
+        """Open a long-poll and return its response."""
+        sm = self.entry_data.session_manager
+        client = self.entry_data.client
+        shard.generation = None
+
+        # Held back while the circuit is open, only one shard probes
+        await client.breaker.async_wait()
+        await sm.ensure_session()
+
+        shard.generation = self._session_generation
+        self.stats.requests += 1
+        self._record_gap(shard)
+
+        try:
+            return await client.subscribe_for_data(
+                client.nest_session.access_token,
+                client.nest_session.userid,
+                self.transport_url,
+                shard.revisions,
+            )
+        finally:
+            shard.closed_at = time.monotonic()
+
+    def _service_error_delay(self) -> float:
+        """Return the pause after a service error, until the circuit lets us probe."""
+        breaker = self.entry_data.client.breaker
+
+        return breaker.retry_after() or jitter(breaker.base_window)
+
+    def _record_gap(self, shard: SubscriptionShard) -> None:
+        """Record how long a shard went without an open long-poll."""
+        if shard.closed_at is None:
+            return
+
+        gap = time.monotonic() - shard.closed_at
+        shard.closed_at = None
+
+        stats = self.stats
+        stats.coverage_gap_last = gap
+        stats.coverage_gap_max = max(stats.coverage_gap_max, gap)
+        stats.coverage_gap_total += gap
+
+    @callback
+    def _async_dispatch_alarms(
+        self,
+        shard: SubscriptionShard,
+        result: SubscribeResponse,
+        previous_buckets: dict[str, Bucket | None],
+    ) -> dict[str, set[str]]:
+        """Store and dispatch alarm transitions and fire alarm events.
+
+        Returns the alarm fields that were dispatched, keyed by object_key.
+        """
+        revisions = shard.revisions
+        alarms: dict[str, set[str]] = {}
+
+        for bucket in result.objects:
+            if bucket.type != BucketType.TOPAZ or not revisions.is_newer(bucket):
+                continue
+
+            if (previous := previous_buckets.get(bucket.object_key)) is None:
+                continue
+
+            value = bucket.value
+            previous_value = previous.value
+            fields = {
+                field
+                for field in ALARM_FIELDS
+                if field in value and value[field] != previous_value.get(field)
+            }
+
+            if not fields:
+                continue
+
+            alarms[bucket.object_key] = fields
+            self.entry_data.buckets.update([bucket])
+
+            for field in fields:
+                async_dispatcher_send(
+                    self.hass,
+                    SIGNAL_BUCKET_FIELD.format(
+                        object_key=bucket.object_key, field=field
+                    ),
+                    bucket,
+                )
+
+            # object_timestamp is in milliseconds since the epoch
+            latency = time.time() - bucket.object_timestamp / 1000
+            self.stats.alarms += len(fields)
+            self.stats.alarm_latency_last = latency
+            self.stats.alarm_latency_max = max(self.stats.alarm_latency_max, latency)
+
+            for field in fields:
+                self.hass.bus.async_fire(
+                    EVENT_ALARM,
+                    {
+                        "object_key": bucket.object_key,
+                        "device_id": self._device_id(bucket),
+                        "area": self.entry_data.areas.get(value.get("where_id")),
+                        "alarm": field,
+                        "status": value[field],
+                        "previous_status": previous_value.get(field),
+                    },
+                )
+
+            LOGGER.debug(
+                "Subscriber: %s alarm %s after %.3fs",
+                bucket.object_key,
+                sorted(fields),
+                latency,
+            )
+
+        return alarms
+
+    def _device_id(self, bucket: Bucket) -> str | None:
+        """Return the device registry id of a Nest Protect."""
+        if (serial_number := bucket.value.get("serial_number")) is None:
+            return None
+
+        device = dr.async_get(self.hass).async_get_device(
+            identifiers={(DOMAIN, serial_number)}
+        )
+        return device.id if device else None
+
+    @callback
+    def _async_apply(
+        self,
+        shard: SubscriptionShard,
+        result: SubscribeResponse,
+        previous: dict[str, Bucket | None],
+    ) -> list[tuple[Bucket, Bucket | None]]:
+        """Store the buckets that changed and return the device updates to dispatch."""
+        entry_data = self.entry_data
+
+        # Record the new revisions, so the next request only receives new updates
+        changed = shard.revisions.update(result.objects)
+
+        if changed:
+            entry_data.buckets.update(changed)
+            entry_data.session_manager.schedule_snapshot_save(
+                entry_data.buckets, changed
+            )
+
+        if changed and LOGGER.isEnabledFor(logging.DEBUG):
+            LOGGER.debug(
+                "Subscriber: received updates for %s", [b.object_key for b in changed]
+            )
+
+        updates: list[tuple[Bucket, Bucket | None]] = []
+
+        for bucket in changed:
+            if apply_bucket(entry_data, bucket):
+                updates.append((bucket, previous.get(bucket.object_key)))
+
+        self.stats.updates += len(changed)
+
+        return updates
+
+    @callback
+    def async_reconcile(self, data: FirstDataAPIResponse) -> bool:
+        """Apply live app launch data to a subscription started from persisted state.
+
+        Buckets that are newer than the persisted ones are stored and dispatched
+        like subscribe updates. The other restored buckets are confirmed by
+        their live copy, which makes their alarm sensors available again.
+        Returns False if devices were added or removed, their entities then
+        need to be set up again.
+        """
+        self.transport_url = data.service_urls["urls"]["transport_url"]
+        live = {bucket.object_key: bucket for bucket in data.updated_buckets}
+        buckets = self.entry_data.buckets
+        previous = {key: buckets.get(key) for key in live}
+        restored = buckets.restored.intersection(live)
+        updates: list[tuple[Bucket, Bucket | None]] = []
+
+        for shard in self.shards:
+            objects = [bucket for key, bucket in live.items() if key in shard.revisions]
+            updates += self._async_apply(
+                shard, SubscribeResponse(objects=objects), previous
+            )
+
+        if confirmed := [
+            bucket for key, bucket in live.items() if key in buckets.restored
+        ]:
+            buckets.update(confirmed)
+            updates += [(bucket, None) for bucket in confirmed]
+
+        for bucket, previous_bucket in updates:
+            # Every field of a restored bucket is sent, as its alarm sensors
+            # only become available again once their state is written
+            self._async_dispatch(
+                bucket, None if bucket.object_key in restored else previous_bucket
+            )
+
+        live_devices = {
+            key for key, bucket in live.items() if bucket.type in DEVICE_BUCKET_TYPES
+        }
+
+        return live_devices == set(self.entry_data.devices)
+
+    @callback
+    def _async_dispatch(
+        self,
+        bucket: Bucket,
+        previous: Bucket | None,
+        dispatched: set[str] | None = None,
+    ) -> None:
+        """Notify the entities of a device about the fields that changed.
+
+        Fields in dispatched were already sent by the alarm fast path.
+        """
+        async_dispatcher_send(self.hass, bucket.object_key, bucket)
+
+        fields = diff_bucket_values(previous, bucket)
+
+        if fields is None:
+            fields = bucket.value.keys()
+
+        for field in fields:
+            if dispatched and field in dispatched:
+                continue
+
+            async_dispatcher_send(
+                self.hass,
+                SIGNAL_BUCKET_FIELD.format(object_key=bucket.object_key, field=field),
+                bucket,
+            )
+
+    def _reconnect(self, shard: SubscriptionShard) -> None:
+        """Open a new long-poll right away."""
+        shard.state = SubscriberState.CONNECTING
+        self.stats.reconnects += 1
+
+    def _reauth(self, shard: SubscriptionShard) -> bool:
+        """Ask the user to re-authenticate and stop every shard worker."""
+        for other in self.shards:
+            other.state = SubscriberState.REAUTH
+            # This worker is the one running, it returns on its own
+            other.cancel(worker=other is not shard)
+
+        self.entry.async_start_reauth(self.hass)
+        return False
+
+    async def _async_backoff(self, shard: SubscriptionShard, delay: float) -> None:
+        """Pause before the next cycle."""
+        shard.state = SubscriberState.BACKING_OFF
+        self.stats.backoffs += 1
+        await asyncio.sleep(delay)
+        shard.state = SubscriberState.CONNECTING
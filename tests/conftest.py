@@ -1,7 +1,7 @@
 """Fixtures for testing."""
 
 from collections.abc import Awaitable, Callable, Generator
-from typing import TypeVar
+from typing import Any, TypeVar
 
 import pytest
 from homeassistant.config_entries import ConfigEntryState
@@ -24,6 +24,37 @@ ISSUE_TOKEN = (
 COOKIES = "SID=test-sid; HSID=test-hsid; APISID=test-apisid; SAPISID=test-sapisid; SSID=test-ssid"
 
 
+def make_topaz_value(
+    where_id: str = "w1", structure_id: str = "S", **value: Any
+) -> dict[str, Any]:
+    """Build the value of a topaz (Nest Protect) bucket."""
+    return {
+        "where_id": where_id,
+        "structure_id": structure_id,
+        "serial_number": "06AA01AC00000001",
+        "wifi_mac_address": "18b430000001",
+        "model": "Topaz-2.7",
+        "software_version": "3.4rc4",
+        "wired_or_battery": 1,
+        "smoke_status": 0,
+        "co_status": 0,
+        "heat_status": 0,
+        "is_online": True,
+        "removed_from_base": False,
+        "line_power_present": False,
+        "battery_health_state": 0,
+        "battery_level": 5400,
+        "component_smoke_test_passed": True,
+        "component_co_test_passed": True,
+        "night_light_enable": False,
+        "night_light_brightness": 2,
+        "ntp_green_led_enable": True,
+        "heads_up_enable": True,
+        "steam_detection_enable": True,
+        **value,
+    }
+
+
 @pytest.fixture(autouse=True)
 def auto_enable_custom_integrations(enable_custom_integrations) -> None:
     """Enable custom integration."""
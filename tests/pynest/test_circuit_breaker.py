@@ -0,0 +1,94 @@
+"""Tests for the circuit breaker."""
+
+import asyncio
+from unittest.mock import patch
+
+from custom_components.nest_protect.pynest.circuit_breaker import CircuitBreaker
+from custom_components.nest_protect.pynest.enums import CircuitState
+
+MONOTONIC = "custom_components.nest_protect.pynest.circuit_breaker.time.monotonic"
+JITTER = "custom_components.nest_protect.pynest.circuit_breaker.jitter"
+
+
+def _breaker() -> CircuitBreaker:
+    return CircuitBreaker(
+        failure_threshold=2, base_window=5, max_window=20, probe_timeout=10
+    )
+
+
+def test_opens_after_consecutive_failures_and_probes_once():
+    """Test that the circuit trips, lets one probe through and closes."""
+    breaker = _breaker()
+
+    with patch(MONOTONIC, return_value=100), patch(JITTER, side_effect=lambda w: w):
+        breaker.record_failure()
+        assert breaker.state is CircuitState.CLOSED
+        assert breaker.admit() == 0
+
+        breaker.record_failure()
+        assert breaker.state is CircuitState.OPEN
+        assert breaker.admit() == 5
+        assert breaker.retry_after() == 5
+
+    with patch(MONOTONIC, return_value=105):
+        assert breaker.admit() == 0
+        assert breaker.state is CircuitState.HALF_OPEN
+        # Only the probe goes out
+        assert breaker.admit() == 10
+
+        breaker.record_success()
+        assert breaker.state is CircuitState.CLOSED
+        assert breaker.admit() == 0
+        assert breaker.failures == 0
+
+
+def test_failed_probe_doubles_the_window():
+    """Test that every reopen doubles the window up to the maximum."""
+    breaker = _breaker()
+
+    with patch(MONOTONIC, return_value=0), patch(JITTER, side_effect=lambda w: w):
+        breaker.record_failure()
+        breaker.record_failure()
+
+        windows = []
+        for _ in range(4):
+            breaker._open_until = 0
+            assert breaker.admit() == 0
+            breaker.record_failure()
+            windows.append(breaker.retry_after())
+
+    assert windows == [10, 20, 20, 20]
+    assert breaker.state is CircuitState.OPEN
+
+
+def test_probe_that_survives_counts_as_success():
+    """Test that a long-poll probe that doesn't fail closes the circuit."""
+    breaker = _breaker()
+
+    with patch(MONOTONIC, return_value=0):
+        breaker.record_failure()
+        breaker.record_failure()
+
+    with patch(MONOTONIC, return_value=10):
+        assert breaker.admit() == 0
+
+    with patch(MONOTONIC, return_value=20):
+        assert breaker.admit() == 0
+        assert breaker.state is CircuitState.CLOSED
+
+
+async def test_waiters_resume_when_the_probe_succeeds():
+    """Test that waiting requests go as soon as the probe settles."""
+    breaker = CircuitBreaker(failure_threshold=1, base_window=0.01, probe_timeout=60)
+    breaker.record_failure()
+
+    await asyncio.sleep(0.02)
+    await asyncio.wait_for(breaker.async_wait(), 1)
+    assert breaker.state is CircuitState.HALF_OPEN
+
+    waiter = asyncio.create_task(breaker.async_wait())
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+
+    breaker.record_success()
+    await asyncio.wait_for(waiter, 1)
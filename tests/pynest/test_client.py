@@ -1,13 +1,29 @@
 """Tests for NestClient."""
 
+import asyncio
 from unittest.mock import patch
 
 import pytest
-from aiohttp import ClientSession, web
+from aiohttp import ClientSession, TCPConnector, web
 from aiohttp.test_utils import TestServer
 
+from benchmarks.fake_nest import FakeNestBackend, FakeNestConfig, patch_nest_urls
 from custom_components.nest_protect.pynest.client import NestClient, merge_cookies
 from custom_components.nest_protect.pynest.const import NEST_REQUEST
+from custom_components.nest_protect.pynest.enums import BucketType, TrafficClass
+from custom_components.nest_protect.pynest.exceptions import (
+    BadGatewayException,
+    CircuitOpenException,
+    EmptyResponseException,
+    NestServiceException,
+)
+from custom_components.nest_protect.pynest.models import (
+    ConnectionPoolSettings,
+    NestEnvironment,
+    RetryPolicy,
+    SubscribeResponse,
+)
+from custom_components.nest_protect.pynest.watchdog import LongPollWatchdog
 
 
 @pytest.mark.enable_socket
@@ -210,3 +226,275 @@ def test_merge_cookies_empty_new():
     original = "SID=old; HSID=val"
     result = merge_cookies(original, {})
     assert result == original
+
+
+@pytest.mark.enable_socket
+async def test_client_end_to_end_against_fake_backend(socket_enabled):
+    """Test the full auth, app_launch, put and subscribe chain offline."""
+    backend = FakeNestBackend(FakeNestConfig(devices=3, hold=5))
+
+    async with TestServer(backend.app) as server, ClientSession() as session:
+        backend.base_url = str(server.make_url("")).rstrip("/")
+        environment = NestEnvironment(
+            name="Fake", client_id="fake-client-id", host=backend.base_url
+        )
+
+        with patch_nest_urls(backend.base_url):
+            nest_client = NestClient(session, environment=environment)
+            auth = await nest_client.get_access_token_from_refresh_token("token")
+            nest = await nest_client.authenticate(auth.access_token)
+            data = await nest_client.get_first_data(nest.access_token, nest.userid)
+
+            key = backend.device_keys[0]
+            await nest_client.update_objects(
+                nest.access_token,
+                nest.userid,
+                nest_client.transport_url,
+                [
+                    {
+                        "object_key": key,
+                        "op": "MERGE",
+                        "value": {"heads_up_enable": False},
+                    }
+                ],
+            )
+            result = await nest_client.subscribe_for_data(
+                nest.access_token,
+                nest.userid,
+                nest_client.transport_url,
+                data.updated_buckets,
+            )
+
+    assert len(data.updated_buckets) == len(backend.buckets)
+    assert isinstance(result, SubscribeResponse)
+    assert [bucket.object_key for bucket in result.objects] == [key]
+    assert result.objects[0].type == BucketType.TOPAZ
+    assert result.objects[0].value["heads_up_enable"] is False
+    # A response to a change doesn't tell how long Nest holds a request
+    assert not nest_client.watchdog.holds
+
+
+@pytest.mark.enable_socket
+async def test_puts_use_dedicated_pool_while_long_polls_are_open(socket_enabled):
+    """Test that a saturated shared pool doesn't delay puts."""
+    backend = FakeNestBackend(FakeNestConfig(devices=1, hold=5))
+
+    async with (
+        TestServer(backend.app) as server,
+        ClientSession(connector=TCPConnector(limit=1)) as session,
+    ):
+        backend.base_url = str(server.make_url("")).rstrip("/")
+        environment = NestEnvironment(
+            name="Fake", client_id="fake-client-id", host=backend.base_url
+        )
+
+        with patch_nest_urls(backend.base_url):
+            nest_client = NestClient(
+                session,
+                environment=environment,
+                connection_pools={
+                    TrafficClass.WRITE: ConnectionPoolSettings(limit=1),
+                    TrafficClass.LONG_POLL: ConnectionPoolSettings(limit=2),
+                },
+            )
+            auth = await nest_client.get_access_token_from_refresh_token("token")
+            nest = await nest_client.authenticate(auth.access_token)
+            data = await nest_client.get_first_data(nest.access_token, nest.userid)
+
+            subscriptions = [
+                asyncio.create_task(
+                    nest_client.subscribe_for_data(
+                        nest.access_token,
+                        nest.userid,
+                        nest_client.transport_url,
+                        data.updated_buckets,
+                    )
+                )
+                for _ in range(2)
+            ]
+            await asyncio.sleep(0.1)
+            assert backend.stats.subscribe_open == 2
+
+            key = backend.device_keys[0]
+            result = await asyncio.wait_for(
+                nest_client.update_objects(
+                    nest.access_token,
+                    nest.userid,
+                    nest_client.transport_url,
+                    [{"object_key": key, "op": "MERGE", "value": {"auto_away": True}}],
+                ),
+                timeout=2,
+            )
+            await asyncio.gather(*subscriptions)
+
+            pools = set(nest_client.pools.sessions)
+            await nest_client.async_close()
+            assert not session.closed
+
+    assert result["objects"][0]["object_key"] == key
+    assert pools == {TrafficClass.WRITE, TrafficClass.LONG_POLL}
+    assert not nest_client.pools.sessions
+
+
+@pytest.mark.enable_socket
+async def test_update_objects_retries_transient_bad_gateway(socket_enabled):
+    """Test that a single 502 on a put doesn't fail the write."""
+    calls = 0
+
+    async def make_put_response(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            return web.Response(status=502, text="Bad Gateway")
+        return web.json_response({"objects": [{"object_key": "topaz.A"}]})
+
+    app = web.Application()
+    app.router.add_post("/v6/put", make_put_response)
+
+    async with TestServer(app) as server, ClientSession() as session:
+        nest_client = NestClient(
+            session,
+            retry_policies={"update_objects": RetryPolicy(attempts=2, base_delay=0)},
+        )
+        transport_url = str(server.make_url("")).rstrip("/")
+        objects = [{"object_key": "topaz.A", "op": "MERGE", "value": {}}]
+
+        result = await nest_client.update_objects("token", "1", transport_url, objects)
+        assert result["objects"][0]["object_key"] == "topaz.A"
+        assert calls == 2
+
+        nest_client.retry_policies = {}
+        calls = 0
+        with pytest.raises(BadGatewayException):
+            await nest_client.update_objects("token", "1", transport_url, objects)
+
+
+@pytest.mark.enable_socket
+async def test_subscribe_stall_is_cut_off_and_recorded(socket_enabled):
+    """Test that a silent long-poll times out on the watchdog's read timeout."""
+    backend = FakeNestBackend(FakeNestConfig(devices=1, hold=5))
+
+    async with TestServer(backend.app) as server, ClientSession() as session:
+        backend.base_url = str(server.make_url("")).rstrip("/")
+        environment = NestEnvironment(
+            name="Fake", client_id="fake-client-id", host=backend.base_url
+        )
+
+        with patch_nest_urls(backend.base_url):
+            nest_client = NestClient(session, environment=environment)
+            nest_client.watchdog = LongPollWatchdog(
+                min_read_timeout=0.1, max_read_timeout=1, grace=0
+            )
+            nest_client.watchdog.record_hold(0.1)
+            auth = await nest_client.get_access_token_from_refresh_token("token")
+            nest = await nest_client.authenticate(auth.access_token)
+            data = await nest_client.get_first_data(nest.access_token, nest.userid)
+
+            with pytest.raises(TimeoutError):
+                await nest_client.subscribe_for_data(
+                    nest.access_token,
+                    nest.userid,
+                    nest_client.transport_url,
+                    data.updated_buckets,
+                )
+
+    assert nest_client.watchdog.stall_count == 1
+    assert 0.1 <= nest_client.watchdog.stalls[0] < 1
+    assert nest_client.watchdog.read_timeout >= nest_client.watchdog.stalls[0]
+
+
+@pytest.mark.enable_socket
+async def test_subscribe_records_expired_hold(socket_enabled):
+    """Test that a hold that runs out without changes is learned by the watchdog."""
+    backend = FakeNestBackend(FakeNestConfig(devices=1, hold=0.1, update_rate=0))
+
+    async with TestServer(backend.app) as server, ClientSession() as session:
+        backend.base_url = str(server.make_url("")).rstrip("/")
+        environment = NestEnvironment(
+            name="Fake", client_id="fake-client-id", host=backend.base_url
+        )
+
+        with patch_nest_urls(backend.base_url):
+            nest_client = NestClient(session, environment=environment)
+            auth = await nest_client.get_access_token_from_refresh_token("token")
+            nest = await nest_client.authenticate(auth.access_token)
+            data = await nest_client.get_first_data(nest.access_token, nest.userid)
+
+            with pytest.raises(EmptyResponseException):
+                await nest_client.subscribe_for_data(
+                    nest.access_token,
+                    nest.userid,
+                    nest_client.transport_url,
+                    data.updated_buckets,
+                )
+
+    assert len(nest_client.watchdog.holds) == 1
+    assert nest_client.watchdog.hold_time >= 0.1
+
+
+@pytest.mark.enable_socket
+async def test_update_objects_fails_fast_while_circuit_is_open(socket_enabled):
+    """Test that puts stop reaching Nest once the breaker trips."""
+    calls = 0
+
+    async def make_put_response(request):
+        nonlocal calls
+        calls += 1
+        return web.Response(status=502, text="Bad Gateway")
+
+    app = web.Application()
+    app.router.add_post("/v6/put", make_put_response)
+
+    async with TestServer(app) as server, ClientSession() as session:
+        nest_client = NestClient(
+            session,
+            retry_policies={"update_objects": RetryPolicy(attempts=5, base_delay=0)},
+        )
+        transport_url = str(server.make_url("")).rstrip("/")
+        objects = [{"object_key": "topaz.A", "op": "MERGE", "value": {}}]
+
+        with pytest.raises(CircuitOpenException) as err:
+            await nest_client.update_objects("token", "1", transport_url, objects)
+
+    assert calls == 2
+    assert err.value.retry_after > 0
+    assert nest_client.breaker.state == "open"
+
+
+@pytest.mark.enable_socket
+async def test_subscribe_server_error_with_json_body_opens_circuit(socket_enabled):
+    """Test that a 503 with a JSON body counts as a failure, not a success."""
+
+    async def make_subscribe_response(request):
+        return web.json_response({"error": "unavailable"}, status=503)
+
+    app = web.Application()
+    app.router.add_post("/v6/subscribe", make_subscribe_response)
+
+    async with TestServer(app) as server, ClientSession() as session:
+        nest_client = NestClient(session)
+        transport_url = str(server.make_url("")).rstrip("/")
+
+        for _ in range(nest_client.breaker.failure_threshold):
+            with pytest.raises(NestServiceException):
+                await nest_client.subscribe_for_data("token", "1", transport_url, [])
+
+    assert nest_client.breaker.state == "open"
+
+
+@pytest.mark.enable_socket
+async def test_subscribe_null_body_raises_service_error(socket_enabled):
+    """Test that a 200 with a null JSON body raises instead of AttributeError."""
+
+    async def make_subscribe_response(request):
+        return web.json_response(None)
+
+    app = web.Application()
+    app.router.add_post("/v6/subscribe", make_subscribe_response)
+
+    async with TestServer(app) as server, ClientSession() as session:
+        nest_client = NestClient(session)
+        transport_url = str(server.make_url("")).rstrip("/")
+
+        with pytest.raises(NestServiceException):
+            await nest_client.subscribe_for_data("token", "1", transport_url, [])
@@ -0,0 +1,45 @@
+"""Tests for the pynest JSON codec."""
+
+import pytest
+
+from custom_components.nest_protect.pynest.codec import CODEC, available_codecs
+from custom_components.nest_protect.pynest.const import NEST_REQUEST
+
+
+def test_stdlib_fallback_is_always_available():
+    """Test that the standard library codec is the last resort."""
+    codecs = available_codecs()
+    assert codecs[-1].name == "json"
+    assert codecs[0] is not None
+    assert CODEC.name == codecs[0].name
+
+
+@pytest.mark.parametrize("codec", available_codecs(), ids=lambda codec: codec.name)
+def test_codec_round_trip(codec):
+    """Test that every backend encodes to bytes and decodes bytes and str."""
+    payload = {
+        "objects": [
+            {
+                "object_key": "topaz.ABC",
+                "object_revision": 12,
+                "object_timestamp": 1700000000000,
+                "value": {"battery_level": 5400, "where_id": "é", "ok": True},
+            }
+        ]
+    }
+
+    encoded = codec.dumps(payload)
+
+    assert isinstance(encoded, bytes)
+    assert codec.loads(encoded) == payload
+    assert codec.loads(encoded.decode()) == payload
+
+
+@pytest.mark.parametrize("codec", available_codecs(), ids=lambda codec: codec.name)
+def test_codec_encodes_bucket_type_enums_as_strings(codec):
+    """Test that StrEnum values in request bodies are sent as plain strings."""
+    decoded = codec.loads(codec.dumps(NEST_REQUEST))
+
+    assert decoded["known_bucket_types"] == [
+        str(t) for t in NEST_REQUEST["known_bucket_types"]
+    ]
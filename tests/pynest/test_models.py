@@ -1,10 +1,20 @@
 """Tests for pynest models."""
 
 import datetime
+import json
+import logging
 
 import pytest
 
-from custom_components.nest_protect.pynest.models import NestResponse
+from custom_components.nest_protect.pynest.enums import BucketType
+from custom_components.nest_protect.pynest.models import (
+    Bucket,
+    NestResponse,
+    SubscribeResponse,
+    TopazBucketValue,
+    Where,
+    bucket_type,
+)
 
 
 @pytest.fixture
@@ -107,3 +117,92 @@ def test_nest_response_is_expired_without_buffer():
 
     assert response.is_expired() is True
     assert response.is_expired(buffer_seconds=300) is True
+
+
+def test_buckets_share_interned_keys_and_use_slots():
+    """Test that buckets from separate responses share their key strings."""
+    body = '{"objects": [{"object_key": "topaz.A", "object_revision": 1, "object_timestamp": 1, "value": {"where_id": "w1", "smoke_status": 0}}]}'
+    first, second = (SubscribeResponse(**json.loads(body)).objects[0] for _ in "12")
+
+    assert first.object_key is second.object_key
+    assert first.value == {"where_id": "w1", "smoke_status": 0}
+
+    structure = Bucket("structure.S", 1, 1, json.loads('{"name": "Home"}'))
+    user = Bucket("user.U", 1, 1, json.loads('{"name": "Me"}'))
+    assert all(a is b for a, b in zip(structure.value, user.value, strict=True))
+
+    where = Bucket("where.S", 1, 1, {"wheres": [{"where_id": "w1", "name": "Hall"}]})
+    for obj in (first, where, where.value, where.value.wheres[0]):
+        assert not hasattr(obj, "__dict__")
+
+
+def test_topaz_values_are_decoded_from_the_model_annotations():
+    """Test that topaz values are coerced to their annotated types."""
+    bucket = Bucket(
+        "topaz.A",
+        1,
+        1,
+        {
+            "battery_level": "5400",
+            "co_sequence_number": 3.0,
+            "removed_from_base": 0,
+            "line_power_present": None,
+            "serial_number": "06AA01AC",
+            "new_field": "kept",
+            "smoke_status": "not a number",
+        },
+    )
+    value = bucket.value
+
+    assert isinstance(value, TopazBucketValue)
+    assert value.battery_level == 5400
+    assert value.co_sequence_number == 3
+    assert type(value.co_sequence_number) is int
+    assert value.removed_from_base is False
+    assert value.line_power_present is None
+    assert value["new_field"] == "kept"
+    assert value.smoke_status == "not a number"
+    assert value.heat_status is None
+    assert value.get("heat_status") is None
+
+    with pytest.raises(AttributeError):
+        _ = value.not_a_field
+
+
+def test_bucket_values_convert_fields_on_access():
+    """Test that lazy values keep the payload and convert each field once."""
+    payload = {"battery_level": "5400", "where_id": "w1"}
+    value = Bucket("topaz.A", 1, 1, payload).value
+
+    assert value.raw is payload
+    assert value._typed == {}
+    assert list(value) == ["battery_level", "where_id"]
+    assert "battery_level" in value
+    assert value._typed == {}
+
+    assert value.get("battery_level") == 5400
+    assert value._typed == {"battery_level": 5400}
+    assert value["battery_level"] is value.battery_level
+    assert {**value} == {"battery_level": 5400, "where_id": "w1"}
+    assert dict(value.items()) == {"battery_level": 5400, "where_id": "w1"}
+
+    where = Bucket("where.S", 1, 1, {"wheres": [{"where_id": "w1", "name": "Hall"}]})
+    wheres = where.value.wheres
+    assert wheres == [Where("Hall", "w1")]
+    assert where.value.wheres is wheres
+    assert Bucket("where.S", 1, 1, {}).value.wheres is None
+
+
+def test_bucket_type_is_looked_up_once_per_prefix(caplog):
+    """Test that an unsupported bucket type is only warned about once."""
+    caplog.set_level(logging.DEBUG)
+
+    assert bucket_type("topaz.A") is BucketType.TOPAZ
+    assert bucket_type("kryptonite.B") is BucketType.KRYPTONITE
+    assert Bucket("hologram.A", 1, 1, {}).type is BucketType.UNKNOWN
+    assert bucket_type("hologram.B") is BucketType.UNKNOWN
+    assert BucketType("hologram") is BucketType.UNKNOWN
+
+    warnings = [r for r in caplog.records if r.levelno == logging.WARNING]
+    assert len(warnings) == 1
+    assert "hologram" in warnings[0].getMessage()
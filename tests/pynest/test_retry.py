@@ -0,0 +1,91 @@
+"""Tests for the pynest retry policies."""
+
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+from aiohttp import ClientConnectorError, ClientResponseError, ServerDisconnectedError
+
+from custom_components.nest_protect.pynest.exceptions import (
+    BadCredentialsException,
+    BadGatewayException,
+    NotAuthenticatedException,
+    PynestException,
+)
+from custom_components.nest_protect.pynest.models import RetryPolicy
+from custom_components.nest_protect.pynest.retry import async_retry, is_retryable
+
+
+def _response_error(status: int) -> ClientResponseError:
+    return ClientResponseError(Mock(), (), status=status)
+
+
+@pytest.mark.parametrize(
+    ("exception", "retryable"),
+    [
+        (BadGatewayException(), True),
+        (TimeoutError(), True),
+        (ServerDisconnectedError(), True),
+        (ClientConnectorError(Mock(), OSError()), True),
+        (_response_error(503), True),
+        (_response_error(429), True),
+        (_response_error(400), False),
+        (NotAuthenticatedException(), False),
+        (BadCredentialsException(), False),
+        (PynestException(), False),
+        (ValueError(), False),
+    ],
+)
+def test_is_retryable(exception, retryable):
+    """Test that transient failures are retried and auth or client errors are not."""
+    assert is_retryable(exception) is retryable
+
+
+def test_backoff_uses_full_jitter_within_cap():
+    """Test that delays stay between zero and the capped exponential."""
+    policy = RetryPolicy(attempts=10, base_delay=1, max_delay=5)
+
+    with patch("random.uniform", side_effect=lambda low, high: high) as uniform:
+        assert [policy.backoff(attempt) for attempt in range(1, 5)] == [1, 2, 4, 5]
+
+    assert all(call.args[0] == 0 for call in uniform.call_args_list)
+
+
+async def test_async_retry_recovers_from_transient_failure():
+    """Test that a transient failure is retried within the budget."""
+    func = AsyncMock(side_effect=[BadGatewayException(), "ok"])
+
+    with patch(
+        "custom_components.nest_protect.pynest.retry.asyncio.sleep",
+        new_callable=AsyncMock,
+    ) as sleep:
+        result = await async_retry("put", func, RetryPolicy(attempts=3))
+
+    assert result == "ok"
+    assert func.await_count == 2
+    sleep.assert_awaited_once()
+
+
+async def test_async_retry_raises_fatal_errors_immediately():
+    """Test that fatal errors are not retried."""
+    func = AsyncMock(side_effect=NotAuthenticatedException())
+
+    with pytest.raises(NotAuthenticatedException):
+        await async_retry("put", func, RetryPolicy(attempts=3))
+
+    assert func.await_count == 1
+
+
+async def test_async_retry_gives_up_after_budget():
+    """Test that the last transient failure is raised once attempts run out."""
+    func = AsyncMock(side_effect=TimeoutError())
+
+    with (
+        patch(
+            "custom_components.nest_protect.pynest.retry.asyncio.sleep",
+            new_callable=AsyncMock,
+        ),
+        pytest.raises(TimeoutError),
+    ):
+        await async_retry("put", func, RetryPolicy(attempts=3))
+
+    assert func.await_count == 3
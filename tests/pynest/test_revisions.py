@@ -0,0 +1,92 @@
+"""Tests for the bucket revision index."""
+
+from custom_components.nest_protect.pynest.models import Bucket
+from custom_components.nest_protect.pynest.revisions import (
+    BucketRevisionIndex,
+    diff_bucket_values,
+    partition_buckets,
+)
+
+
+def _bucket(key: str, revision: int, timestamp: int) -> Bucket:
+    return Bucket(key, revision, timestamp, {"where_id": "w1"})
+
+
+def test_update_returns_only_newer_buckets():
+    """Test that only new or newer objects are recorded as changed."""
+    first = _bucket("topaz.A", 1, 1000)
+    index = BucketRevisionIndex([first, _bucket("topaz.B", 1, 1000)])
+    newer = _bucket("topaz.A", 2, 2000)
+    added = _bucket("kryptonite.C", 1, 1500)
+
+    changed = index.update(
+        [newer, _bucket("topaz.B", 1, 1000), _bucket("topaz.A", 1, 1000), added]
+    )
+
+    assert changed == [newer, added]
+    assert len(index) == 3
+    assert index.revision("topaz.A") == 2
+    assert index.revision("missing") is None
+    assert "kryptonite.C" in index
+
+
+def test_objects_are_updated_in_place():
+    """Test that subscribe entries are reused rather than rebuilt per update."""
+    index = BucketRevisionIndex(
+        [_bucket("topaz.A", 1, 1000), _bucket("topaz.B", 3, 1000)]
+    )
+    entry_a, entry_b = index.objects
+
+    index.update([_bucket("topaz.A", 2, 2000)])
+
+    assert index.objects[0] is entry_a
+    assert index.objects[1] is entry_b
+    assert entry_a == {
+        "object_key": "topaz.A",
+        "object_revision": 2,
+        "object_timestamp": 2000,
+    }
+    assert entry_b["object_revision"] == 3
+
+
+def test_diff_bucket_values():
+    """Test that added, removed and modified value fields are reported."""
+    old = Bucket("topaz.A", 1, 1000, {"battery_level": 5400, "co_status": 0, "x": 1})
+    new = Bucket("topaz.A", 2, 2000, {"battery_level": 5390, "co_status": 0, "y": 1})
+
+    assert diff_bucket_values(old, new) == {"battery_level", "x", "y"}
+    assert diff_bucket_values(old, old) == set()
+    assert diff_bucket_values(None, new) is None
+    assert diff_bucket_values(Bucket("structure.S", 1, 1000, None), new) is None
+
+    old_where = Bucket("where.S", 1, 1000, {"wheres": []})
+    new_where = Bucket(
+        "where.S", 2, 2000, {"wheres": [{"where_id": "w", "name": "Hall"}]}
+    )
+    assert diff_bucket_values(old_where, new_where) == {"wheres"}
+    assert "wheres" not in new_where.value._typed
+
+
+def test_partition_buckets_by_structure_and_size():
+    """Test that objects are sharded per structure, then in chunks."""
+    user = Bucket("user.1", 1, 1000, {"structures": ["structure.S1"]})
+    s1 = Bucket("structure.S1", 1, 1000, {"name": "Home"})
+    s2_where = Bucket("where.S2", 1, 1000, {"wheres": []})
+    s1_topaz = Bucket("topaz.A", 1, 1000, {"structure_id": "S1"})
+    s2_topazes = [
+        Bucket(f"topaz.{key}", 1, 1000, {"structure_id": "S2"}) for key in "BCD"
+    ]
+    buckets = [user, s1, s2_where, s1_topaz, *s2_topazes]
+
+    assert partition_buckets(buckets) == [
+        [user, s1, s1_topaz],
+        [s2_where, *s2_topazes],
+    ]
+    assert partition_buckets(buckets, max_size=2) == [
+        [user, s1],
+        [s1_topaz],
+        [s2_where, s2_topazes[0]],
+        s2_topazes[1:],
+    ]
+    assert partition_buckets(buckets, by_structure=False) == [buckets]
+    assert partition_buckets([]) == []
@@ -0,0 +1,123 @@
+"""Tests for the bucket snapshot file."""
+
+import pytest
+
+from custom_components.nest_protect.pynest import snapshot
+from custom_components.nest_protect.pynest.exceptions import SnapshotFormatException
+from custom_components.nest_protect.pynest.snapshot import BucketSnapshotFile
+
+
+def _bucket(key: str, revision: int) -> dict:
+    return {
+        "object_key": key,
+        "object_revision": revision,
+        "object_timestamp": 1000 * revision,
+        "value": {"where_id": "w1", "co_status": revision},
+    }
+
+
+def test_changes_are_appended_and_replayed(tmp_path):
+    """Test that saves append to the log and loading applies it."""
+    file = BucketSnapshotFile(tmp_path / "nest")
+    first = [_bucket("topaz.A", 1), _bucket("topaz.B", 1)]
+
+    # Without a snapshot the first save writes one
+    file.save([], first)
+    assert file.generation == 1
+    snapshot_size = file.snapshot_path.stat().st_size
+
+    file.save([_bucket("topaz.A", 2)], iter(()))
+    file.save([_bucket("topaz.A", 3), _bucket("topaz.C", 1)], iter(()))
+
+    # Only the log was written to
+    assert file.snapshot_path.stat().st_size == snapshot_size
+    assert file.log_size == file.log_path.stat().st_size
+
+    loaded = BucketSnapshotFile(tmp_path / "nest")
+    assert loaded.load() == [
+        _bucket("topaz.A", 3),
+        _bucket("topaz.B", 1),
+        _bucket("topaz.C", 1),
+    ]
+    assert loaded.generation == 1
+    assert loaded.log_size == file.log_size
+
+
+def test_log_is_compacted_once_it_outgrows_its_share(tmp_path, monkeypatch):
+    """Test that a long log is replaced by a new snapshot."""
+    monkeypatch.setattr(snapshot, "_MIN_COMPACT_SIZE", 0)
+    file = BucketSnapshotFile(tmp_path / "nest")
+    current = {f"topaz.{i}": _bucket(f"topaz.{i}", 1) for i in range(8)}
+    file.save([], current.values())
+
+    current["topaz.0"] = _bucket("topaz.0", 2)
+    file.save([current["topaz.0"]], current.values())
+    assert file.generation == 1
+
+    current["topaz.1"] = _bucket("topaz.1", 2)
+    current["topaz.2"] = _bucket("topaz.2", 2)
+    # The changes go straight into the new snapshot, not the log first
+    monkeypatch.setattr(file, "_append", lambda data: pytest.fail("appended"))
+    file.save([current["topaz.1"], current["topaz.2"]], current.values())
+    assert file.generation == 2
+    assert file.log_path.stat().st_size == file.log_size == snapshot._HEADER.size
+
+    assert BucketSnapshotFile(tmp_path / "nest").load() == list(current.values())
+
+
+def test_log_of_another_generation_is_ignored(tmp_path):
+    """Test that a log left behind by an interrupted compaction is not replayed."""
+    file = BucketSnapshotFile(tmp_path / "nest")
+    file.compact([_bucket("topaz.A", 1)])
+    file.append([_bucket("topaz.A", 2)])
+    stale_log = file.log_path.read_bytes()
+
+    file.compact([_bucket("topaz.A", 3)])
+    file.log_path.write_bytes(stale_log)
+
+    loaded = BucketSnapshotFile(tmp_path / "nest")
+    assert loaded.load() == [_bucket("topaz.A", 3)]
+    assert loaded.log_path.stat().st_size == snapshot._HEADER.size
+
+
+def test_record_cut_short_ends_the_log(tmp_path):
+    """Test that a partly written record is dropped from the log."""
+    file = BucketSnapshotFile(tmp_path / "nest")
+    file.compact([_bucket("topaz.A", 1)])
+    file.append([_bucket("topaz.A", 2)])
+    intact = file.log_size
+    file.append([_bucket("topaz.A", 3)])
+
+    with file.log_path.open("r+b") as log:
+        log.truncate(file.log_size - 3)
+
+    loaded = BucketSnapshotFile(tmp_path / "nest")
+    assert loaded.load() == [_bucket("topaz.A", 2)]
+    assert loaded.log_path.stat().st_size == intact
+
+    # New changes follow the last intact record
+    loaded.append([_bucket("topaz.A", 4)])
+    assert BucketSnapshotFile(tmp_path / "nest").load() == [_bucket("topaz.A", 4)]
+
+
+def test_unreadable_snapshot_raises(tmp_path):
+    """Test that a file that isn't a snapshot is rejected."""
+    file = BucketSnapshotFile(tmp_path / "nest")
+    assert file.load() == []
+
+    file.snapshot_path.write_bytes(b'{"nest_session": null}')
+
+    with pytest.raises(SnapshotFormatException):
+        file.load()
+
+
+def test_remove(tmp_path):
+    """Test that removing deletes both files."""
+    file = BucketSnapshotFile(tmp_path / "nest")
+    file.compact([_bucket("topaz.A", 1)])
+
+    file.remove()
+
+    assert not file.snapshot_path.exists()
+    assert not file.log_path.exists()
+    assert file.generation == 0
@@ -0,0 +1,64 @@
+"""Tests for the bucket state store."""
+
+import pytest
+
+from custom_components.nest_protect.pynest.enums import BucketType
+from custom_components.nest_protect.pynest.models import Bucket
+from custom_components.nest_protect.pynest.state import BucketStore
+
+
+def _bucket(key: str, revision: int) -> Bucket:
+    return Bucket(key, revision, 1000 * revision, {"where_id": "w1"})
+
+
+def test_snapshots_are_not_changed_by_updates():
+    """Test that a snapshot keeps its version while the store moves on."""
+    first = _bucket("topaz.A", 1)
+    store = BucketStore([first, _bucket("where.S", 1)])
+
+    snapshot = store.snapshot()
+    assert store.snapshot() is snapshot
+    assert snapshot.version == 0
+
+    newer = _bucket("topaz.A", 2)
+    added = _bucket("kryptonite.B", 1)
+    assert store.update([newer, added]) == 1
+
+    assert snapshot.get("topaz.A") is first
+    assert "kryptonite.B" not in snapshot.buckets
+    assert store.get("topaz.A") is newer
+    assert len(store) == 3
+
+    current = store.snapshot()
+    assert current.version == 1
+    assert list(current.of_type(BucketType.TOPAZ, BucketType.KRYPTONITE)) == [
+        "topaz.A",
+        "kryptonite.B",
+    ]
+
+    with pytest.raises(TypeError):
+        current.buckets["topaz.A"] = first
+
+
+def test_updates_without_snapshot_write_in_place():
+    """Test that the dict is only copied when a snapshot shares it."""
+    store = BucketStore([_bucket("topaz.A", 1)])
+    buckets = store._buckets
+
+    store.update([_bucket("topaz.A", 2)])
+    assert store._buckets is buckets
+
+    store.snapshot()
+    store.update([_bucket("topaz.A", 3)])
+    assert store._buckets is not buckets
+
+
+def test_restored_buckets_until_updated():
+    """Test that saved buckets stay marked as restored until Nest updates them."""
+    store = BucketStore([_bucket("topaz.A", 1), _bucket("topaz.B", 1)], restored=True)
+    assert store.restored == {"topaz.A", "topaz.B"}
+
+    store.update([_bucket("topaz.A", 2)])
+    assert store.restored == {"topaz.B"}
+
+    assert BucketStore([_bucket("topaz.A", 1)]).restored == set()
@@ -0,0 +1,70 @@
+"""Tests for the long-poll watchdog."""
+
+import socket
+
+import pytest
+
+from custom_components.nest_protect.pynest.models import ConnectionPoolSettings
+from custom_components.nest_protect.pynest.watchdog import (
+    LongPollWatchdog,
+    keepalive_socket_factory,
+)
+
+
+def test_read_timeout_follows_observed_hold_time():
+    """Test that the read timeout tracks the longest recent hold."""
+    watchdog = LongPollWatchdog(
+        min_read_timeout=60, max_read_timeout=600, grace=30, history=3
+    )
+    assert watchdog.hold_time is None
+    assert watchdog.read_timeout == 600
+
+    watchdog.record_hold(5)
+    assert watchdog.read_timeout == 60
+
+    watchdog.record_hold(90)
+    assert watchdog.hold_time == 90
+    assert watchdog.read_timeout == 120
+    assert watchdog.timeout().sock_read == 120
+    assert watchdog.timeout().total == 600
+
+    # Holds age out of the window
+    watchdog.record_hold(10)
+    watchdog.record_hold(10)
+    watchdog.record_hold(10)
+    assert watchdog.read_timeout == 60
+
+
+def test_stalls_are_recorded_and_back_off_the_read_timeout():
+    """Test that a stall is recorded and lengthens the next read timeout."""
+    watchdog = LongPollWatchdog(min_read_timeout=60, max_read_timeout=600, grace=30)
+    watchdog.record_hold(60)
+
+    watchdog.record_stall(90)
+    assert watchdog.stall_count == 1
+    assert list(watchdog.stalls) == [90]
+    assert watchdog.read_timeout == 120
+
+    for _ in range(20):
+        watchdog.record_stall(watchdog.read_timeout)
+
+    assert watchdog.read_timeout == 600
+    assert watchdog.stall_count == 21
+
+
+@pytest.mark.enable_socket
+def test_keepalive_socket_factory(socket_enabled):
+    """Test that new sockets probe idle connections."""
+    factory = keepalive_socket_factory(
+        ConnectionPoolSettings(
+            tcp_keepalive_idle=30, tcp_keepalive_interval=10, tcp_keepalive_count=3
+        )
+    )
+
+    with factory((socket.AF_INET, socket.SOCK_STREAM, 0, "", ("127.0.0.1", 0))) as sock:
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE) == 30
+            assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL) == 10
+            assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT) == 3
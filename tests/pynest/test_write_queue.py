@@ -0,0 +1,113 @@
+"""Tests for the coalescing write queue."""
+
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from custom_components.nest_protect.pynest.write_queue import NestWriteQueue
+
+
+def _merge(object_key: str, **value) -> list[dict]:
+    return [{"object_key": object_key, "op": "MERGE", "value": value}]
+
+
+async def test_writes_within_window_share_one_put():
+    """Test that MERGE values are merged per object_key into one request."""
+    result = {"objects": [{"object_key": "topaz.A", "object_revision": 5}]}
+    send = AsyncMock(return_value=result)
+    queue = NestWriteQueue(send, window=0.01)
+
+    results = await asyncio.gather(
+        queue.async_put(_merge("topaz.A", night_light_enable=True)),
+        queue.async_put(_merge("topaz.A", heads_up_enable=False)),
+        queue.async_put(_merge("topaz.B", night_light_brightness=3)),
+    )
+
+    send.assert_awaited_once_with(
+        [
+            {
+                "object_key": "topaz.A",
+                "op": "MERGE",
+                "value": {"night_light_enable": True, "heads_up_enable": False},
+            },
+            {
+                "object_key": "topaz.B",
+                "op": "MERGE",
+                "value": {"night_light_brightness": 3},
+            },
+        ]
+    )
+    assert results == [result, result, result]
+    assert queue.pending == 0
+
+
+async def test_later_write_wins_for_the_same_field():
+    """Test that the last value for a field within the window is sent."""
+    send = AsyncMock(return_value={})
+    queue = NestWriteQueue(send, window=0.01)
+
+    await asyncio.gather(
+        queue.async_put(_merge("topaz.A", night_light_enable=True)),
+        queue.async_put(_merge("topaz.A", night_light_enable=False)),
+    )
+
+    assert send.await_args.args[0][0]["value"] == {"night_light_enable": False}
+
+
+async def test_failure_is_raised_to_every_caller():
+    """Test that a failed put fails every write it carried."""
+    send = AsyncMock(side_effect=TimeoutError())
+    queue = NestWriteQueue(send, window=0.01)
+
+    results = await asyncio.gather(
+        queue.async_put(_merge("topaz.A", night_light_enable=True)),
+        queue.async_put(_merge("topaz.B", night_light_enable=True)),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(r, TimeoutError) for r in results)
+    send.assert_awaited_once()
+
+
+async def test_full_batch_is_sent_without_waiting_for_the_window():
+    """Test that reaching max_objects flushes immediately."""
+    send = AsyncMock(return_value={})
+    queue = NestWriteQueue(send, window=60, max_objects=2)
+
+    await asyncio.wait_for(
+        asyncio.gather(
+            queue.async_put(_merge("topaz.A", auto_away=True)),
+            queue.async_put(_merge("topaz.B", auto_away=True)),
+        ),
+        timeout=1,
+    )
+
+    send.assert_awaited_once()
+
+
+async def test_flush_sends_pending_writes():
+    """Test that async_flush sends writes before the window elapses."""
+    send = AsyncMock(return_value={})
+    queue = NestWriteQueue(send, window=60)
+
+    write = asyncio.create_task(queue.async_put(_merge("topaz.A", auto_away=True)))
+    await asyncio.sleep(0)
+    assert queue.pending == 1
+
+    await queue.async_flush()
+
+    assert await write == {}
+    send.assert_awaited_once()
+
+
+@pytest.mark.parametrize("op", ["OVERWRITE", "REMOVE"])
+async def test_non_merge_operations_are_not_merged(op):
+    """Test that other operations are passed through unchanged."""
+    send = AsyncMock(return_value={})
+    queue = NestWriteQueue(send, window=0.01)
+    obj = {"object_key": "topaz.A", "op": op, "value": {"a": 1}}
+
+    await asyncio.gather(queue.async_put([obj]), queue.async_put([obj]))
+
+    assert send.await_args.args[0] == [obj, obj]
@@ -0,0 +1,24 @@
+"""Smoke tests for the benchmark harnesses."""
+
+import pytest
+
+from benchmarks.bench_client import build_parser, run_subscriber_benchmark
+
+
+@pytest.mark.enable_socket
+async def test_subscriber_benchmark_runs(socket_enabled, tmp_path):
+    """The subscriber benchmark drives the integration against the fake backend."""
+    args = build_parser().parse_args(
+        [
+            "--mode=subscriber",
+            "--devices=2",
+            "--hold=0.2",
+            "--duration=0.5",
+            "--seed=1",
+            f"--config-dir={tmp_path}",
+        ]
+    )
+
+    (updates,) = await run_subscriber_benchmark(args)
+
+    assert updates.values
@@ -0,0 +1,118 @@
+"""Tests for the subscription engine shared by all config entries."""
+
+import asyncio
+import math
+from unittest.mock import AsyncMock, MagicMock
+
+from aiohttp import DummyCookieJar
+
+from custom_components.nest_protect.const import DATA_ENGINE, DOMAIN
+from custom_components.nest_protect.engine import (
+    NestSubscriptionEngine,
+    async_get_engine,
+)
+from custom_components.nest_protect.pynest.client import NestClient
+from custom_components.nest_protect.pynest.enums import TrafficClass
+from custom_components.nest_protect.subscriber import SubscriberState, SubscriberStats
+
+
+def _make_account(renewal_delay: float = 3600, renew_result: bool = True):
+    session_manager = MagicMock(consecutive_failures=0, renewal_failures=0)
+    session_manager.next_renewal_delay = MagicMock(return_value=renewal_delay)
+    session_manager.async_renew = AsyncMock(return_value=renew_result)
+
+    subscriber = MagicMock(state=SubscriberState.STREAMING, stats=SubscriberStats())
+    subscriber.async_stop = AsyncMock()
+
+    return session_manager, subscriber
+
+
+async def test_engine_is_shared_and_pools_are_reused(hass):
+    """Clients of different accounts use the same sockets."""
+    engine = async_get_engine(hass)
+    assert async_get_engine(hass) is engine
+    assert hass.data[DATA_ENGINE] is engine
+    assert DOMAIN not in hass.data
+
+    first = NestClient(MagicMock(), connection_pools=engine.pools)
+    second = NestClient(MagicMock(), connection_pools=engine.pools)
+
+    session = first._session_for(TrafficClass.WRITE)
+    assert second._session_for(TrafficClass.WRITE) is session
+    # The cookies of one account must not be sent with another's requests
+    assert isinstance(session.cookie_jar, DummyCookieJar)
+
+    # Closing one client leaves the shared pools to the engine
+    await first.async_close()
+    assert not session.closed
+
+    await engine.async_close()
+    assert session.closed
+
+
+async def test_wait_turn_staggers_callers(hass):
+    """Concurrent callers are spaced by the stagger interval."""
+    engine = NestSubscriptionEngine(hass, stagger=0.05)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    turns: list[float] = []
+
+    async def take_turn():
+        await engine.async_wait_turn()
+        turns.append(loop.time() - start)
+
+    await asyncio.gather(*(take_turn() for _ in range(3)))
+
+    assert turns[0] < 0.05
+    assert 0.05 <= turns[1] < 0.1
+    assert 0.1 <= turns[2] < 0.15
+
+
+async def test_single_task_renews_accounts_when_due(hass):
+    """One scheduler renews every account and reports its health."""
+    engine = NestSubscriptionEngine(hass, stagger=0)
+    due_manager, due_subscriber = _make_account()
+    due_manager.next_renewal_delay.side_effect = [0, 1800]
+    idle_manager, idle_subscriber = _make_account(renewal_delay=3600)
+    on_renewed = MagicMock()
+
+    engine.add_account("due", due_manager, due_subscriber, on_renewed)
+    renewal_task = engine._renewal_task
+    engine.add_account("idle", idle_manager, idle_subscriber)
+    assert engine._renewal_task is renewal_task
+
+    await asyncio.sleep(0.01)
+
+    due_subscriber.start.assert_called_once()
+    idle_subscriber.start.assert_called_once()
+    due_manager.async_renew.assert_awaited_once_with(on_renewed)
+    idle_manager.async_renew.assert_not_awaited()
+
+    health = engine.health()
+    assert len(engine) == 2
+    assert health["due"].subscriber_state is SubscriberState.STREAMING
+    assert 1790 < health["due"].next_renewal <= 1800
+    assert 3590 < health["idle"].next_renewal <= 3600
+
+    await engine.async_remove_account("due")
+    due_subscriber.async_stop.assert_awaited_once()
+    assert set(engine.health()) == {"idle"}
+
+    await engine.async_close()
+    idle_subscriber.async_stop.assert_awaited_once()
+    assert renewal_task.done()
+
+
+async def test_rejected_credentials_stop_renewal_of_one_account(hass):
+    """An account whose renewal stopped no longer gets renewed."""
+    engine = NestSubscriptionEngine(hass, stagger=0)
+    session_manager, subscriber = _make_account(renewal_delay=0, renew_result=False)
+
+    engine.add_account("rejected", session_manager, subscriber)
+    await asyncio.sleep(0.01)
+
+    session_manager.async_renew.assert_awaited_once()
+    assert engine.health()["rejected"].next_renewal is None
+    assert math.isinf(engine._accounts["rejected"].renew_at)
+
+    await engine.async_close()
@@ -0,0 +1,165 @@
+"""Tests for Nest Protect entities."""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from custom_components.nest_protect.pynest.models import Bucket
+from custom_components.nest_protect.pynest.state import BucketStore
+from custom_components.nest_protect.subscriber import NestSubscriber
+from custom_components.nest_protect.switch import (
+    SWITCH_DESCRIPTIONS,
+    NestProtectSwitch,
+)
+
+from .conftest import make_topaz_value
+
+
+def _make_bucket(revision: int, **value) -> Bucket:
+    return Bucket(
+        object_key="topaz.A",
+        object_revision=revision,
+        object_timestamp=1000 * revision,
+        value=make_topaz_value("where", "structure", **value),
+    )
+
+
+def _make_switch(write_queue) -> NestProtectSwitch:
+    bucket = _make_bucket(1, night_light_enable=False)
+    switch = NestProtectSwitch(
+        bucket,
+        SWITCH_DESCRIPTIONS[0],
+        {},
+        MagicMock(),
+        write_queue,
+        buckets=BucketStore([bucket]),
+    )
+    switch.async_write_ha_state = MagicMock()
+    return switch
+
+
+def _update(switch: NestProtectSwitch, bucket: Bucket) -> None:
+    """Store an update from Nest and notify the switch, like the subscriber."""
+    switch.buckets.update([bucket])
+    switch.update_callback(bucket)
+
+
+async def test_write_is_shown_before_the_put_completes():
+    """The new value is written to state before Nest answers."""
+    states: list[bool] = []
+    write_queue = MagicMock()
+
+    async def put(objects):
+        states.append(switch.is_on)
+        return {"objects": [{"object_key": "topaz.A", "object_revision": 2}]}
+
+    write_queue.async_put = AsyncMock(side_effect=put)
+    switch = _make_switch(write_queue)
+
+    await switch.async_turn_on()
+
+    assert states == [True]
+    assert switch.is_on is True
+
+
+async def test_stale_update_does_not_revert_acknowledged_write():
+    """Updates older than the acknowledged revision keep the optimistic value."""
+    write_queue = MagicMock()
+    write_queue.async_put = AsyncMock(
+        return_value={"objects": [{"object_key": "topaz.A", "object_revision": 3}]}
+    )
+    switch = _make_switch(write_queue)
+
+    await switch.async_turn_on()
+
+    # Unrelated change from before the write was applied by Nest
+    _update(switch, _make_bucket(2, night_light_enable=False))
+    assert switch.is_on is True
+
+    _update(switch, _make_bucket(3, night_light_enable=True))
+    assert switch.is_on is True
+    assert switch._optimistic_value == {}
+
+    # Once reconciled, later changes from Nest are shown as-is
+    _update(switch, _make_bucket(4, night_light_enable=False))
+    assert switch.is_on is False
+
+
+async def test_failed_write_rolls_back():
+    """A failed put restores the confirmed value and re-raises."""
+    write_queue = MagicMock()
+    write_queue.async_put = AsyncMock(side_effect=TimeoutError())
+    switch = _make_switch(write_queue)
+
+    with pytest.raises(TimeoutError):
+        await switch.async_turn_on()
+
+    assert switch.is_on is False
+    assert switch._optimistic_value == {}
+    # Optimistic state, then rollback
+    assert switch.async_write_ha_state.call_count == 2
+
+
+async def test_put_without_revision_waits_for_next_update():
+    """Without a revision in the put response, any newer update reconciles."""
+    write_queue = MagicMock()
+    write_queue.async_put = AsyncMock(return_value={})
+    switch = _make_switch(write_queue)
+
+    await switch.async_turn_on()
+    assert switch.is_on is True
+
+    _update(switch, _make_bucket(2, night_light_enable=True))
+    assert switch._optimistic_value == {}
+
+
+async def test_entities_only_update_for_their_own_field(hass):
+    """A change to one value field only writes the state of its entity."""
+    bucket = _make_bucket(1, night_light_enable=False, heads_up_enable=False)
+    buckets = BucketStore([bucket])
+    switches = {}
+
+    for description in SWITCH_DESCRIPTIONS[:3]:
+        switch = NestProtectSwitch(
+            bucket, description, {}, MagicMock(), MagicMock(), buckets=buckets
+        )
+        switch.hass = hass
+        switch.async_write_ha_state = MagicMock()
+        await switch.async_added_to_hass()
+        switches[description.key] = switch
+
+    subscriber = NestSubscriber(hass, MagicMock(), MagicMock(), MagicMock())
+    updated = _make_bucket(2, night_light_enable=True, heads_up_enable=False)
+    buckets.update([updated])
+    subscriber._async_dispatch(updated, bucket)
+
+    assert switches["night_light_enable"].async_write_ha_state.call_count == 1
+    assert switches["night_light_enable"].is_on is True
+    assert switches["heads_up_enable"].async_write_ha_state.call_count == 0
+    assert switches["ntp_green_led_enable"].async_write_ha_state.call_count == 0
+
+
+async def test_write_of_an_unchanged_value_is_reconciled(hass):
+    """An acknowledged revision that doesn't change the field still reconciles."""
+    write_queue = MagicMock()
+    write_queue.async_put = AsyncMock(
+        return_value={"objects": [{"object_key": "topaz.A", "object_revision": 2}]}
+    )
+    switch = _make_switch(write_queue)
+    switch.hass = hass
+    await switch.async_added_to_hass()
+
+    await switch.async_turn_off()
+    assert switch._optimistic_value == {"night_light_enable": False}
+
+    # Nest confirms the write, the value it already had is not a field change
+    bucket = switch.buckets.get("topaz.A")
+    confirmed = _make_bucket(2, night_light_enable=False)
+    switch.buckets.update([confirmed])
+    NestSubscriber(hass, MagicMock(), MagicMock(), MagicMock())._async_dispatch(
+        confirmed, bucket
+    )
+
+    assert switch._optimistic_value == {}
+    assert switch._optimistic_revision is None
+    assert switch.bucket is confirmed
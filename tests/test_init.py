@@ -1,28 +1,37 @@
 """Test init."""
 
+import asyncio
 import datetime
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import aiohttp
-import pytest
 from homeassistant.config_entries import ConfigEntryState
+from homeassistant.const import STATE_UNAVAILABLE
+from homeassistant.helpers import entity_registry as er
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
 from custom_components.nest_protect import (
     DOMAIN,
-    HomeAssistantNestProtectData,
-    _async_subscribe_for_data,
+    _async_reconcile,
+    _persist_refreshed_cookies,
 )
-from custom_components.nest_protect.const import CONF_COOKIES, MAX_AUTH_FAILURES
+from custom_components.nest_protect.const import CONF_COOKIES, RECONCILE_MAX_ATTEMPTS
 from custom_components.nest_protect.pynest.exceptions import NotAuthenticatedException
-from custom_components.nest_protect.session import NestSessionManager
+from custom_components.nest_protect.pynest.models import FirstDataAPIResponse
 
-from .conftest import COOKIES, ISSUE_TOKEN, ComponentSetup
+from .conftest import COOKIES, ComponentSetup, make_topaz_value
+
+
+def _make_nest_session(access_token: str) -> MagicMock:
+    return MagicMock(
+        access_token=access_token,
+        userid="user1",
+        is_expired=lambda buffer_seconds=0: False,
+        seconds_until_expiry=lambda: 3600,
+        to_dict=lambda: {"access_token": access_token},
+    )
 
 
-@pytest.mark.skip(
-    reason="Needs to be fixed. _async_subscribe_for_data should be cancelled when the component is unloaded."
-)
 async def test_init_with_refresh_token(
     hass,
     component_setup_with_refresh_token: ComponentSetup,
@@ -33,7 +42,10 @@ async def test_init_with_refresh_token(
         patch(
             "custom_components.nest_protect.NestClient.get_access_token_from_refresh_token"
         ),
-        patch("custom_components.nest_protect.NestClient.authenticate"),
+        patch(
+            "custom_components.nest_protect.NestClient.authenticate",
+            return_value=_make_nest_session("nest-token"),
+        ),
         patch("custom_components.nest_protect.NestClient.get_first_data"),
         patch("custom_components.nest_protect.Store.async_load", return_value=None),
         patch("custom_components.nest_protect.Store.async_save"),
@@ -82,9 +94,6 @@ async def test_authenticate_failure_with_refresh_token(
     assert config_entry_with_refresh_token.state is ConfigEntryState.SETUP_RETRY
 
 
-@pytest.mark.skip(
-    reason="Needs to be fixed. _async_subscribe_for_data should be cancelled when the component is unloaded."
-)
 async def test_init_with_cookies(
     hass,
     component_setup_with_cookies: ComponentSetup,
@@ -95,7 +104,10 @@ async def test_init_with_cookies(
         patch(
             "custom_components.nest_protect.NestClient.get_access_token_from_cookies"
         ),
-        patch("custom_components.nest_protect.NestClient.authenticate"),
+        patch(
+            "custom_components.nest_protect.NestClient.authenticate",
+            return_value=_make_nest_session("nest-token"),
+        ),
         patch("custom_components.nest_protect.NestClient.get_first_data"),
         patch("custom_components.nest_protect.Store.async_load", return_value=None),
         patch("custom_components.nest_protect.Store.async_save"),
@@ -190,6 +202,101 @@ async def test_startup_reuses_persisted_session(
     assert config_entry_with_cookies.state is ConfigEntryState.LOADED
 
 
+async def test_startup_restores_persisted_buckets(
+    hass,
+    component_setup_with_cookies: ComponentSetup,
+    config_entry_with_cookies: MockConfigEntry,
+):
+    """Test that persisted buckets set up the entry before Nest answers."""
+    future = datetime.datetime.now(datetime.UTC) + datetime.timedelta(minutes=30)
+    expires_str = future.strftime("%a, %d-%b-%Y %H:%M:%S") + " GMT"
+
+    stored_data = {
+        "nest_session": {
+            "access_token": "persisted-token",
+            "email": "test@test.com",
+            "expires_in": expires_str,
+            "userid": "user1",
+            "is_superuser": False,
+            "language": "en",
+            "weave": {},
+            "user": "user.1",
+            "is_staff": False,
+        },
+        "transport_url": "https://transport.example.com",
+    }
+    saved_buckets = [
+        {
+            "object_key": "where.S",
+            "object_revision": 1,
+            "object_timestamp": 1000,
+            "value": {"wheres": [{"where_id": "w1", "name": "Kitchen"}]},
+        },
+        {
+            "object_key": "topaz.A",
+            "object_revision": 1,
+            "object_timestamp": 1000,
+            "value": make_topaz_value("w1", "S"),
+        },
+    ]
+    first_data_started = asyncio.Event()
+    release_first_data = asyncio.Event()
+
+    async def _get_first_data(*args):
+        first_data_started.set()
+        await release_first_data.wait()
+        # Nest confirms the saved buckets unchanged
+        return FirstDataAPIResponse(
+            weather_for_structures={},
+            service_urls={"urls": {"transport_url": stored_data["transport_url"]}},
+            _2fa_enabled=False,
+            updated_buckets=saved_buckets,
+        )
+
+    with (
+        patch(
+            "custom_components.nest_protect.Store.async_load",
+            return_value=stored_data,
+        ),
+        patch(
+            "custom_components.nest_protect.NestBucketSnapshot.async_load",
+            return_value=saved_buckets,
+        ),
+        patch(
+            "custom_components.nest_protect.NestClient.get_first_data",
+            side_effect=_get_first_data,
+        ),
+        patch(
+            "custom_components.nest_protect.NestClient.get_access_token_from_cookies"
+        ) as mock_cookie_auth,
+    ):
+        await component_setup_with_cookies()
+
+        # Nest is still being asked for live data in the background
+        assert config_entry_with_cookies.state is ConfigEntryState.LOADED
+        await first_data_started.wait()
+
+        # The saved alarm state could be stale until Nest confirms it
+        entity_registry = er.async_get(hass)
+        smoke = entity_registry.async_get_entity_id(
+            "binary_sensor", DOMAIN, "topaz.A-smoke_status"
+        )
+        battery = entity_registry.async_get_entity_id(
+            "sensor", DOMAIN, "topaz.A-battery_level"
+        )
+        assert hass.states.get(smoke).state == STATE_UNAVAILABLE
+        assert hass.states.get(battery).state != STATE_UNAVAILABLE
+
+        release_first_data.set()
+        await hass.async_block_till_done()
+
+        assert hass.states.get(smoke).state != STATE_UNAVAILABLE
+
+    mock_cookie_auth.assert_not_called()
+    entry_data = hass.data[DOMAIN][config_entry_with_cookies.entry_id]
+    assert entry_data.areas == {"w1": "Kitchen"}
+
+
 async def test_startup_falls_through_on_expired_session(
     hass,
     component_setup_with_cookies: ComponentSetup,
@@ -229,12 +336,7 @@ async def test_startup_falls_through_on_expired_session(
         patch("custom_components.nest_protect.Store.async_save"),
     ):
         mock_cookie_auth.return_value = MagicMock(access_token="new-google-token")
-        mock_auth.return_value = MagicMock(
-            access_token="new-nest-token",
-            userid="user1",
-            is_expired=lambda buffer_seconds=0: False,
-            to_dict=lambda: {"access_token": "new-nest-token"},
-        )
+        mock_auth.return_value = _make_nest_session("new-nest-token")
         mock_first_data.return_value = MagicMock(
             updated_buckets=[],
             service_urls={"urls": {"transport_url": "https://t.example.com"}},
@@ -291,167 +393,60 @@ async def test_startup_falls_through_on_401_from_persisted_session(
         patch("custom_components.nest_protect.Store.async_save"),
     ):
         mock_cookie_auth.return_value = MagicMock(access_token="new-google-token")
-        mock_auth.return_value = MagicMock(
-            access_token="new-nest-token",
-            userid="user1",
-            is_expired=lambda buffer_seconds=0: False,
-            to_dict=lambda: {"access_token": "new-nest-token"},
-        )
+        mock_auth.return_value = _make_nest_session("new-nest-token")
         await component_setup_with_cookies()
 
     mock_cookie_auth.assert_called_once()
     assert config_entry_with_cookies.state is ConfigEntryState.LOADED
 
 
-def _make_subscriber_entry_data(
-    hass, entry, consecutive_failures=0, refreshed_cookies=None
-):
-    """Build minimal HomeAssistantNestProtectData for subscriber tests."""
-    client = MagicMock()
-    client.nest_session = MagicMock(is_expired=lambda buffer_seconds=0: False)
-    client.refreshed_cookies = refreshed_cookies
-
-    store = MagicMock()
-    store.async_load = AsyncMock(return_value=None)
-    sm = NestSessionManager(client, store)
-    sm._consecutive_failures = consecutive_failures
-
-    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = HomeAssistantNestProtectData(
-        devices={}, areas={}, client=client, session_manager=sm
-    )
-    return client, sm
-
-
-def _make_subscribe_data():
-    data = MagicMock()
-    data.service_urls = {"urls": {"transport_url": "https://t.example.com"}}
-    data.updated_buckets = []
-    return data
-
-
-async def test_subscriber_timeout_resets_failure_counter(hass):
-    """TimeoutError resets failure counter — it's not an auth failure."""
-    entry = MockConfigEntry(
-        domain=DOMAIN,
-        data={
-            "issue_token": ISSUE_TOKEN,
-            "cookies": COOKIES,
-            "account_type": "production",
-        },
-    )
-    entry.add_to_hass(hass)
-    client, sm = _make_subscriber_entry_data(hass, entry, consecutive_failures=2)
-    client.subscribe_for_data = AsyncMock(side_effect=TimeoutError())
-
-    with (
-        patch("custom_components.nest_protect._register_subscribe_task"),
-        patch.object(sm, "ensure_session", new_callable=AsyncMock),
-    ):
-        await _async_subscribe_for_data(hass, entry, _make_subscribe_data())
-
-    assert sm.consecutive_failures == 0
-
-
-async def test_subscriber_401_accumulates_failure_counter(hass):
-    """401 path must not reset the counter — repeated 401s should reach MAX_AUTH_FAILURES."""
-    entry = MockConfigEntry(
-        domain=DOMAIN,
-        data={
-            "issue_token": ISSUE_TOKEN,
-            "cookies": COOKIES,
-            "account_type": "production",
-        },
-    )
-    entry.add_to_hass(hass)
-    client, sm = _make_subscriber_entry_data(hass, entry, consecutive_failures=0)
-    client.subscribe_for_data = AsyncMock(side_effect=NotAuthenticatedException())
-
-    with (
-        patch("custom_components.nest_protect._register_subscribe_task"),
-        patch.object(sm, "ensure_session", new_callable=AsyncMock),
-        patch.object(sm, "async_refresh_session", new_callable=AsyncMock),
-        patch("custom_components.nest_protect.asyncio.sleep", new_callable=AsyncMock),
-    ):
-        await _async_subscribe_for_data(hass, entry, _make_subscribe_data())
-
-    assert sm.consecutive_failures == 1
-
-
-async def test_subscriber_401_persists_refreshed_cookies(hass):
-    """401 path persists refreshed cookies into the config entry."""
-    entry = MockConfigEntry(
-        domain=DOMAIN,
-        data={
-            "issue_token": ISSUE_TOKEN,
-            "cookies": COOKIES,
-            "account_type": "production",
-        },
-    )
-    entry.add_to_hass(hass)
+async def test_persist_refreshed_cookies(hass, config_entry_with_cookies):
+    """Refreshed cookies are persisted into the config entry and the client."""
+    config_entry_with_cookies.add_to_hass(hass)
     new_cookies = "SID=new-sid; HSID=new-hsid"
-    client, sm = _make_subscriber_entry_data(hass, entry, refreshed_cookies=new_cookies)
-    client.subscribe_for_data = AsyncMock(side_effect=NotAuthenticatedException())
+    client = MagicMock(cookies=COOKIES)
+    sm = MagicMock(refreshed_cookies=new_cookies)
 
-    with (
-        patch("custom_components.nest_protect._register_subscribe_task"),
-        patch.object(sm, "ensure_session", new_callable=AsyncMock),
-        patch.object(sm, "async_refresh_session", new_callable=AsyncMock),
-        patch("custom_components.nest_protect.asyncio.sleep", new_callable=AsyncMock),
-    ):
-        await _async_subscribe_for_data(hass, entry, _make_subscribe_data())
+    _persist_refreshed_cookies(hass, config_entry_with_cookies, client, sm)
 
-    assert entry.data.get(CONF_COOKIES) == new_cookies
+    assert config_entry_with_cookies.data.get(CONF_COOKIES) == new_cookies
     # In-memory client must also be updated so the next refresh in this HA
     # session uses fresh cookies (regression guard for bc05166).
     assert client.cookies == new_cookies
 
 
-async def test_subscriber_401_repeated_failures_triggers_reauth(hass):
-    """Repeated 401s should reach MAX_AUTH_FAILURES and trigger reauth."""
-    entry = MockConfigEntry(
-        domain=DOMAIN,
-        data={
-            "issue_token": ISSUE_TOKEN,
-            "cookies": COOKIES,
-            "account_type": "production",
-        },
-    )
-    entry.add_to_hass(hass)
-    client, sm = _make_subscriber_entry_data(hass, entry, consecutive_failures=0)
-    client.subscribe_for_data = AsyncMock(side_effect=NotAuthenticatedException())
+def _make_reconcile_entry_data(get_first_data) -> MagicMock:
+    entry_data = MagicMock()
+    entry_data.client.nest_session = _make_nest_session("nest-token")
+    entry_data.client.refreshed_cookies = None
+    entry_data.client.get_first_data = AsyncMock(side_effect=get_first_data)
+    entry_data.session_manager.ensure_session = AsyncMock()
+    entry_data.session_manager.async_refresh_session = AsyncMock()
+    entry_data.session_manager.refreshed_cookies = None
+    entry_data.subscriber.async_reconcile = MagicMock(return_value=True)
+    return entry_data
 
-    with (
-        patch("custom_components.nest_protect._register_subscribe_task"),
-        patch.object(sm, "ensure_session", new_callable=AsyncMock),
-        patch.object(sm, "async_refresh_session", new_callable=AsyncMock),
-        patch("custom_components.nest_protect.asyncio.sleep", new_callable=AsyncMock),
-        patch.object(entry, "async_start_reauth") as mock_reauth,
-    ):
-        for _ in range(MAX_AUTH_FAILURES):
-            await _async_subscribe_for_data(hass, entry, _make_subscribe_data())
 
-    assert sm.consecutive_failures == MAX_AUTH_FAILURES
-    mock_reauth.assert_called_once_with(hass)
+async def test_reconcile_renews_a_rejected_session(hass):
+    """Test that a 401 on the live app launch renews the restored session."""
+    data = MagicMock()
+    entry_data = _make_reconcile_entry_data([NotAuthenticatedException(), data])
+
+    await _async_reconcile(hass, MagicMock(), entry_data)
 
+    entry_data.session_manager.async_refresh_session.assert_awaited_once()
+    entry_data.subscriber.async_reconcile.assert_called_once_with(data)
 
-async def test_subscriber_success_resets_failure_counter(hass):
-    """A successful subscribe call must reset the failure counter to zero."""
-    entry = MockConfigEntry(
-        domain=DOMAIN,
-        data={
-            "issue_token": ISSUE_TOKEN,
-            "cookies": COOKIES,
-            "account_type": "production",
-        },
-    )
-    entry.add_to_hass(hass)
-    client, sm = _make_subscriber_entry_data(hass, entry, consecutive_failures=2)
-    client.subscribe_for_data = AsyncMock(return_value={"objects": []})
 
-    with (
-        patch("custom_components.nest_protect._register_subscribe_task"),
-        patch.object(sm, "ensure_session", new_callable=AsyncMock),
-    ):
-        await _async_subscribe_for_data(hass, entry, _make_subscribe_data())
+async def test_reconcile_gives_up_after_max_attempts(hass, caplog):
+    """Test that reconciliation stops retrying and warns when Nest stays down."""
+    entry_data = _make_reconcile_entry_data(TimeoutError())
+
+    with patch("custom_components.nest_protect.asyncio.sleep") as mock_sleep:
+        await _async_reconcile(hass, MagicMock(), entry_data)
 
-    assert sm.consecutive_failures == 0
+    assert entry_data.client.get_first_data.await_count == RECONCILE_MAX_ATTEMPTS
+    # No backoff after the last attempt
+    assert mock_sleep.await_count == RECONCILE_MAX_ATTEMPTS - 1
+    entry_data.subscriber.async_reconcile.assert_not_called()
+    assert "unavailable until Nest sends an update" in caplog.text
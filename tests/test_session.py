@@ -2,13 +2,22 @@
 
 from __future__ import annotations
 
+import asyncio
 import datetime
-from unittest.mock import AsyncMock, MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from custom_components.nest_protect.const import BACKOFF_INTERVALS, MAX_AUTH_FAILURES
+from custom_components.nest_protect.const import (
+    BACKOFF_INTERVALS,
+    MAX_AUTH_FAILURES,
+    SESSION_EXPIRY_BUFFER_SECONDS,
+    SESSION_RENEWAL_LEAD_SECONDS,
+    SESSION_RENEWAL_MIN_INTERVAL,
+    SESSION_RENEWAL_RETRY_INTERVALS,
+)
 from custom_components.nest_protect.pynest.exceptions import (
+    BadCredentialsException,
     NotAuthenticatedException,
 )
 from custom_components.nest_protect.pynest.models import NestResponse
@@ -180,11 +189,16 @@ async def test_no_persisted_session_uses_cookies():
         return_value=MagicMock(access_token="google-token")
     )
     client.authenticate = AsyncMock(return_value=new_nest_session)
-    client.get_first_data = AsyncMock(return_value=_make_first_data())
     client.nest_session = None
     client.transport_url = None
     client.refreshed_cookies = None
 
+    async def _get_first_data(*args):
+        client.transport_url = "https://transport.example.com"
+        return _make_first_data()
+
+    client.get_first_data = AsyncMock(side_effect=_get_first_data)
+
     store = MagicMock()
     store.async_load = AsyncMock(return_value=None)
     store.async_save = AsyncMock()
@@ -197,8 +211,96 @@ async def test_no_persisted_session_uses_cookies():
     # Should have used cookie auth
     client.get_access_token_from_cookies.assert_called_once()
     client.authenticate.assert_called_once_with("google-token")
-    # Should have persisted the session
-    store.async_save.assert_called_once()
+    # Should have persisted the session with the transport URL for a warm start
+    store.async_save.assert_called_once_with(
+        {
+            "nest_session": new_nest_session.to_dict(),
+            "transport_url": "https://transport.example.com",
+        }
+    )
+
+
+@pytest.mark.asyncio
+async def test_restore_valid_session_saves_missing_transport_url():
+    """Test that a store without a transport URL gets it after app launch."""
+    valid_session = _make_nest_response(expired=False)
+    stored_data = {"nest_session": valid_session.to_dict(), "transport_url": None}
+
+    client = MagicMock()
+
+    async def _get_first_data(*args):
+        client.transport_url = "https://transport.example.com"
+        return _make_first_data()
+
+    client.get_first_data = AsyncMock(side_effect=_get_first_data)
+
+    store = MagicMock()
+    store.async_load = AsyncMock(return_value=stored_data)
+    store.async_save = AsyncMock()
+
+    manager = NestSessionManager(client=client, store=store)
+
+    assert await manager.async_setup() is not None
+    store.async_save.assert_called_once_with(
+        {
+            "nest_session": valid_session.to_dict(),
+            "transport_url": "https://transport.example.com",
+        }
+    )
+
+
+@pytest.mark.asyncio
+async def test_restore_saved_buckets():
+    """Test that saved buckets are restored without calling Nest."""
+    valid_session = _make_nest_response(expired=False)
+    bucket = {
+        "object_key": "topaz.A",
+        "object_revision": 3,
+        "object_timestamp": 3000,
+        "value": {"where_id": "w1", "co_status": 0},
+    }
+    stored_data = {
+        "nest_session": valid_session.to_dict(),
+        "transport_url": "https://transport.example.com",
+    }
+
+    client = MagicMock()
+    client.nest_session = None
+    client.transport_url = None
+    client.get_first_data = AsyncMock()
+
+    store = MagicMock()
+    store.async_load = AsyncMock(return_value=stored_data)
+    snapshot = MagicMock()
+    snapshot.async_load = AsyncMock(return_value=[bucket])
+
+    manager = NestSessionManager(client=client, store=store, snapshot=snapshot)
+
+    result = await manager.async_restore()
+
+    assert result is not None
+    assert [b.to_dict() for b in result.updated_buckets] == [bucket]
+    assert client.nest_session == valid_session
+    assert client.transport_url == "https://transport.example.com"
+    client.get_first_data.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_restore_without_saved_buckets_returns_none():
+    """Test that a session without saved buckets isn't restored."""
+    store = MagicMock()
+    store.async_load = AsyncMock(
+        return_value={
+            "nest_session": _make_nest_response(expired=False).to_dict(),
+            "transport_url": "https://transport.example.com",
+        }
+    )
+    snapshot = MagicMock()
+    snapshot.async_load = AsyncMock(return_value=[])
+
+    manager = NestSessionManager(client=MagicMock(), store=store, snapshot=snapshot)
+
+    assert await manager.async_restore() is None
 
 
 @pytest.mark.asyncio
@@ -369,3 +471,173 @@ async def test_backoff_interval_increases():
     for _ in range(10):
         manager.record_failure()
     assert manager.backoff_interval == BACKOFF_INTERVALS[-1]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_refreshes_are_coalesced():
+    """Concurrent ensure_session and refresh calls share one auth round trip."""
+    new_session = _make_nest_response(expired=False)
+    release = asyncio.Event()
+
+    async def slow_authenticate(access_token):
+        await release.wait()
+        return new_session
+
+    client = MagicMock()
+    client.nest_session = _make_nest_response(expired=True)
+    client.auth = MagicMock(access_token="existing-google-token")
+    client.auth.is_expired = MagicMock(return_value=False)
+    client.authenticate = AsyncMock(side_effect=slow_authenticate)
+
+    store = MagicMock()
+    store.async_save = AsyncMock()
+
+    manager = NestSessionManager(client=client, store=store)
+
+    callers = [
+        asyncio.create_task(manager.ensure_session()),
+        asyncio.create_task(manager.ensure_session()),
+        asyncio.create_task(manager.async_refresh_session()),
+    ]
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(*callers)
+
+    client.authenticate.assert_called_once_with("existing-google-token")
+    store.async_save.assert_called_once()
+    assert client.nest_session == new_session
+
+    # A later refresh starts a new round trip instead of reusing the old one
+    await manager.async_refresh_session()
+    assert client.authenticate.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_coalesced_refresh_failure_propagates_to_all_callers():
+    """Every caller waiting on a shared refresh sees its failure."""
+    client = MagicMock()
+    client.nest_session = None
+    client.auth = MagicMock(access_token="existing-google-token")
+    client.auth.is_expired = MagicMock(return_value=False)
+    client.authenticate = AsyncMock(side_effect=NotAuthenticatedException("401"))
+
+    store = MagicMock()
+    store.async_save = AsyncMock()
+
+    manager = NestSessionManager(client=client, store=store)
+
+    results = await asyncio.gather(
+        manager.ensure_session(),
+        manager.ensure_session(),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(r, NotAuthenticatedException) for r in results)
+    client.authenticate.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_renewal_delay_tracks_earliest_expiry():
+    """Renewal is scheduled ahead of the Nest session or Google token expiry."""
+    client = MagicMock()
+    client.nest_session = MagicMock()
+    client.nest_session.seconds_until_expiry = MagicMock(return_value=3600)
+    client.auth = None
+
+    manager = NestSessionManager(client=client, store=MagicMock())
+
+    assert manager.renewal_delay() == (
+        3600 - SESSION_EXPIRY_BUFFER_SECONDS - SESSION_RENEWAL_LEAD_SECONDS
+    )
+
+    client.auth = MagicMock()
+    client.auth.seconds_until_expiry = MagicMock(return_value=1000)
+    assert manager.renewal_delay() == 1000 - SESSION_RENEWAL_LEAD_SECONDS
+
+    client.auth.seconds_until_expiry = MagicMock(return_value=-5)
+    assert manager.renewal_delay() == 0
+
+    client.nest_session = None
+    assert manager.renewal_delay() == 0
+
+
+@pytest.mark.asyncio
+async def test_renew_retries_with_jitter_and_notifies():
+    """Failed renewals are retried with jittered delays, success is reported."""
+    client = MagicMock()
+    client.nest_session = None
+    client.auth = None
+
+    manager = NestSessionManager(client=client, store=MagicMock())
+    on_renewed = MagicMock()
+    delays = [manager.next_renewal_delay()]
+
+    with patch.object(
+        manager,
+        "async_refresh_session",
+        new_callable=AsyncMock,
+        side_effect=[TimeoutError(), TimeoutError(), None],
+    ) as mock_refresh:
+        for _ in range(3):
+            assert await manager.async_renew(on_renewed)
+            delays.append(manager.next_renewal_delay())
+
+    assert mock_refresh.call_count == 3
+    mock_refresh.assert_called_with(renew_auth=True)
+    on_renewed.assert_called_once()
+    assert manager.renewal_failures == 0
+    # Due immediately, then two jittered retries, then the minimum interval
+    assert delays[0] == 0
+    interval = SESSION_RENEWAL_RETRY_INTERVALS[0]
+    assert interval / 2 <= delays[1] <= interval
+    interval = SESSION_RENEWAL_RETRY_INTERVALS[1]
+    assert interval / 2 <= delays[2] <= interval
+    assert delays[3] == SESSION_RENEWAL_MIN_INTERVAL
+
+
+@pytest.mark.asyncio
+async def test_renew_stops_on_bad_credentials():
+    """Rejected credentials stop renewal instead of retrying forever."""
+    client = MagicMock()
+    client.nest_session = None
+    client.auth = None
+
+    manager = NestSessionManager(client=client, store=MagicMock())
+    on_renewed = MagicMock()
+
+    with patch.object(
+        manager,
+        "async_refresh_session",
+        new_callable=AsyncMock,
+        side_effect=BadCredentialsException(),
+    ):
+        assert not await manager.async_renew(on_renewed)
+
+    on_renewed.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_update_objects_ensures_session_first():
+    """async_update_objects refreshes an expired session before the put."""
+    new_session = _make_nest_response(expired=False)
+
+    client = MagicMock()
+    client.nest_session = _make_nest_response(expired=True)
+    client.transport_url = "https://transport.example.com"
+    client.auth = MagicMock(access_token="existing-google-token")
+    client.auth.is_expired = MagicMock(return_value=False)
+    client.authenticate = AsyncMock(return_value=new_session)
+    client.update_objects = AsyncMock(return_value={"objects": []})
+
+    store = MagicMock()
+    store.async_save = AsyncMock()
+
+    manager = NestSessionManager(client=client, store=store)
+    objects = [{"object_key": "topaz.A", "op": "MERGE", "value": {"a": 1}}]
+
+    assert await manager.async_update_objects(objects) == {"objects": []}
+
+    client.update_objects.assert_awaited_once_with(
+        "test-token", "user1", "https://transport.example.com", objects
+    )
+    client.authenticate.assert_awaited_once()
@@ -0,0 +1,36 @@
+"""Tests for saving the buckets of a config entry."""
+
+from custom_components.nest_protect.pynest.models import Bucket
+from custom_components.nest_protect.pynest.state import BucketStore
+from custom_components.nest_protect.snapshot import NestBucketSnapshot
+
+
+async def test_scheduled_changes_are_saved(hass):
+    """Test that scheduled changes are saved in one batch and restored."""
+    buckets = BucketStore(
+        [
+            Bucket("topaz.A", 1, 1000, {"where_id": "w1", "co_status": 0}),
+            Bucket("where.S", 1, 1000, {"wheres": []}),
+        ]
+    )
+    snapshot = NestBucketSnapshot(hass, "nest_protect_test")
+
+    # The first save writes every bucket
+    snapshot.async_schedule_save(buckets)
+    await snapshot.async_save()
+
+    newer = Bucket("topaz.A", 2, 2000, {"where_id": "w1", "co_status": 3})
+    buckets.update([newer])
+    snapshot.async_schedule_save(buckets, [newer])
+    snapshot.async_schedule_save(buckets, [newer])
+    await snapshot.async_save()
+
+    restored = await NestBucketSnapshot(hass, "nest_protect_test").async_load()
+    assert restored == [newer.to_dict(), buckets.get("where.S").to_dict()]
+
+    await snapshot.async_replace([newer])
+    restored = await NestBucketSnapshot(hass, "nest_protect_test").async_load()
+    assert restored == [newer.to_dict()]
+
+    await snapshot.async_remove()
+    assert await NestBucketSnapshot(hass, "nest_protect_test").async_load() == []
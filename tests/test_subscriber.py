@@ -0,0 +1,534 @@
+"""Tests for the subscription worker."""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock, call, patch
+
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_capture_events,
+)
+
+from custom_components.nest_protect import DOMAIN, HomeAssistantNestProtectData
+from custom_components.nest_protect.buckets import BUCKET_HANDLERS
+from custom_components.nest_protect.const import EVENT_ALARM, MAX_AUTH_FAILURES
+from custom_components.nest_protect.pynest.circuit_breaker import CircuitBreaker
+from custom_components.nest_protect.pynest.enums import BucketType
+from custom_components.nest_protect.pynest.exceptions import (
+    EmptyResponseException,
+    NestServiceException,
+    NotAuthenticatedException,
+)
+from custom_components.nest_protect.pynest.models import Bucket, SubscribeResponse
+from custom_components.nest_protect.pynest.state import BucketStore
+from custom_components.nest_protect.pynest.write_queue import NestWriteQueue
+from custom_components.nest_protect.session import NestSessionManager
+from custom_components.nest_protect.subscriber import (
+    NestSubscriber,
+    SubscriberState,
+    SubscriptionShard,
+)
+
+from .conftest import COOKIES, ISSUE_TOKEN
+
+
+def _make_entry(hass) -> MockConfigEntry:
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        data={
+            "issue_token": ISSUE_TOKEN,
+            "cookies": COOKIES,
+            "account_type": "production",
+        },
+    )
+    entry.add_to_hass(hass)
+    return entry
+
+
+def _make_subscribe_data():
+    data = MagicMock()
+    data.service_urls = {"urls": {"transport_url": "https://t.example.com"}}
+    data.updated_buckets = []
+    return data
+
+
+def _make_subscriber(
+    hass, entry, consecutive_failures=0, on_session_refreshed=None, data=None, **kwargs
+) -> NestSubscriber:
+    """Build a subscriber with minimal HomeAssistantNestProtectData."""
+    client = MagicMock()
+    client.nest_session = MagicMock(is_expired=lambda buffer_seconds=0: False)
+    client.breaker = CircuitBreaker()
+    client.refreshed_cookies = None
+
+    store = MagicMock()
+    store.async_load = AsyncMock(return_value=None)
+    sm = NestSessionManager(client, store)
+    sm._consecutive_failures = consecutive_failures
+    sm.ensure_session = AsyncMock()
+    sm.async_refresh_session = AsyncMock()
+
+    data = data or _make_subscribe_data()
+    entry_data = HomeAssistantNestProtectData(
+        buckets=BucketStore(data.updated_buckets),
+        areas={},
+        client=client,
+        session_manager=sm,
+        write_queue=NestWriteQueue(sm.async_update_objects),
+    )
+    return NestSubscriber(
+        hass,
+        entry,
+        entry_data,
+        data,
+        on_session_refreshed=on_session_refreshed,
+        **kwargs,
+    )
+
+
+async def test_subscriber_timeout_resets_failure_counter(hass):
+    """TimeoutError resets failure counter — it's not an auth failure."""
+    subscriber = _make_subscriber(hass, _make_entry(hass), consecutive_failures=2)
+    subscriber.entry_data.client.subscribe_for_data = AsyncMock(
+        side_effect=TimeoutError()
+    )
+
+    assert await subscriber.async_run_once(subscriber.shards[0])
+
+    assert subscriber.entry_data.session_manager.consecutive_failures == 0
+    assert subscriber.state is SubscriberState.CONNECTING
+    assert subscriber.stats.reconnects == 1
+
+
+async def test_subscriber_401_backs_off_and_refreshes_session(hass):
+    """401 backs off, then refreshes the session before the next long-poll."""
+    on_session_refreshed = MagicMock()
+    subscriber = _make_subscriber(
+        hass, _make_entry(hass), on_session_refreshed=on_session_refreshed
+    )
+    sm = subscriber.entry_data.session_manager
+    subscriber.entry_data.client.subscribe_for_data = AsyncMock(
+        side_effect=[NotAuthenticatedException(), SubscribeResponse()]
+    )
+
+    with patch(
+        "custom_components.nest_protect.subscriber.asyncio.sleep",
+        new_callable=AsyncMock,
+    ) as sleep:
+        assert await subscriber.async_run_once(subscriber.shards[0])
+
+    # 401 path must not reset the counter, repeated 401s should reach MAX_AUTH_FAILURES
+    assert sm.consecutive_failures == 1
+    sleep.assert_awaited_once()
+    sm.async_refresh_session.assert_not_awaited()
+
+    assert await subscriber.async_run_once(subscriber.shards[0])
+
+    sm.async_refresh_session.assert_awaited_once()
+    on_session_refreshed.assert_called_once()
+    assert sm.consecutive_failures == 0
+    assert subscriber.state is SubscriberState.STREAMING
+    assert subscriber.stats.backoffs == 1
+    assert subscriber.stats.session_refreshes == 1
+
+
+async def test_subscriber_401_repeated_failures_triggers_reauth(hass):
+    """Repeated 401s should reach MAX_AUTH_FAILURES, trigger reauth and stop."""
+    entry = _make_entry(hass)
+    subscriber = _make_subscriber(hass, entry)
+    subscriber.entry_data.client.subscribe_for_data = AsyncMock(
+        side_effect=NotAuthenticatedException()
+    )
+    # Another shard with its worker and next long-poll still open
+    other = SubscriptionShard("other", [])
+    other.task = asyncio.create_task(asyncio.Event().wait())
+    other.pending = asyncio.create_task(asyncio.Event().wait())
+    subscriber.shards.append(other)
+    worker, pending = other.task, other.pending
+
+    with (
+        patch(
+            "custom_components.nest_protect.subscriber.asyncio.sleep",
+            new_callable=AsyncMock,
+        ),
+        patch.object(entry, "async_start_reauth") as mock_reauth,
+    ):
+        results = [
+            await subscriber.async_run_once(subscriber.shards[0])
+            for _ in range(MAX_AUTH_FAILURES)
+        ]
+
+    assert results == [True] * (MAX_AUTH_FAILURES - 1) + [False]
+    await asyncio.gather(worker, pending, return_exceptions=True)
+    assert worker.cancelled()
+    assert pending.cancelled()
+    assert other.task is None
+    assert other.pending is None
+    assert subscriber.entry_data.session_manager.consecutive_failures == (
+        MAX_AUTH_FAILURES
+    )
+    assert subscriber.state is SubscriberState.REAUTH
+    mock_reauth.assert_called_once_with(hass)
+
+
+async def test_subscriber_success_resets_failure_counter(hass):
+    """A successful subscribe call must reset the failure counter to zero."""
+    subscriber = _make_subscriber(hass, _make_entry(hass), consecutive_failures=2)
+    subscriber.entry_data.client.subscribe_for_data = AsyncMock(
+        return_value=SubscribeResponse()
+    )
+
+    assert await subscriber.async_run_once(subscriber.shards[0])
+
+    assert subscriber.entry_data.session_manager.consecutive_failures == 0
+    # The next long-poll is opened right away
+    assert subscriber.stats.requests == 2
+
+
+async def test_subscriber_indexes_changed_buckets(hass):
+    """Changed buckets are stored, dispatched and their revisions subscribed."""
+    unchanged = Bucket("topaz.B", 1, 1000, {"where_id": "w1", "co_status": 0})
+    data = _make_subscribe_data()
+    data.updated_buckets = [
+        Bucket("topaz.A", 1, 1000, {"where_id": "w1", "co_status": 0}),
+        unchanged,
+        Bucket("where.S", 1, 1000, {"wheres": []}),
+    ]
+    subscriber = _make_subscriber(hass, _make_entry(hass), data=data)
+    entry_data = subscriber.entry_data
+
+    result = SubscribeResponse(
+        objects=[
+            {
+                "object_key": "topaz.A",
+                "object_revision": 2,
+                "object_timestamp": 2000,
+                "value": {"where_id": "w1", "co_status": 3},
+            },
+            {
+                "object_key": "topaz.B",
+                "object_revision": 1,
+                "object_timestamp": 1000,
+                "value": {"where_id": "w1", "co_status": 0},
+            },
+            {
+                "object_key": "where.S",
+                "object_revision": 2,
+                "object_timestamp": 2000,
+                "value": {"wheres": [{"where_id": "w1", "name": "Kitchen"}]},
+            },
+        ]
+    )
+    entry_data.client.subscribe_for_data = AsyncMock(return_value=result)
+
+    with patch(
+        "custom_components.nest_protect.subscriber.async_dispatcher_send"
+    ) as mock_dispatch:
+        await subscriber.async_run_once(subscriber.shards[0])
+
+    assert entry_data.client.subscribe_for_data.await_args.args[3] is (
+        subscriber.shards[0].revisions
+    )
+
+    topaz = result.objects[0]
+    # The CO alarm goes out first
+    assert mock_dispatch.call_args_list == [
+        call(hass, "topaz.A:co_status", topaz),
+        call(hass, "topaz.A", topaz),
+    ]
+    assert entry_data.devices == {"topaz.A": topaz, "topaz.B": unchanged}
+    assert entry_data.areas == {"w1": "Kitchen"}
+    assert entry_data.buckets.get("where.S") is result.objects[2]
+    # The CO alarm was stored ahead of the other updates
+    assert entry_data.buckets.version == 2
+    assert subscriber.shards[0].revisions.objects == [
+        {"object_key": "topaz.A", "object_revision": 2, "object_timestamp": 2000},
+        {"object_key": "topaz.B", "object_revision": 1, "object_timestamp": 1000},
+        {"object_key": "where.S", "object_revision": 2, "object_timestamp": 2000},
+    ]
+    assert subscriber.stats.updates == 2
+
+
+async def test_subscriber_reconciles_restored_buckets(hass):
+    """Live app launch data replaces outdated restored buckets."""
+    data = _make_subscribe_data()
+    data.updated_buckets = [
+        Bucket("topaz.A", 1, 1000, {"where_id": "w1", "co_status": 0}),
+        Bucket("topaz.B", 1, 1000, {"where_id": "w1", "co_status": 0}),
+    ]
+    subscriber = _make_subscriber(hass, _make_entry(hass), data=data)
+    entry_data = subscriber.entry_data
+    entry_data.buckets.restored.update(["topaz.A", "topaz.B"])
+    snapshot = entry_data.session_manager._snapshot = MagicMock()
+
+    live = _make_subscribe_data()
+    live.service_urls = {"urls": {"transport_url": "https://t2.example.com"}}
+    live.updated_buckets = [
+        Bucket("topaz.A", 2, 2000, {"where_id": "w1", "co_status": 3}),
+        data.updated_buckets[1],
+    ]
+
+    with patch(
+        "custom_components.nest_protect.subscriber.async_dispatcher_send"
+    ) as mock_dispatch:
+        assert subscriber.async_reconcile(live) is True
+
+    updated = live.updated_buckets[0]
+    assert call(hass, "topaz.A", updated) in mock_dispatch.call_args_list
+    # The unchanged restored bucket is confirmed, and every field is sent so
+    # its alarm sensors become available again
+    assert call(hass, "topaz.B:co_status", live.updated_buckets[1]) in (
+        mock_dispatch.call_args_list
+    )
+    assert entry_data.buckets.get("topaz.A") is updated
+    assert entry_data.buckets.restored == set()
+    assert subscriber.transport_url == "https://t2.example.com"
+    snapshot.async_schedule_save.assert_called_once_with(entry_data.buckets, [updated])
+
+    # A device that was removed from the account needs a reload
+    live.updated_buckets = [updated]
+    assert subscriber.async_reconcile(live) is False
+
+
+async def test_subscriber_dispatches_registered_bucket_types(hass):
+    """Buckets of a type with a registered handler are applied and dispatched."""
+    subscriber = _make_subscriber(hass, _make_entry(hass))
+    structure = Bucket("structure.S", 2, 2000, {"away": True})
+    subscriber.entry_data.client.subscribe_for_data = AsyncMock(
+        return_value=SubscribeResponse(objects=[structure])
+    )
+    handler = MagicMock(return_value=True)
+
+    with (
+        patch.dict(BUCKET_HANDLERS, {BucketType.STRUCTURE: handler}),
+        patch(
+            "custom_components.nest_protect.subscriber.async_dispatcher_send"
+        ) as mock_dispatch,
+    ):
+        await subscriber.async_run_once(subscriber.shards[0])
+
+    handler.assert_called_once_with(subscriber.entry_data, structure)
+    assert call(hass, "structure.S", structure) in mock_dispatch.call_args_list
+
+
+async def test_subscriber_worker_loops_until_stopped(hass):
+    """The worker keeps a single task across cycles and errors until stopped."""
+    subscriber = _make_subscriber(hass, _make_entry(hass))
+    polls = 0
+
+    async def subscribe_for_data(*args):
+        nonlocal polls
+        polls += 1
+        if polls == 1:
+            raise EmptyResponseException
+        if polls == 2:
+            raise NestServiceException
+        await asyncio.Event().wait()
+
+    subscriber.entry_data.client.subscribe_for_data = subscribe_for_data
+
+    with patch(
+        "custom_components.nest_protect.subscriber.asyncio.sleep",
+        new_callable=AsyncMock,
+    ):
+        subscriber.start()
+        task = subscriber.shards[0].task
+        await asyncio.sleep(0.01)
+
+        subscriber.start()
+        assert subscriber.shards[0].task is task
+        assert subscriber.running
+        assert polls == 3
+
+        await subscriber.async_stop()
+
+    assert task.cancelled()
+    assert not subscriber.running
+    assert subscriber.state is SubscriberState.STOPPED
+    assert subscriber.stats.empty_responses == 1
+    assert subscriber.stats.errors == 1
+    assert subscriber.stats.backoffs == 1
+
+
+async def test_subscriber_shards_long_poll_apart(hass):
+    """Every structure gets its own long-poll, sharing one 401 count."""
+    data = _make_subscribe_data()
+    data.updated_buckets = [
+        Bucket("user.1", 1, 1000, {}),
+        Bucket("topaz.A", 1, 1000, {"structure_id": "S1"}),
+        Bucket("topaz.B", 1, 1000, {"structure_id": "S2"}),
+        Bucket("topaz.C", 1, 1000, {"structure_id": "S2"}),
+    ]
+    subscriber = _make_subscriber(hass, _make_entry(hass), data=data)
+    client = subscriber.entry_data.client
+    sm = subscriber.entry_data.session_manager
+
+    assert [
+        [entry["object_key"] for entry in shard.revisions.objects]
+        for shard in subscriber.shards
+    ] == [["user.1", "topaz.A"], ["topaz.B", "topaz.C"]]
+    assert (
+        len(_make_subscriber(hass, _make_entry(hass), data=data, shard_size=1).shards)
+        == 4
+    )
+
+    polls = []
+    rejected = asyncio.Event()
+
+    async def subscribe_for_data(*args):
+        polls.append(args[3])
+        if len(polls) == len(subscriber.shards):
+            rejected.set()
+        await rejected.wait()
+        raise NotAuthenticatedException
+
+    client.subscribe_for_data = subscribe_for_data
+
+    with patch(
+        "custom_components.nest_protect.subscriber.asyncio.sleep",
+        new_callable=AsyncMock,
+    ):
+        assert await asyncio.gather(
+            *(subscriber.async_run_once(shard) for shard in subscriber.shards)
+        ) == [True, True]
+
+    assert sm.consecutive_failures == 1
+    assert subscriber.stats.errors == 2
+    assert polls == [shard.revisions for shard in subscriber.shards]
+
+    client.subscribe_for_data = AsyncMock(return_value=SubscribeResponse(objects=[]))
+
+    for shard in subscriber.shards:
+        assert await subscriber.async_run_once(shard)
+
+    sm.async_refresh_session.assert_awaited_once()
+    assert subscriber.stats.session_refreshes == 1
+    assert subscriber.state is SubscriberState.STREAMING
+
+
+async def test_subscriber_opens_next_long_poll_before_dispatching(hass):
+    """The next long-poll is open while the previous updates are dispatched."""
+    data = _make_subscribe_data()
+    data.updated_buckets = [Bucket("topaz.A", 1, 1000, {"battery_level": 5400})]
+    subscriber = _make_subscriber(hass, _make_entry(hass), data=data)
+    shard = subscriber.shards[0]
+    dispatched_at_open = []
+
+    async def subscribe_for_data(*args):
+        dispatched_at_open.append(mock_dispatch.call_count)
+        if len(dispatched_at_open) == 1:
+            return SubscribeResponse(
+                objects=[
+                    {
+                        "object_key": "topaz.A",
+                        "object_revision": 2,
+                        "object_timestamp": 2000,
+                        "value": {"battery_level": 5300},
+                    }
+                ]
+            )
+        await asyncio.Event().wait()
+        return None
+
+    subscriber.entry_data.client.subscribe_for_data = subscribe_for_data
+
+    with patch(
+        "custom_components.nest_protect.subscriber.async_dispatcher_send"
+    ) as mock_dispatch:
+        assert await subscriber.async_run_once(shard)
+
+    assert dispatched_at_open == [0, 0]
+    assert mock_dispatch.call_count == 2
+    assert shard.pending is not None
+    assert not shard.pending.done()
+    assert subscriber.stats.requests == 2
+    assert 0 <= subscriber.stats.coverage_gap_last == subscriber.stats.coverage_gap_max
+
+    pending = shard.pending
+    await subscriber.async_stop()
+
+    assert pending.cancelled()
+    assert shard.pending is None
+
+
+async def test_subscriber_polls_inline_without_overlap(hass):
+    """Without overlap a cycle awaits its long-poll without creating a task."""
+    subscriber = _make_subscriber(hass, _make_entry(hass), overlap=False)
+    shard = subscriber.shards[0]
+    subscriber.entry_data.client.subscribe_for_data = AsyncMock(
+        return_value=SubscribeResponse(objects=[])
+    )
+
+    with patch.object(subscriber, "_open_poll") as mock_open_poll:
+        assert await subscriber.async_run_once(shard)
+
+    mock_open_poll.assert_not_called()
+    assert shard.pending is None
+    assert subscriber.stats.requests == 1
+
+
+async def test_subscriber_alarm_fast_path(hass):
+    """Alarm transitions are dispatched and fired before other updates."""
+    data = _make_subscribe_data()
+    data.updated_buckets = [
+        Bucket(
+            "topaz.A",
+            1,
+            1000,
+            {"where_id": "w1", "smoke_status": 0, "co_status": 0, "battery_level": 1},
+        ),
+        Bucket("topaz.B", 1, 1000, {"where_id": "w1", "smoke_status": 0}),
+    ]
+    subscriber = _make_subscriber(hass, _make_entry(hass), data=data, overlap=False)
+    subscriber.entry_data.areas["w1"] = "Kitchen"
+    events = async_capture_events(hass, EVENT_ALARM)
+    now = time.time()
+    result = SubscribeResponse(
+        objects=[
+            {
+                "object_key": "topaz.A",
+                "object_revision": 2,
+                "object_timestamp": int(now * 1000) - 1500,
+                "value": {
+                    "where_id": "w1",
+                    "smoke_status": 2,
+                    "co_status": 0,
+                    "battery_level": 2,
+                },
+            },
+            # Stale revisions never raise an alarm
+            {
+                "object_key": "topaz.B",
+                "object_revision": 1,
+                "object_timestamp": 1000,
+                "value": {"where_id": "w1", "smoke_status": 2},
+            },
+        ]
+    )
+    subscriber.entry_data.client.subscribe_for_data = AsyncMock(return_value=result)
+
+    with patch(
+        "custom_components.nest_protect.subscriber.async_dispatcher_send"
+    ) as mock_dispatch:
+        assert await subscriber.async_run_once(subscriber.shards[0])
+        await hass.async_block_till_done()
+
+    topaz = result.objects[0]
+    assert mock_dispatch.call_args_list == [
+        call(hass, "topaz.A:smoke_status", topaz),
+        call(hass, "topaz.A", topaz),
+        call(hass, "topaz.A:battery_level", topaz),
+    ]
+    assert [event.data for event in events] == [
+        {
+            "object_key": "topaz.A",
+            "device_id": None,
+            "area": "Kitchen",
+            "alarm": "smoke_status",
+            "status": 2,
+            "previous_status": 0,
+        }
+    ]
+    assert subscriber.stats.alarms == 1
+    assert 1.5 <= subscriber.stats.alarm_latency_last < 10
+    assert subscriber.stats.alarm_latency_max == subscriber.stats.alarm_latency_last